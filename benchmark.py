@@ -0,0 +1,361 @@
+'''
+File: benchmark.py
+Author: Pri Vaghela
+Description: The program benchmarks the phylo similarity computations on
+synthetic genomes. It compares the speed of the MinHash sketch mode with the
+exact Jaccard similarity and reports how far the estimates are from the exact
+values. It also times every stage of the phylo pipeline, from reading the
+FASTA file to building the tree with each engine, records the peak resident
+memory of every stage in the benchmark process and the largest memory of its
+worker processes, and saves the results as JSON, so that a later run can be
+checked against them for regressions. The reading throughput of compressed
+FASTA files is measured with and without the decompression thread.
+'''
+
+import argparse
+import bz2
+import gzip
+import json
+import lzma
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import phylo
+from fasta import read_fasta_pieces
+from genome import MODES
+from kmers import encode_kmers
+from similarity import jaccard_matrix, similarity_matrix
+from sketch import sketch_kmers, sketch_matrix
+
+try:
+    import resource
+except ImportError:
+    # the memory of the worker processes is not reported where there is no
+    # resource module
+    resource = None
+
+# the tree engines and linkages the pipeline benchmark builds trees with
+ENGINES = [("linkage", "single"), ("linkage", "average"), ("nj", "single"),
+           ("mst", "single")]
+
+# the number of bases on every sequence line of the written FASTA files
+LINE_LENGTH = 60
+
+# the compressed formats, their file name endings and the functions that
+# open them for writing, at a fast compression level
+COMPRESSIONS = [("gzip", ".gz", lambda name: gzip.open(name, "wb", 1)),
+                ("bzip2", ".bz2", lambda name: bz2.open(name, "wb", 1)),
+                ("xz", ".xz", lambda name: lzma.open(name, "wb", preset=1))]
+
+def synthetic_genomes(count, length, mutation_rate, seed=0):
+    '''
+    The function synthetic_genomes returns a dictionary of random genome
+    sequences that are related to each other. Every genome is a copy of a
+    random earlier genome (or of a random root) where each base has been
+    replaced by a random base with probability mutation_rate.
+    count - this parameter takes in the number of genomes
+    length - this parameter takes in the length of every genome
+    mutation_rate - this parameter takes in the per-base mutation probability
+    seed - this parameter takes in the seed of the random generator
+    '''
+    generator = np.random.default_rng(seed)
+    bases = np.frombuffer(b"ACGT", dtype=np.uint8)
+    sequences = [bases[generator.integers(0, 4, length)]]
+    genomes = {}
+    for i in range(count):
+        child = sequences[generator.integers(0, len(sequences))].copy()
+        mutated = generator.random(length) < mutation_rate
+        child[mutated] = bases[generator.integers(0, 4, mutated.sum())]
+        sequences.append(child)
+        genomes["genome{}".format(i)] = child.tobytes().decode("ascii")
+    return genomes
+
+def benchmark_sketch(genomes, n, sketch_sizes, seed=42):
+    '''
+    The function benchmark_sketch times the exact Jaccard matrix and the
+    sketch matrix for every sketch size, and returns a list of result
+    dictionaries with the timings and the mean and maximum absolute error
+    of the estimated similarities.
+    genomes - this parameter takes in the dictionary of genome sequences
+    n - this parameter takes in the k-mer length
+    sketch_sizes - this parameter takes in the list of sketch sizes to try
+    seed - this parameter takes in the seed of the sketch hash function
+    '''
+    start = time.perf_counter()
+    kmer_arrays = [encode_kmers(sequence, n) for sequence in genomes.values()]
+    exact = jaccard_matrix(kmer_arrays)
+    exact_time = time.perf_counter() - start
+    off_diagonal = ~np.eye(len(genomes), dtype=bool)
+    results = [{"mode": "exact", "seconds": exact_time,
+                "mean_error": 0.0, "max_error": 0.0}]
+    for size in sketch_sizes:
+        start = time.perf_counter()
+        kmer_arrays = [encode_kmers(sequence, n)
+                       for sequence in genomes.values()]
+        sketches = [sketch_kmers(kmers, size, seed) for kmers in kmer_arrays]
+        estimate = sketch_matrix(sketches)
+        seconds = time.perf_counter() - start
+        error = np.abs(estimate - exact)[off_diagonal]
+        results.append({"mode": "sketch {}".format(size), "seconds": seconds,
+                        "mean_error": float(error.mean()),
+                        "max_error": float(error.max())})
+    return results
+
+def write_fasta(genomes, filename, line_length=LINE_LENGTH):
+    '''
+    The function write_fasta writes a dictionary of genome sequences to a
+    FASTA file.
+    genomes - this parameter takes in the dictionary of genome sequences
+    filename - this parameter takes in the name of the FASTA file
+    line_length - this parameter takes in the number of bases per line
+    '''
+    with open(filename, "w") as file:
+        for name, sequence in genomes.items():
+            file.write(">{}\n".format(name))
+            for start in range(0, len(sequence), line_length):
+                file.write(sequence[start:start + line_length])
+                file.write("\n")
+
+def synthetic_fasta(filename, count, length, mutation_rate, seed=0):
+    '''
+    The function synthetic_fasta writes a FASTA file of related synthetic
+    genomes, see synthetic_genomes, and returns the size of the file.
+    filename - this parameter takes in the name of the FASTA file
+    count - this parameter takes in the number of genomes
+    length - this parameter takes in the length of every genome
+    mutation_rate - this parameter takes in the per-base mutation probability
+    seed - this parameter takes in the seed of the random generator
+    '''
+    write_fasta(synthetic_genomes(count, length, mutation_rate, seed),
+                filename)
+    return os.path.getsize(filename)
+
+def measure(stage, function, *args, **kwargs):
+    '''
+    The function measure calls a function once and returns its result
+    together with a result dictionary of the stage name, the wall-clock
+    seconds of the call and the peak resident memory of the benchmark
+    process, see phylo.peak_memory. The peak is started over before the
+    call where the system allows it, and "peak_scope" is then "stage";
+    otherwise it is "process" and the peak is the high-water mark of the
+    whole run so far. The memory of worker processes is not in the peak;
+    where the resource module is available the dictionary also has the
+    largest resident memory of any worker process that has finished so far,
+    which is only about this stage when it grew during it.
+    stage - this parameter takes in the name of the stage
+    function - this parameter takes in the function to call
+    args - this parameter takes in the positional arguments of the function
+    kwargs - this parameter takes in the keyword arguments of the function
+    '''
+    stage_peak = phylo.reset_peak_memory()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    measured = {"stage": stage, "seconds": seconds,
+                "peak_bytes": phylo.peak_memory(),
+                "peak_scope": "stage" if stage_peak else "process"}
+    if resource is not None:
+        # ru_maxrss is in kilobytes
+        measured["worker_peak_bytes"] = 1024 * resource.getrusage(
+            resource.RUSAGE_CHILDREN).ru_maxrss
+    return result, measured
+
+def count_sequence_bytes(filename, threaded):
+    '''
+    The function count_sequence_bytes reads a FASTA file as a stream of
+    pieces and returns the number of sequence bytes in it.
+    filename - this parameter takes in the name of the FASTA file
+    threaded - this parameter takes in whether a compressed file is
+    decompressed in a background thread
+    '''
+    return sum(len(piece) for index, name, piece in
+               read_fasta_pieces(filename, threaded=threaded))
+
+def benchmark_compressed(filename, formats=("gzip", "bzip2", "xz")):
+    '''
+    The function benchmark_compressed compresses a FASTA file in every
+    format and times reading the plain file and every compressed one, with
+    and without the decompression thread. Every result dictionary, see
+    measure, also has the size of the file read and the throughput in
+    megabytes of FASTA file per second.
+    filename - this parameter takes in the name of the plain FASTA file
+    formats - this parameter takes in the compressed formats to try
+    '''
+    size = os.path.getsize(filename)
+    results = []
+    files = [("plain", filename)]
+    for name, ending, opener in COMPRESSIONS:
+        if name in formats:
+            with open(filename, "rb") as source, \
+                 opener(filename + ending) as target:
+                shutil.copyfileobj(source, target)
+            files.append((name, filename + ending))
+    for name, path in files:
+        for threaded in (False, True) if name != "plain" else (False,):
+            stage = "read " + name + (" threaded" if threaded else "")
+            result = measure(stage, count_sequence_bytes, path, threaded)[1]
+            result["bytes"] = os.path.getsize(path)
+            result["megabytes_per_second"] = size / 1e6 / result["seconds"]
+            results.append(result)
+    return results
+
+def create_all_ngrams(genome_data, n, mode):
+    '''
+    The function create_all_ngrams builds the n-grams of every genome again
+    from its sequence with GenomeData.create_ngrams.
+    genome_data - this parameter takes in the dictionary of genome data
+    n - this parameter takes in the n-gram size
+    mode - this parameter takes in the n-gram mode
+    '''
+    for genome in genome_data.values():
+        genome.create_ngrams(n, mode)
+
+def benchmark_pipeline(filename, n, mode="compact", engines=ENGINES,
+                       workers=1, reference=False):
+    '''
+    The function benchmark_pipeline times the stages of phylo on a FASTA
+    file: read_fasta_file, GenomeData.create_ngrams, the similarity matrix,
+    and construct_phylogenetic_tree with every engine, each of which builds
+    its own similarities. It returns a list of result dictionaries, see
+    measure.
+    filename - this parameter takes in the name of the FASTA file
+    n - this parameter takes in the n-gram size
+    mode - this parameter takes in the n-gram mode
+    engines - this parameter takes in the list of (engine, linkage) to try
+    workers - this parameter takes in the number of worker processes
+    reference - this parameter takes in whether the pairwise dictionary of
+    compute_similarity, which is slow, is timed as well
+    '''
+    results = []
+    genome_data, result = measure("read_fasta_file", phylo.read_fasta_file,
+                                  filename, n, mode, workers=workers)
+    results.append(result)
+    results.append(measure("create_ngrams", create_all_ngrams, genome_data,
+                           n, mode)[1])
+    if reference:
+        results.append(measure("compute_similarity",
+                               phylo.compute_similarity_data,
+                               genome_data)[1])
+    results.append(measure("similarity_matrix", similarity_matrix,
+                           genome_data)[1])
+    for engine, linkage in engines:
+        stage = "tree {} {}".format(engine, linkage)
+        results.append(measure(stage, phylo.construct_phylogenetic_tree,
+                               genome_data, workers, linkage=linkage,
+                               engine=engine)[1])
+    return results
+
+def find_regressions(baseline, results, tolerance=0.25, slack=0.05):
+    '''
+    The function find_regressions compares the results of a run with the
+    results of an earlier one and returns a list of messages, one for every
+    stage that got slower or needed more memory by more than the tolerance.
+    The memory is only compared between peaks of single stages.
+    baseline - this parameter takes in the list of earlier result
+    dictionaries
+    results - this parameter takes in the list of new result dictionaries
+    tolerance - this parameter takes in the allowed relative increase
+    slack - this parameter takes in a number of seconds below which changes
+    are treated as noise
+    '''
+    old_results = {result["stage"]: result for result in baseline}
+    messages = []
+    for result in results:
+        old = old_results.get(result["stage"])
+        if old is None:
+            continue
+        if result["seconds"] > old["seconds"] * (1 + tolerance) + slack:
+            messages.append("{}: {:.3f} s, was {:.3f} s".format(
+                result["stage"], result["seconds"], old["seconds"]))
+        if result.get("peak_scope") == old.get("peak_scope") == "stage" \
+           and result["peak_bytes"] > old["peak_bytes"] * (1 + tolerance):
+            messages.append("{}: {} bytes, was {} bytes".format(
+                result["stage"], result["peak_bytes"], old["peak_bytes"]))
+    return messages
+
+def main():
+    '''
+    The main function runs the pipeline benchmark and the sketch benchmark on
+    synthetic collections, prints one line per stage or mode, and saves the
+    results as JSON when an output file is given. With a baseline file the
+    regressions against it are printed and the exit status is 1 if there are
+    any.
+    '''
+    parser = argparse.ArgumentParser(description="Benchmark phylo on "
+                                     "synthetic genomes.")
+    parser.add_argument("--suite", default="all",
+                        choices=["pipeline", "compression", "sketch", "all"])
+    parser.add_argument("--count", type=int, default=100,
+                        help="number of genomes")
+    parser.add_argument("--length", type=int, default=20000,
+                        help="length of every genome")
+    parser.add_argument("--mutation-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-n", type=int, default=12, help="n-gram size")
+    parser.add_argument("--mode", choices=MODES, default="compact")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--reference", action="store_true",
+                        help="also time the pairwise compute_similarity")
+    parser.add_argument("--sketch-sizes", type=int, nargs="+",
+                        default=[100, 500, 2000])
+    parser.add_argument("--output", help="JSON file to save the results to")
+    parser.add_argument("--baseline", help="JSON file of an earlier run")
+    arguments = parser.parse_args()
+    settings = {key: value for key, value in vars(arguments).items()
+                if key not in ("output", "baseline")}
+    results = []
+    if arguments.suite in ("pipeline", "all"):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "synthetic.fa")
+            size, result = measure("write_fasta", synthetic_fasta, filename,
+                                   arguments.count, arguments.length,
+                                   arguments.mutation_rate, arguments.seed)
+            result["bytes"] = size
+            results.append(result)
+            results += benchmark_pipeline(filename, arguments.n,
+                                          arguments.mode,
+                                          workers=arguments.workers,
+                                          reference=arguments.reference)
+        for result in results:
+            print("{:<24} {:8.3f} s  peak {:8.1f} MB  workers {:8.1f} MB"
+                  .format(result["stage"], result["seconds"],
+                          (result["peak_bytes"] or 0) / 1e6,
+                          result.get("worker_peak_bytes", 0) / 1e6))
+    if arguments.suite in ("compression", "all"):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "synthetic.fa")
+            synthetic_fasta(filename, arguments.count, arguments.length,
+                            arguments.mutation_rate, arguments.seed)
+            for result in benchmark_compressed(filename):
+                print("{:<24} {:8.3f} s  {:8.1f} MB/s".format(
+                    result["stage"], result["seconds"],
+                    result["megabytes_per_second"]))
+                results.append(result)
+    if arguments.suite in ("sketch", "all"):
+        genomes = synthetic_genomes(arguments.count, arguments.length,
+                                    arguments.mutation_rate, arguments.seed)
+        for result in benchmark_sketch(genomes, arguments.n,
+                                       arguments.sketch_sizes):
+            print("{:<12} {:8.3f} s  mean error {:.4f}  max error {:.4f}"
+                  .format(result["mode"], result["seconds"],
+                          result["mean_error"], result["max_error"]))
+            result["stage"] = "sketch " + result.pop("mode")
+            results.append(result)
+    if arguments.output is not None:
+        with open(arguments.output, "w") as file:
+            json.dump({"settings": settings, "results": results}, file,
+                      indent=1)
+    if arguments.baseline is not None:
+        with open(arguments.baseline, "r") as file:
+            baseline = json.load(file)["results"]
+        messages = find_regressions(baseline, [result for result in results
+                                               if "peak_bytes" in result])
+        for message in messages:
+            print("regression: " + message)
+        if messages:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+'''
+File: bootstrap.py
+Author: Pri Vaghela
+Description: The program computes bootstrap support values for phylogenetic
+trees. Every replicate draws as many k-mers as there are distinct k-mers in
+the collection, with replacement, and the similarity matrix of the replicate,
+in the metric of the tree, counts every k-mer as often as it was drawn. The
+replicate trees are built in a pool of worker processes with the merge
+engines of cluster.py and nj.py, and every internal node of the tree gets
+the fraction of replicate trees that split the genomes the same way. The
+splits are kept as integer bitsets of the genomes on one side, with the side
+without genome 0 chosen, so they are counted with a dictionary instead of
+comparing sets.
+'''
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from cluster import linkage_merges
+from linkage_matrix import LinkageMatrix
+from nj import neighbor_joining_merges
+from similarity import code_arrays, check_metric, metric_from_counts, \
+    sorted_intersection_counts
+from sketch import MinHashSketch
+
+# the k-mer columns and the tree settings, in each worker process
+BOOTSTRAP = {}
+
+def kmer_columns(genome_data, metric="jaccard"):
+    '''
+    The function kmer_columns numbers the distinct codes of the genomes, see
+    similarity.code_arrays, 0 to m-1 and returns the sorted array of the code
+    numbers of all the genomes, the array of the genome of every entry and
+    the array of the k-mer of every code number. The k-mers are numbered too,
+    and the codes of a k-mer are its copies for "weighted-jaccard" and the
+    k-mer itself for the other metrics.
+    genome_data - this parameter takes in the dictionary of genome data where
+    each genome is represented as a GenomeData object
+    metric - this parameter takes in one of similarity.METRICS
+    '''
+    ngrams = [genome.get_ngrams() for genome in genome_data.values()]
+    if any(isinstance(ngram_set, MinHashSketch) for ngram_set in ngrams):
+        raise ValueError("bootstrap needs the k-mers, not sketches")
+    codes = code_arrays(ngrams, metric)
+    sizes = [len(code_array) for code_array in codes]
+    if sum(sizes) == 0:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), \
+            np.zeros(0, np.int64)
+    all_codes = np.concatenate(codes)
+    if metric == "weighted-jaccard":
+        # the copies of a k-mer come in the order of its repeated code
+        all_kmers = np.concatenate([np.repeat(kmers.get_codes(),
+                                              kmers.get_counts())
+                                    for kmers in ngrams])
+    else:
+        all_kmers = all_codes
+    owners = np.repeat(np.arange(len(codes)), sizes)
+    order = np.argsort(all_codes, kind="stable")
+    all_codes = all_codes[order]
+    changes = np.empty(len(all_codes), dtype=np.int64)
+    changes[0] = 0
+    np.not_equal(all_codes[1:], all_codes[:-1], out=changes[1:])
+    starts = np.flatnonzero(np.concatenate(([True], changes[1:] > 0)))
+    kmers = np.unique(all_kmers[order][starts], return_inverse=True)[1]
+    return np.cumsum(changes), owners[order], kmers.ravel()
+
+def attach_columns(columns, owners, kmers, count, linkage, engine,
+                   metric="jaccard", n=None):
+    '''
+    The function attach_columns runs once in every worker process and keeps
+    the k-mer columns and the tree settings for the replicates.
+    columns - this parameter takes in the sorted array of code numbers
+    owners - this parameter takes in the genome of every code number
+    kmers - this parameter takes in the k-mer of every code number
+    count - this parameter takes in the number of genomes
+    linkage - this parameter takes in the linkage of the clustering
+    engine - this parameter takes in "linkage" or "nj"
+    metric - this parameter takes in one of similarity.METRICS
+    n - this parameter takes in the k-mer length, needed for "mash"
+    '''
+    BOOTSTRAP["columns"] = columns
+    BOOTSTRAP["owners"] = owners
+    BOOTSTRAP["kmers"] = kmers
+    BOOTSTRAP["count"] = count
+    BOOTSTRAP["kmer_count"] = int(kmers.max()) + 1 if len(kmers) else 0
+    BOOTSTRAP["linkage"] = linkage
+    BOOTSTRAP["engine"] = engine
+    BOOTSTRAP["metric"] = metric
+    BOOTSTRAP["n"] = n
+
+def replicate_matrix(weights):
+    '''
+    The function replicate_matrix returns the similarity matrix of the
+    genomes in the metric of the tree when every code counts as often as its
+    weight.
+    weights - this parameter takes in the array of the weights of the codes
+    '''
+    columns = BOOTSTRAP["columns"]
+    owners = BOOTSTRAP["owners"]
+    count = BOOTSTRAP["count"]
+    intersection = sorted_intersection_counts(columns, owners, count, count,
+                                              True, weights)
+    sizes = np.bincount(owners, weights=weights[columns], minlength=count)
+    return metric_from_counts(intersection, sizes, sizes, BOOTSTRAP["metric"],
+                              BOOTSTRAP["n"])
+
+def merge_splits(merges, count):
+    '''
+    The function merge_splits returns the bitsets of the nontrivial splits
+    of the tree of a merge history, each as the integer whose bit i is set
+    when genome i is on the side without genome 0.
+    merges - this parameter takes in the list of (a, b, similarity) merges
+    count - this parameter takes in the number of genomes
+    '''
+    full = (1 << count) - 1
+    bits = [1 << i for i in range(count)]
+    splits = set()
+    for a, b, similarity in merges:
+        clade = bits[int(a)] | bits[int(b)]
+        bits.append(clade)
+        split = split_key(clade, full)
+        if split is not None:
+            splits.add(split)
+    return splits
+
+def split_key(clade, full):
+    '''
+    The function split_key returns the bitset of the side of the split of a
+    clade that does not hold genome 0, or None when one side has fewer than
+    two genomes.
+    clade - this parameter takes in the bitset of the genomes of the clade
+    full - this parameter takes in the bitset of all the genomes
+    '''
+    split = full ^ clade if clade & 1 else clade
+    if bin(split).count("1") < 2 or bin(full ^ split).count("1") < 2:
+        return None
+    return split
+
+def replicate_splits(seed):
+    '''
+    The function replicate_splits runs in a worker process, builds the tree
+    of one bootstrap replicate and returns the set of its splits.
+    seed - this parameter takes in the seed of the replicate's resampling
+    '''
+    generator = np.random.default_rng(seed)
+    kmer_count = BOOTSTRAP["kmer_count"]
+    weights = np.bincount(generator.integers(0, kmer_count, kmer_count),
+                          minlength=kmer_count).astype(np.float64)
+    matrix = replicate_matrix(weights[BOOTSTRAP["kmers"]])
+    if BOOTSTRAP["engine"] == "nj":
+        merges = neighbor_joining_merges(matrix)
+    else:
+        merges = linkage_merges(matrix, BOOTSTRAP["linkage"])
+    return merge_splits(merges, BOOTSTRAP["count"])
+
+def count_splits(genome_data, replicates, linkage="single", engine="linkage",
+                 workers=1, seed=0, metric="jaccard", n=None):
+    '''
+    The function count_splits builds the trees of the bootstrap replicates
+    and returns a Counter of how many of them have every split.
+    genome_data - this parameter takes in the dictionary of genome data
+    replicates - this parameter takes in the number of replicates
+    linkage - this parameter takes in the linkage of the clustering
+    engine - this parameter takes in "linkage", "nj", or "mst", whose
+    replicates are built as single linkage
+    workers - this parameter takes in the number of worker processes
+    seed - this parameter takes in the seed of the resampling
+    metric - this parameter takes in one of similarity.METRICS
+    n - this parameter takes in the k-mer length, needed for "mash"
+    '''
+    check_metric(metric, n)
+    if engine == "mst":
+        engine = "linkage"
+    columns, owners, kmers = kmer_columns(genome_data, metric)
+    initargs = (columns, owners, kmers, len(genome_data), linkage, engine,
+                metric, n)
+    seeds = [(seed, replicate) for replicate in range(replicates)]
+    counts = Counter()
+    if workers > 1:
+        with ProcessPoolExecutor(workers, initializer=attach_columns,
+                                 initargs=initargs) as pool:
+            chunk = max(1, replicates // (4 * workers))
+            for splits in pool.map(replicate_splits, seeds, chunksize=chunk):
+                counts.update(splits)
+    else:
+        attach_columns(*initargs)
+        for replicate_seed in seeds:
+            counts.update(replicate_splits(replicate_seed))
+    return counts
+
+def tree_clades(tree, names):
+    '''
+    The function tree_clades returns a list of (node, bitset) of the
+    internal nodes of a tree, with the bitset of the genomes below every
+    node. The tree is walked without recursion.
+    tree - this parameter takes in the root TreeNode
+    names - this parameter takes in the list of genome names, in the order
+    of the bits
+    '''
+    positions = dict((name, i) for i, name in enumerate(names))
+    bits = {}
+    clades = []
+    stack = [(tree, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if node.is_leaf():
+            bits[id(node)] = 1 << positions[node.get_id()]
+        elif children_done:
+            clade = bits[id(node.get_left())] | bits[id(node.get_right())]
+            bits[id(node)] = clade
+            clades.append((node, clade))
+        else:
+            stack.append((node, True))
+            stack.append((node.get_right(), False))
+            stack.append((node.get_left(), False))
+    return clades
+
+def bootstrap_support(genome_data, tree, replicates=100, linkage="single",
+                      engine="linkage", workers=1, seed=0, metric="jaccard",
+                      n=None):
+    '''
+    The function bootstrap_support annotates every internal node of a tree
+    of the genomes with its bootstrap support, the fraction of replicate
+    trees that have its split, and returns the tree. Nodes whose split is
+    trivial, with fewer than two genomes on a side, get the support 1.0.
+    genome_data - this parameter takes in the dictionary of genome data the
+    tree was built from, with k-mers that are not sketches
+    tree - this parameter takes in the root TreeNode or a LinkageMatrix
+    replicates - this parameter takes in the number of replicates
+    linkage - this parameter takes in the linkage the tree was built with
+    engine - this parameter takes in the engine the tree was built with
+    workers - this parameter takes in the number of worker processes
+    seed - this parameter takes in the seed of the resampling
+    metric - this parameter takes in the similarity metric the tree was
+    built with, one of similarity.METRICS
+    n - this parameter takes in the k-mer length, needed for "mash"
+    '''
+    names = list(genome_data)
+    counts = count_splits(genome_data, replicates, linkage, engine, workers,
+                          seed, metric, n)
+    full = (1 << len(names)) - 1
+    if isinstance(tree, LinkageMatrix):
+        positions = dict((name, i) for i, name in enumerate(names))
+        bits = [1 << positions[name] for name in tree.get_names()]
+        supports = np.zeros(len(tree.get_children()), dtype=np.float64)
+        for k, (left, right) in enumerate(tree.get_children().tolist()):
+            bits.append(bits[left] | bits[right])
+            split = split_key(bits[-1], full)
+            supports[k] = 1.0 if split is None else \
+                counts[split] / replicates
+        tree.set_supports(supports)
+        return tree
+    if tree is not None:
+        for node, clade in tree_clades(tree, names):
+            split = split_key(clade, full)
+            node.set_support(1.0 if split is None else
+                             counts[split] / replicates)
+    return tree
@@ -0,0 +1,235 @@
+'''
+File: cluster.py
+Author: Pri Vaghela
+Description: The program contains the clustering engines that get imported in
+phylo.py. Instead of rescanning every pair of clusters on each merge, the
+candidate cluster pairs are kept in a heap and entries that refer to clusters
+which have already been merged are skipped when they are popped (lazy
+invalidation). Single, complete, average (UPGMA) and Ward-like linkage are
+supported through Lance-Williams updates of the cluster similarities.
+'''
+
+import heapq
+import math
+import numpy as np
+from tree import TreeNode
+from linkage_matrix import LinkageMatrix
+
+def make_leaves(names):
+    '''
+    The function make_leaves creates a leaf TreeNode for every name, in the
+    same order as the names.
+    names - this parameter takes in the list of genome names
+    '''
+    leaves = []
+    for name in names:
+        leaf = TreeNode(name)
+        leaf.add_id(name)
+        leaves.append(leaf)
+    return leaves
+
+def merge_nodes(t1, t2):
+    '''
+    The function merge_nodes creates the parent TreeNode of t1 and t2, whose
+    set_id holds the ids of both children, and the child with the smaller
+    string representation becomes the left child.
+    t1 - this parameter takes in the first node to be merged
+    t2 - this parameter takes in the second node to be merged
+    '''
+    new_node = TreeNode(None)
+    if t1.sorts_before(t2):
+        new_node.set_left(t1)
+        new_node.set_right(t2)
+    else:
+        new_node.set_left(t2)
+        new_node.set_right(t1)
+    return new_node
+
+def tree_from_merges(names, merges, as_matrix=False, lengths=None):
+    '''
+    The function tree_from_merges builds the TreeNode hierarchy from a merge
+    history. The leaves are numbered 0 to n-1 in the order of names and the
+    cluster created by the k-th merge gets the number n+k.
+    names - this parameter takes in the list of genome names
+    merges - this parameter takes in the list of (a, b, similarity) merges
+    as_matrix - this parameter takes in True to get the tree as a
+    LinkageMatrix instead, which needs far less memory for big trees
+    lengths - this parameter takes in the array of the branch lengths above
+    every node by node number, NaN for the root, or None when they follow
+    from the similarities
+    '''
+    if as_matrix:
+        return LinkageMatrix.from_merges(names, merges, lengths)
+    nodes = make_leaves(names)
+    if len(nodes) == 0:
+        return None
+    for a, b, similarity in merges:
+        node = merge_nodes(nodes[int(a)], nodes[int(b)])
+        node.set_height(float(similarity))
+        nodes.append(node)
+    if lengths is not None:
+        for node, length in zip(nodes, np.asarray(lengths).tolist()):
+            if not math.isnan(length):
+                node.set_length(length)
+    return nodes[-1]
+
+def linkage_merges(matrix, linkage="single", prefix=()):
+    '''
+    The function linkage_merges returns the merge history of agglomerative
+    clustering as a list of (a, b, similarity), repeatedly merging the two
+    clusters with the highest similarity. Clusters are numbered in the order
+    they are created, and ties are broken in favour of the pair with the
+    smallest numbers, which is the pair the brute-force scan over the list of
+    trees would find first. The similarity between clusters is kept in a
+    matrix and, after every merge, the row of the new cluster is derived from
+    the rows of its halves with the Lance-Williams formula of the linkage in
+    O(n), so a full build is O(n^2 log n).
+    matrix - this parameter takes in the square similarity matrix
+    linkage - this parameter takes in "single", "complete", "average"
+    (UPGMA) or "ward", which applies Ward's formula to 1 - similarity
+    prefix - this parameter takes in merges that are already known to come
+    first, they are replayed without searching for them
+    '''
+    if linkage not in LINKAGES:
+        raise ValueError("unknown linkage: {}".format(linkage))
+    table = LinkageTable(matrix, linkage)
+    count = len(matrix)
+    merges = []
+    for a, b, similarity in prefix:
+        table.merge(int(a), int(b), count + len(merges))
+        merges.append((int(a), int(b), similarity))
+    heap = table.pairs()
+    heapq.heapify(heap)
+    while table.live_count() > 1:
+        negative, a, b = heapq.heappop(heap)
+        # skipping stale entries, one of the clusters was already merged
+        if not table.is_live(a) or not table.is_live(b):
+            continue
+        new = count + len(merges)
+        merges.append((a, b, -negative))
+        for k, similarity in table.merge(a, b, new):
+            heapq.heappush(heap, (-similarity, k, new))
+    return merges
+
+LINKAGES = ("single", "complete", "average", "ward")
+
+class LinkageTable:
+    '''
+    The class LinkageTable holds the similarities between the live clusters
+    of an agglomerative clustering in a NumPy matrix. A merged cluster takes
+    over the row of its first half.
+    '''
+    def __init__(self, matrix, linkage):
+        '''
+        initializing the similarity matrix, the linkage, the number of leaves
+        in each cluster and the mapping between clusters and rows
+        '''
+        self._similarity = np.array(matrix, dtype=np.float64)
+        count = len(self._similarity)
+        self._linkage = linkage
+        self._sizes = np.ones(count, dtype=np.float64)
+        self._live = np.ones(count, dtype=bool)
+        self._row_of = dict((i, i) for i in range(count))
+        self._cluster_of = list(range(count))
+
+    def live_count(self):
+        '''
+        The method live_count returns the number of live clusters.
+        '''
+        return len(self._row_of)
+
+    def is_live(self, cluster):
+        '''
+        The method is_live returns whether a cluster has not been merged yet.
+        cluster - this parameter takes in the number of the cluster
+        '''
+        return cluster in self._row_of
+
+    def pairs(self):
+        '''
+        The method pairs returns a list of (-similarity, a, b) for every pair
+        of live clusters a < b.
+        '''
+        rows = np.flatnonzero(self._live)
+        first, second = np.triu_indices(len(rows), 1)
+        first, second = rows[first], rows[second]
+        clusters = np.array(self._cluster_of)
+        a = clusters[first]
+        b = clusters[second]
+        return list(zip((-self._similarity[first, second]).tolist(),
+                        np.minimum(a, b).tolist(), np.maximum(a, b).tolist()))
+
+    def merge(self, a, b, new):
+        '''
+        The method merge replaces the clusters a and b by the cluster new and
+        returns the list of (k, similarity) links of the new cluster to the
+        other live clusters k.
+        a - this parameter takes in the first merged cluster
+        b - this parameter takes in the second merged cluster
+        new - this parameter takes in the number of the new cluster
+        '''
+        row_a = self._row_of.pop(a)
+        row_b = self._row_of.pop(b)
+        similarity = self._similarity
+        self._live[row_a] = False
+        self._live[row_b] = False
+        others = np.flatnonzero(self._live)
+        size_a = self._sizes[row_a]
+        size_b = self._sizes[row_b]
+        to_a = similarity[row_a, others]
+        to_b = similarity[row_b, others]
+        if self._linkage == "single":
+            row = np.maximum(to_a, to_b)
+        elif self._linkage == "complete":
+            row = np.minimum(to_a, to_b)
+        elif self._linkage == "average":
+            row = (size_a * to_a + size_b * to_b) / (size_a + size_b)
+        else:
+            sizes = self._sizes[others]
+            distance = ((sizes + size_a) * (1 - to_a) + \
+                        (sizes + size_b) * (1 - to_b) - \
+                        sizes * (1 - similarity[row_a, row_b])) / \
+                       (sizes + size_a + size_b)
+            row = 1 - distance
+        similarity[row_a, others] = row
+        similarity[others, row_a] = row
+        self._sizes[row_a] = size_a + size_b
+        self._live[row_a] = True
+        self._row_of[new] = row_a
+        self._cluster_of[row_a] = new
+        clusters = [self._cluster_of[k] for k in others.tolist()]
+        return list(zip(clusters, row.tolist()))
+
+def single_linkage_merges(matrix, prefix=()):
+    '''
+    The function single_linkage_merges returns the merge history of single
+    linkage clustering, see linkage_merges.
+    matrix - this parameter takes in the square similarity matrix
+    prefix - this parameter takes in merges that are already known to come
+    first
+    '''
+    return linkage_merges(matrix, "single", prefix)
+
+def linkage_tree(names, matrix, linkage="single", as_matrix=False):
+    '''
+    The function linkage_tree builds the phylogenetic tree of agglomerative
+    clustering with the given linkage, see linkage_merges.
+    names - this parameter takes in the list of genome names
+    matrix - this parameter takes in the square similarity matrix where
+    matrix[i][j] is the similarity between names[i] and names[j]
+    linkage - this parameter takes in "single", "complete", "average" or
+    "ward"
+    as_matrix - this parameter takes in True to get a LinkageMatrix
+    '''
+    return tree_from_merges(names, linkage_merges(matrix, linkage), as_matrix)
+
+def single_linkage_tree(names, matrix, as_matrix=False):
+    '''
+    The function single_linkage_tree builds the phylogenetic tree of single
+    linkage clustering, see linkage_merges.
+    names - this parameter takes in the list of genome names
+    matrix - this parameter takes in the square similarity matrix where
+    matrix[i][j] is the similarity between names[i] and names[j]
+    as_matrix - this parameter takes in True to get a LinkageMatrix
+    '''
+    return linkage_tree(names, matrix, "single", as_matrix)
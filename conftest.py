@@ -0,0 +1,27 @@
+'''
+File: conftest.py
+Author: Pri Vaghela
+Description: The program holds the pytest fixtures shared by the tests. The
+genomes of the tests are synthetic, see benchmark.synthetic_genomes, and are
+written to FASTA files in the temporary directory of every test.
+'''
+
+import pytest
+from benchmark import synthetic_genomes, write_fasta
+
+@pytest.fixture
+def fasta_file(tmp_path):
+    '''
+    The fixture fasta_file returns a function that writes a FASTA file of
+    related synthetic genomes to the temporary directory and returns its
+    name. The function takes in the number of genomes, the length of every
+    genome, the per-base mutation probability and the seed of the random
+    generator.
+    tmp_path - this parameter takes in the temporary directory of the test
+    '''
+    def write(count=16, length=400, mutation_rate=0.05, seed=0):
+        filename = str(tmp_path / "genomes{}-{}.fa".format(count, seed))
+        write_fasta(synthetic_genomes(count, length, mutation_rate, seed),
+                    filename)
+        return filename
+    return write
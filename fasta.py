@@ -0,0 +1,420 @@
+'''
+File: fasta.py
+Author: Pri Vaghela
+Description: The program parses FASTA files as a stream. The file is read in
+large binary chunks and the sequence of each record is handed out piece by
+piece, so that neither the lines of the file nor the whole sequence of a
+genome have to be held in memory. A .fai style index of the records lets
+a memory-mapped file be read for just the genomes that are needed. Files
+compressed with gzip, bzip2 or xz are recognized by their first bytes and
+decompressed in a background thread while the chunks are being parsed.
+'''
+
+import bz2
+import gzip
+import lzma
+import mmap
+import os
+import queue
+import threading
+
+CHUNK_SIZE = 1 << 22
+
+# the number of decompressed chunks that may wait for the parser
+QUEUE_SIZE = 4
+
+# the first bytes of compressed files and the functions that open them
+COMPRESSIONS = [(b"\x1f\x8b", "gzip", gzip.open), (b"BZh", "bzip2", bz2.open),
+                (b"\xfd7zXZ\x00", "xz", lzma.open)]
+
+# characters that are dropped from sequence lines
+WHITESPACE = b"\r\n\t "
+
+def header_name(header):
+    '''
+    The function header_name returns the name of a record, the first word of
+    its header line.
+    header - this parameter takes in the header line without the ">" as bytes
+    '''
+    words = header.split()
+    if len(words) == 0:
+        return ""
+    return words[0].decode("ascii", "replace")
+
+def read_chunks(file, chunk_size=CHUNK_SIZE):
+    '''
+    The function read_chunks yields the contents of a binary file object in
+    chunks of chunk_size bytes.
+    file - this parameter takes in the binary file object
+    chunk_size - this parameter takes in the number of bytes per chunk
+    '''
+    chunk = file.read(chunk_size)
+    while chunk:
+        yield chunk
+        chunk = file.read(chunk_size)
+
+def compression_of(filename):
+    '''
+    The function compression_of returns "gzip", "bzip2" or "xz" when a file
+    is compressed in that format, and None for a plain file.
+    filename - this parameter takes in the name of the file
+    '''
+    with open(filename, "rb") as file:
+        start = file.read(6)
+    for magic, name, opener in COMPRESSIONS:
+        if start.startswith(magic):
+            return name
+    return None
+
+def open_fasta(filename):
+    '''
+    The function open_fasta opens a FASTA file for reading in binary mode,
+    decompressing it on the fly when it is compressed.
+    filename - this parameter takes in the name of the FASTA file
+    '''
+    compression = compression_of(filename)
+    for magic, name, opener in COMPRESSIONS:
+        if name == compression:
+            return opener(filename, "rb")
+    return open(filename, "rb")
+
+def threaded_chunks(file, chunk_size=CHUNK_SIZE, queue_size=QUEUE_SIZE):
+    '''
+    The function threaded_chunks yields the same chunks as read_chunks, but
+    they are read in a background thread and handed over through a bounded
+    queue, so that reading, and decompressing, overlaps with the work done
+    on the chunks. An error in the thread is raised here, and the thread is
+    stopped when the chunks are not all used.
+    file - this parameter takes in the binary file object
+    chunk_size - this parameter takes in the number of bytes per chunk
+    queue_size - this parameter takes in the number of chunks that may wait
+    '''
+    chunks = queue.Queue(queue_size)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read():
+        try:
+            for chunk in read_chunks(file, chunk_size):
+                if not put(chunk):
+                    return
+            put(None)
+        except Exception as error:
+            put(error)
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        stop.set()
+        thread.join()
+
+def parse_fasta_chunks(chunks):
+    '''
+    The function parse_fasta_chunks turns a stream of chunks of a FASTA file
+    into a stream of (index, name, piece) tuples. index counts the records
+    from 0, and piece is a bytes piece of the record's sequence without line
+    breaks. Every record first yields an empty piece when its header is read,
+    so records with no sequence are not lost. Blank lines and any sequence
+    before the first header are ignored.
+    chunks - this parameter takes in an iterable of bytes chunks
+    '''
+    index = -1
+    name = None
+    header = b""
+    in_header = False
+    at_line_start = True
+    for chunk in chunks:
+        position = 0
+        while position < len(chunk):
+            if in_header:
+                end = chunk.find(b"\n", position)
+                if end < 0:
+                    header += chunk[position:]
+                    break
+                header += chunk[position:end]
+                position = end + 1
+                in_header = False
+                at_line_start = True
+                name = header_name(header)
+                yield index, name, b""
+            elif at_line_start and chunk[position] == ord(">"):
+                index += 1
+                header = b""
+                in_header = True
+                position += 1
+            else:
+                # the sequence runs until the next line that starts with ">"
+                end = chunk.find(b"\n>", position)
+                if end < 0:
+                    end = len(chunk)
+                else:
+                    end += 1
+                piece = chunk[position:end]
+                at_line_start = piece.endswith(b"\n")
+                position = end
+                piece = piece.translate(None, WHITESPACE)
+                if piece and name is not None:
+                    yield index, name, piece
+    if in_header:
+        yield index, header_name(header), b""
+
+def read_fasta_pieces(filename, chunk_size=CHUNK_SIZE, threaded=True):
+    '''
+    The function read_fasta_pieces opens a FASTA file in binary mode and
+    yields its (index, name, piece) tuples, see parse_fasta_chunks. A
+    compressed file is decompressed in a background thread, see
+    threaded_chunks.
+    filename - this parameter takes in the name of the FASTA file
+    chunk_size - this parameter takes in the number of bytes read at a time
+    threaded - this parameter takes in whether a compressed file is
+    decompressed in a background thread
+    '''
+    compressed = compression_of(filename) is not None
+    with open_fasta(filename) as file:
+        if compressed and threaded:
+            chunks = threaded_chunks(file, chunk_size)
+        else:
+            chunks = read_chunks(file, chunk_size)
+        yield from parse_fasta_chunks(chunks)
+
+def select_pieces(pieces, ids):
+    '''
+    The function select_pieces yields only the (index, name, piece) tuples
+    of the records named in ids, with the records numbered again from 0, and
+    raises a ValueError at the end for ids that were not in the stream.
+    pieces - this parameter takes in the iterable of (index, name, piece)
+    ids - this parameter takes in the collection of genome ids to keep
+    '''
+    wanted = set(ids)
+    found = set()
+    current = None
+    index = -1
+    for piece_index, name, piece in pieces:
+        if name not in wanted:
+            continue
+        if piece_index != current:
+            current = piece_index
+            index += 1
+            found.add(name)
+        yield index, name, piece
+    missing = wanted - found
+    if missing:
+        raise ValueError("unknown genome ids: {}".format(
+            ", ".join(sorted(missing))))
+
+def group_records(pieces):
+    '''
+    The function group_records turns a stream of (index, name, piece) tuples
+    into a stream of (name, sequence) records, one record at a time.
+    pieces - this parameter takes in the iterable of (index, name, piece)
+    '''
+    current = None
+    name = None
+    sequence = []
+    for index, piece_name, piece in pieces:
+        if index != current:
+            if current is not None:
+                yield name, b"".join(sequence).decode("ascii", "replace")
+            current = index
+            name = piece_name
+            sequence = []
+        sequence.append(piece)
+    if current is not None:
+        yield name, b"".join(sequence).decode("ascii", "replace")
+
+def read_fasta_records(filename, chunk_size=CHUNK_SIZE):
+    '''
+    The function read_fasta_records yields the (name, sequence) records of a
+    FASTA file one at a time.
+    filename - this parameter takes in the name of the FASTA file
+    chunk_size - this parameter takes in the number of bytes read at a time
+    '''
+    return group_records(read_fasta_pieces(filename, chunk_size))
+
+class FastaIndexEntry:
+    '''
+    The class FastaIndexEntry is one line of a .fai index, the location of
+    the sequence of one record in a FASTA file.
+    '''
+    def __init__(self, name, length, offset, line_bases, line_width):
+        '''
+        initializing the name, the number of bases, the byte offset of the
+        first base, the number of bases per line and the number of bytes per
+        line including the line break
+        '''
+        self._name = name
+        self._length = length
+        self._offset = offset
+        self._line_bases = line_bases
+        self._line_width = line_width
+
+    def get_name(self):
+        '''
+        The method get_name returns the name of the record.
+        '''
+        return self._name
+
+    def get_length(self):
+        '''
+        The method get_length returns the number of bases of the record.
+        '''
+        return self._length
+
+    def get_offset(self):
+        '''
+        The method get_offset returns the byte offset of the first base.
+        '''
+        return self._offset
+
+    def end_offset(self):
+        '''
+        The method end_offset returns the byte offset just past the last base.
+        '''
+        if self._length == 0:
+            return self._offset
+        lines, rest = divmod(self._length, self._line_bases)
+        return self._offset + lines * self._line_width + rest
+
+    def __str__(self):
+        '''
+        The method __str__ returns the record as a tab separated .fai line.
+        '''
+        return "{}\t{}\t{}\t{}\t{}".format(self._name, self._length,
+                                           self._offset, self._line_bases,
+                                           self._line_width)
+
+def build_fasta_index(filename):
+    '''
+    The function build_fasta_index scans a FASTA file once and returns the
+    list of FastaIndexEntry objects of its records. Like samtools faidx it
+    needs every sequence line of a record but the last to have the same
+    length, and raises a ValueError otherwise.
+    filename - this parameter takes in the name of the FASTA file
+    '''
+    entries = []
+    record = None
+    offset = 0
+    with open(filename, "rb") as file:
+        for line in file:
+            if line.startswith(b">"):
+                if record is not None:
+                    entries.append(FastaIndexEntry(*record[:5]))
+                # name, length, offset, line bases, line width, last line seen
+                record = [header_name(line[1:]), 0, offset + len(line), 0, 0,
+                          False]
+            elif record is not None:
+                bases = len(line.rstrip(b"\r\n"))
+                if bases == 0:
+                    record[5] = True
+                elif record[5] or (record[3] and bases > record[3]):
+                    raise ValueError("record {} has lines of different "
+                                     "lengths".format(record[0]))
+                else:
+                    if record[3] == 0:
+                        record[3] = bases
+                        record[4] = len(line)
+                    elif bases < record[3] or len(line) != record[4]:
+                        # a shorter line has to be the last one
+                        record[5] = True
+                    record[1] += bases
+            offset += len(line)
+    if record is not None:
+        entries.append(FastaIndexEntry(*record[:5]))
+    return entries
+
+def write_fasta_index(entries, index_filename):
+    '''
+    The function write_fasta_index writes the entries as a .fai file.
+    entries - this parameter takes in the list of FastaIndexEntry objects
+    index_filename - this parameter takes in the name of the index file
+    '''
+    with open(index_filename, "w") as file:
+        for entry in entries:
+            file.write(str(entry) + "\n")
+
+def read_fasta_index(index_filename):
+    '''
+    The function read_fasta_index reads a .fai file back into a list of
+    FastaIndexEntry objects.
+    index_filename - this parameter takes in the name of the index file
+    '''
+    entries = []
+    with open(index_filename, "r") as file:
+        for line in file:
+            name, *numbers = line.rstrip("\n").split("\t")
+            entries.append(FastaIndexEntry(name, *map(int, numbers[:4])))
+    return entries
+
+def load_fasta_index(filename):
+    '''
+    The function load_fasta_index returns the index of a FASTA file. The
+    index is read from filename + ".fai" when that file is newer than the
+    FASTA file, otherwise it is rebuilt and saved there.
+    filename - this parameter takes in the name of the FASTA file
+    '''
+    index_filename = filename + ".fai"
+    if os.path.exists(index_filename) and \
+       os.path.getmtime(index_filename) >= os.path.getmtime(filename):
+        return read_fasta_index(index_filename)
+    entries = build_fasta_index(filename)
+    try:
+        write_fasta_index(entries, index_filename)
+    except OSError:
+        # the index still works from memory when the directory is read-only
+        pass
+    return entries
+
+def read_indexed_pieces(filename, ids=None, chunk_size=CHUNK_SIZE):
+    '''
+    The function read_indexed_pieces memory-maps a FASTA file and yields the
+    (index, name, piece) tuples of only the records named in ids, in file
+    order, reading nothing but their sequence bytes. All records are read
+    when ids is None, and a ValueError is raised for ids not in the file.
+    A compressed file cannot be memory-mapped, it is read as a stream and
+    the other records are skipped.
+    filename - this parameter takes in the name of the FASTA file
+    ids - this parameter takes in the collection of genome ids to read
+    chunk_size - this parameter takes in the number of bytes per piece
+    '''
+    if compression_of(filename) is not None:
+        pieces = read_fasta_pieces(filename, chunk_size)
+        if ids is None:
+            yield from pieces
+        else:
+            yield from select_pieces(pieces, ids)
+        return
+    entries = load_fasta_index(filename)
+    if ids is not None:
+        wanted = set(ids)
+        missing = wanted - set(entry.get_name() for entry in entries)
+        if missing:
+            raise ValueError("unknown genome ids: {}".format(
+                ", ".join(sorted(missing))))
+        entries = [entry for entry in entries if entry.get_name() in wanted]
+    with open(filename, "rb") as file:
+        if os.path.getsize(filename) == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for index, entry in enumerate(entries):
+                yield index, entry.get_name(), b""
+                end = entry.end_offset()
+                for start in range(entry.get_offset(), end, chunk_size):
+                    stop = min(start + chunk_size, end)
+                    yield index, entry.get_name(), \
+                        mapped[start:stop].translate(None, WHITESPACE)
@@ -1,44 +1,398 @@
-'''
-File: genome.py
-Author: Pri Vaghela
-Description: The program is to create the GenomeData class that gets imported 
-in phylo.py.
-'''
-
-class GenomeData:
-    def __init__(self,name,sequence):
-        '''
-        intializing the name and sequence to the parameters and ngrams to an 
-        empty set
-        '''
-        self._id = name
-        self._sequence = sequence 
-        self._ngrams = set()
-    
-    def create_ngrams(self, n):
-        '''
-        The method create_ngrams creates n-grams from the sequence by splitting
-        it into substrings of length n.
-        n - this parameter takes in an integer n for the substring length
-        '''
-        self._ngrams = \
-            set(self._sequence[i:i+n] for i in range(len(self._sequence)-n+1))
-
-    def get_id(self):
-        '''
-        The method get_id returns the id. 
-        '''
-        return self._id
-    
-    def get_sequence(self):
-        '''
-        The method get_sequence returns the sequence. 
-        '''
-        return self._sequence
-    
-    def get_ngrams(self):
-        '''
-        The method get_ngrams returns the ngrams. 
-        '''
-        return self._ngrams
-    
+'''
+File: genome.py
+Author: Pri Vaghela
+Description: The program is to create the GenomeData class that gets imported 
+in phylo.py.
+'''
+
+import numpy as np
+from fasta import group_records
+from kmers import encode_kmers, encode_kmer_sizes, count_kmers, sorted_unique
+from kmer_counts import KmerCounts, merge_kmer_counts
+from sketch import MinHashSketch, hash_kmers, merge_sketch_hashes, \
+    DEFAULT_SKETCH_SIZE, DEFAULT_SEED
+
+MODES = ("set", "compact", "sketch", "canonical", "canonical-sketch", "counts",
+         "canonical-counts")
+
+# the modes that keep a MinHash sketch, and the modes that store every k-mer
+# as the smaller of its code and the code of its reverse complement
+SKETCH_MODES = ("sketch", "canonical-sketch")
+CANONICAL_MODES = ("canonical", "canonical-sketch", "canonical-counts")
+
+# the modes that keep how many times every k-mer occurs
+COUNT_MODES = ("counts", "canonical-counts")
+
+# the number of pending k-mer codes after which they are merged and deduped
+MERGE_SIZE = 1 << 20
+
+class NgramBuilder:
+    '''
+    The class NgramBuilder creates the n-grams of a sequence that arrives in
+    pieces, in any of the modes of GenomeData.create_ngrams. The last n-1
+    characters of each piece are carried over to the next one so that the
+    n-grams that span two pieces are not lost.
+    '''
+    def __init__(self, n, mode="set", sketch_size=DEFAULT_SKETCH_SIZE,
+                 seed=DEFAULT_SEED):
+        '''
+        initializing the n-gram size, the mode, the sketch settings, the
+        carried characters and the n-grams collected so far
+        '''
+        if mode not in MODES:
+            raise ValueError("unknown n-gram mode: {}".format(mode))
+        self._n = n
+        self._mode = mode
+        self._sketch_size = sketch_size
+        self._seed = seed
+        self._carry = ""
+        self._ngrams = set()
+        self._kmers = np.zeros(0, dtype=np.uint64)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._pending = []
+        self._pending_counts = []
+        self._pending_size = 0
+
+    def add(self, piece):
+        '''
+        The method add adds the n-grams of the next piece of the sequence.
+        piece - this parameter takes in the next piece of the sequence as a str
+        '''
+        text = self._carry + piece
+        n = self._n
+        if self._mode == "set":
+            self._ngrams.update(text[i:i+n] for i in range(len(text)-n+1))
+        elif self._mode in COUNT_MODES:
+            kmers, counts = count_kmers(text, n, self._mode in CANONICAL_MODES)
+            self._pending.append(kmers)
+            self._pending_counts.append(counts)
+            self._pending_size += len(kmers)
+            if self._pending_size > max(MERGE_SIZE, len(self._kmers)):
+                self._merge()
+        elif self._mode not in SKETCH_MODES:
+            kmers = encode_kmers(text, n, self._mode in CANONICAL_MODES)
+            self._pending.append(kmers)
+            self._pending_size += len(kmers)
+            if self._pending_size > max(MERGE_SIZE, len(self._kmers)):
+                self._merge()
+        else:
+            self._kmers = merge_sketch_hashes(self._kmers, \
+                hash_kmers(encode_kmers(text, n, \
+                                        self._mode in CANONICAL_MODES), \
+                           self._seed), self._sketch_size)
+        self._carry = text[max(0, len(text)-(n-1)):]
+
+    def _merge(self):
+        '''
+        The method _merge merges the pending k-mer codes into the sorted array
+        of distinct codes, adding up their counts in the count modes.
+        '''
+        if self._mode in COUNT_MODES:
+            self._kmers, self._counts = merge_kmer_counts( \
+                [self._kmers] + self._pending, \
+                [self._counts] + self._pending_counts)
+        else:
+            self._kmers = sorted_unique(np.concatenate([self._kmers] + \
+                                                       self._pending))
+        self._pending = []
+        self._pending_counts = []
+        self._pending_size = 0
+
+    def get_ngrams(self):
+        '''
+        The method get_ngrams returns the n-grams of everything added so far,
+        a set, a sorted array of codes, a MinHashSketch or KmerCounts
+        depending on the mode.
+        '''
+        if self._mode == "set":
+            return self._ngrams
+        if self._mode in COUNT_MODES:
+            if self._pending:
+                self._merge()
+            return KmerCounts(self._kmers, self._counts)
+        if self._mode not in SKETCH_MODES:
+            if self._pending:
+                self._merge()
+            return self._kmers
+        return MinHashSketch(self._kmers, self._sketch_size, self._seed)
+
+class NgramSweepBuilder:
+    '''
+    The class NgramSweepBuilder creates the n-grams of a sequence that
+    arrives in pieces for a whole range of n-gram sizes at once, in the same
+    modes as NgramBuilder. In every mode but "set" and the count modes each
+    piece is encoded in one pass for all the sizes, see
+    kmers.encode_kmer_sizes.
+    '''
+    def __init__(self, sizes, mode="set", sketch_size=DEFAULT_SKETCH_SIZE,
+                 seed=DEFAULT_SEED):
+        '''
+        initializing the n-gram sizes, the mode, the sketch settings, the
+        carried characters and the n-grams collected so far for every size
+        '''
+        if mode not in MODES:
+            raise ValueError("unknown n-gram mode: {}".format(mode))
+        self._sizes = sorted(set(sizes))
+        self._mode = mode
+        self._sketch_size = sketch_size
+        self._seed = seed
+        self._carry = ""
+        self._ngrams = dict((n, set()) for n in self._sizes)
+        self._kmers = dict((n, np.zeros(0, dtype=np.uint64))
+                           for n in self._sizes)
+        self._counts = dict((n, np.zeros(0, dtype=np.int64))
+                            for n in self._sizes)
+        self._pending = dict((n, []) for n in self._sizes)
+        self._pending_counts = dict((n, []) for n in self._sizes)
+        self._pending_size = 0
+
+    def add(self, piece):
+        '''
+        The method add adds the n-grams of every size of the next piece of
+        the sequence.
+        piece - this parameter takes in the next piece of the sequence as a str
+        '''
+        text = self._carry + piece
+        longest = self._sizes[-1]
+        if self._mode == "set":
+            for n in self._sizes:
+                self._ngrams[n].update(text[i:i+n]
+                                       for i in range(len(text)-n+1))
+        elif self._mode in COUNT_MODES:
+            for n in self._sizes:
+                # the k-mers that fit in the carry were counted already
+                start = max(0, len(self._carry) - (n - 1))
+                kmers, counts = count_kmers(text[start:], n,
+                                            self._mode in CANONICAL_MODES)
+                self._pending[n].append(kmers)
+                self._pending_counts[n].append(counts)
+            self._pending_size += len(text)
+            if self._pending_size > max(MERGE_SIZE,
+                                        len(self._kmers[longest])):
+                self._merge()
+        elif self._mode not in SKETCH_MODES:
+            for n, kmers in encode_kmer_sizes(text, self._sizes, \
+                    self._mode in CANONICAL_MODES).items():
+                self._pending[n].append(kmers)
+            self._pending_size += len(text)
+            if self._pending_size > max(MERGE_SIZE,
+                                        len(self._kmers[longest])):
+                self._merge()
+        else:
+            for n, kmers in encode_kmer_sizes(text, self._sizes, \
+                    self._mode in CANONICAL_MODES).items():
+                self._kmers[n] = merge_sketch_hashes(self._kmers[n], \
+                    hash_kmers(kmers, self._seed), self._sketch_size)
+        # the carry is long enough for the longest n-grams, shorter ones
+        # that start in it were already found and are dropped as repeats
+        self._carry = text[max(0, len(text)-(longest-1)):]
+
+    def _merge(self):
+        '''
+        The method _merge merges the pending k-mer codes of every size into
+        its sorted array of distinct codes, adding up their counts in the
+        count modes.
+        '''
+        for n in self._sizes:
+            if self._mode in COUNT_MODES:
+                self._kmers[n], self._counts[n] = merge_kmer_counts( \
+                    [self._kmers[n]] + self._pending[n], \
+                    [self._counts[n]] + self._pending_counts[n])
+            else:
+                self._kmers[n] = sorted_unique(np.concatenate( \
+                    [self._kmers[n]] + self._pending[n]))
+            self._pending[n] = []
+            self._pending_counts[n] = []
+        self._pending_size = 0
+
+    def get_ngrams(self):
+        '''
+        The method get_ngrams returns a dictionary from every n-gram size to
+        the n-grams of that size of everything added so far.
+        '''
+        if self._mode == "set":
+            return dict(self._ngrams)
+        if self._mode not in SKETCH_MODES:
+            if self._pending_size:
+                self._merge()
+            if self._mode in COUNT_MODES:
+                return dict((n, KmerCounts(self._kmers[n], self._counts[n]))
+                            for n in self._sizes)
+            return dict(self._kmers)
+        return dict((n, MinHashSketch(kmers, self._sketch_size, self._seed))
+                    for n, kmers in self._kmers.items())
+
+class GenomeData:
+    def __init__(self,name,sequence):
+        '''
+        intializing the name and sequence to the parameters and ngrams to an 
+        empty set
+        '''
+        self._id = name
+        self._sequence = sequence 
+        self._ngrams = set()
+    
+    def create_ngrams(self, n, mode="set", sketch_size=DEFAULT_SKETCH_SIZE,
+                      seed=DEFAULT_SEED):
+        '''
+        The method create_ngrams creates n-grams from the sequence by splitting
+        it into substrings of length n. In the "compact" mode the n-grams are
+        stored as a sorted NumPy uint64 array of 2-bit per base codes instead
+        of a set of substrings, in the "sketch" mode only a MinHash sketch
+        of them is kept, and in the "counts" mode they are kept as KmerCounts
+        with the number of times every k-mer occurs. The "canonical",
+        "canonical-sketch" and "canonical-counts" modes are the same with
+        every k-mer taken as the smaller of its code and the code of its
+        reverse complement, so the strand of a genome does not matter.
+        n - this parameter takes in an integer n for the substring length
+        mode - this parameter takes in one of MODES
+        sketch_size - this parameter takes in the number of hashes to keep
+        seed - this parameter takes in the seed of the sketch hash function
+        '''
+        builder = NgramBuilder(n, mode, sketch_size, seed)
+        builder.add(self._sequence)
+        self._ngrams = builder.get_ngrams()
+
+    def create_ngram_sweep(self, sizes, mode="set",
+                           sketch_size=DEFAULT_SKETCH_SIZE, seed=DEFAULT_SEED):
+        '''
+        The method create_ngram_sweep returns a dictionary from every n-gram
+        size in sizes to the n-grams of that size of the sequence, built in
+        one pass over it. The n-grams of the genome itself are not changed.
+        sizes - this parameter takes in the n-gram sizes
+        mode - this parameter takes in one of MODES
+        sketch_size - this parameter takes in the number of hashes to keep
+        seed - this parameter takes in the seed of the sketch hash function
+        '''
+        builder = NgramSweepBuilder(sizes, mode, sketch_size, seed)
+        builder.add(self._sequence)
+        return builder.get_ngrams()
+
+    def set_ngrams(self, ngrams):
+        '''
+        The method set_ngrams sets the n-grams, for example ones that were
+        built while the sequence was being read.
+        ngrams - this parameter takes in the n-grams
+        '''
+        self._ngrams = ngrams
+
+    def get_id(self):
+        '''
+        The method get_id returns the id. 
+        '''
+        return self._id
+    
+    def get_sequence(self):
+        '''
+        The method get_sequence returns the sequence. 
+        '''
+        return self._sequence
+    
+    def get_ngrams(self):
+        '''
+        The method get_ngrams returns the ngrams. 
+        '''
+        return self._ngrams
+
+def genomes_from_pieces(pieces, n, mode="set", sketch_size=DEFAULT_SKETCH_SIZE,
+                        seed=DEFAULT_SEED, keep_sequence=True, cache=None):
+    '''
+    The function genomes_from_pieces turns a stream of (index, name, piece)
+    tuples, as yielded by fasta.read_fasta_pieces, into a stream of
+    GenomeData objects with their n-grams. The n-grams are built while the
+    pieces arrive, and unless keep_sequence is True the sequence itself is
+    never put together and the GenomeData has None as its sequence.
+    pieces - this parameter takes in the iterable of (index, name, piece)
+    n - this parameter takes in the n-gram size
+    mode - this parameter takes in one of MODES
+    sketch_size - this parameter takes in the number of hashes to keep
+    seed - this parameter takes in the seed of the sketch hash function
+    keep_sequence - this parameter takes in whether to keep the sequences
+    cache - this parameter takes in a KmerCache to look the n-grams up in, or
+    None
+    '''
+    if cache is not None:
+        # the whole sequence is needed for its digest before the n-grams
+        for name, sequence in group_records(pieces):
+            genome = GenomeData(name, sequence if keep_sequence else None)
+            genome.set_ngrams(cache.get_ngrams(sequence, n, mode, sketch_size,
+                                               seed))
+            yield genome
+        return
+    current = None
+    for index, name, piece in pieces:
+        if index != current:
+            if current is not None:
+                yield make_genome(genome_name, builder, sequence)
+            current = index
+            genome_name = name
+            builder = NgramBuilder(n, mode, sketch_size, seed)
+            sequence = [] if keep_sequence else None
+        piece = piece.decode("ascii", "replace")
+        builder.add(piece)
+        if keep_sequence:
+            sequence.append(piece)
+    if current is not None:
+        yield make_genome(genome_name, builder, sequence)
+
+def make_genome(name, builder, sequence):
+    '''
+    The function make_genome creates the GenomeData of a record once all of
+    its pieces have been added to the builder.
+    name - this parameter takes in the name of the genome
+    builder - this parameter takes in the NgramBuilder of the genome
+    sequence - this parameter takes in the list of pieces, or None
+    '''
+    if sequence is not None:
+        sequence = "".join(sequence)
+    genome = GenomeData(name, sequence)
+    genome.set_ngrams(builder.get_ngrams())
+    return genome
+
+def genome_sweeps_from_pieces(pieces, sizes, mode="set",
+                              sketch_size=DEFAULT_SKETCH_SIZE,
+                              seed=DEFAULT_SEED, keep_sequence=True):
+    '''
+    The function genome_sweeps_from_pieces is genomes_from_pieces for a
+    range of n-gram sizes. It yields a dictionary from every size to a
+    GenomeData with the n-grams of that size for every record, all built in
+    one pass over the pieces. The GenomeData objects of a record share one
+    sequence.
+    pieces - this parameter takes in the iterable of (index, name, piece)
+    sizes - this parameter takes in the n-gram sizes
+    mode - this parameter takes in one of MODES
+    sketch_size - this parameter takes in the number of hashes to keep
+    seed - this parameter takes in the seed of the sketch hash function
+    keep_sequence - this parameter takes in whether to keep the sequences
+    '''
+    current = None
+    for index, name, piece in pieces:
+        if index != current:
+            if current is not None:
+                yield make_genome_sweep(genome_name, builder, sequence)
+            current = index
+            genome_name = name
+            builder = NgramSweepBuilder(sizes, mode, sketch_size, seed)
+            sequence = [] if keep_sequence else None
+        piece = piece.decode("ascii", "replace")
+        builder.add(piece)
+        if keep_sequence:
+            sequence.append(piece)
+    if current is not None:
+        yield make_genome_sweep(genome_name, builder, sequence)
+
+def make_genome_sweep(name, builder, sequence):
+    '''
+    The function make_genome_sweep creates the GenomeData of a record for
+    every n-gram size once all of its pieces have been added to the builder.
+    name - this parameter takes in the name of the genome
+    builder - this parameter takes in the NgramSweepBuilder of the genome
+    sequence - this parameter takes in the list of pieces, or None
+    '''
+    if sequence is not None:
+        sequence = "".join(sequence)
+    genomes = {}
+    for n, ngrams in builder.get_ngrams().items():
+        genomes[n] = GenomeData(name, sequence)
+        genomes[n].set_ngrams(ngrams)
+    return genomes
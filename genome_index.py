@@ -0,0 +1,319 @@
+'''
+File: genome_index.py
+Author: Pri Vaghela
+Description: The program keeps an index of the MinHash sketches of a genome
+collection and answers which stored genomes are the most similar to a new
+sequence, without building a tree or comparing the sequence with every
+genome. The index is inverted: the hashes of all the sketches are sorted
+together with the genome each one came from, so the genomes sharing a hash
+with the query are found with a binary search per query hash. Only those
+genomes are ever looked at, the ones sharing the most hashes are compared
+exactly, and the time of a query does not grow with the genomes that have
+nothing in common with it. The index is saved as .npy files that are
+memory-mapped when it is loaded again.
+'''
+
+import argparse
+import json
+import os
+import numpy as np
+from genome import NgramBuilder, SKETCH_MODES
+from sketch import MinHashSketch, sketch_similarity, DEFAULT_SKETCH_SIZE, \
+    DEFAULT_SEED
+
+# the number of candidates per asked for result that are compared exactly
+CANDIDATES = 4
+
+# the arrays of an index, each saved as a .npy file of that name
+INDEX_ARRAYS = ("sketches", "offsets", "hashes", "owners")
+
+class GenomeIndex:
+    '''
+    The class GenomeIndex is an inverted index of the MinHash sketches of a
+    collection of genomes that answers top-k similarity queries.
+    '''
+    def __init__(self, n, mode="sketch", sketch_size=DEFAULT_SKETCH_SIZE,
+                 seed=DEFAULT_SEED):
+        '''
+        initializing the n-gram settings of the sketches, the genome names,
+        the hashes of every genome one after the other with the offset of
+        every genome, the sorted hashes of all the genomes with the genome of
+        every hash, and the genomes added since the hashes were last sorted
+        '''
+        if mode not in SKETCH_MODES:
+            raise ValueError("the index keeps sketches, the mode must be one "
+                             "of {}".format(", ".join(SKETCH_MODES)))
+        self._n = n
+        self._mode = mode
+        self._sketch_size = sketch_size
+        self._seed = seed
+        self._names = []
+        self._positions = {}
+        self._sketches = np.zeros(0, dtype=np.uint64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._owners = np.zeros(0, dtype=np.int64)
+        self._pending = []
+
+    def get_n(self):
+        '''
+        The method get_n returns the n-gram size of the sketches.
+        '''
+        return self._n
+
+    def get_mode(self):
+        '''
+        The method get_mode returns the n-gram mode of the sketches.
+        '''
+        return self._mode
+
+    def get_sketch_size(self):
+        '''
+        The method get_sketch_size returns the number of hashes per sketch.
+        '''
+        return self._sketch_size
+
+    def get_seed(self):
+        '''
+        The method get_seed returns the seed of the sketch hash function.
+        '''
+        return self._seed
+
+    def get_names(self):
+        '''
+        The method get_names returns the list of genome names, in the order
+        they were added.
+        '''
+        return self._names
+
+    def __len__(self):
+        '''
+        The method __len__ returns the number of genomes in the index.
+        '''
+        return len(self._names)
+
+    def sketch(self, sequence):
+        '''
+        The method sketch returns the MinHashSketch of a sequence with the
+        settings of the index.
+        sequence - this parameter takes in the sequence as a str
+        '''
+        builder = NgramBuilder(self._n, self._mode, self._sketch_size,
+                               self._seed)
+        builder.add(sequence)
+        return builder.get_ngrams()
+
+    def _as_sketch(self, ngrams):
+        '''
+        The method _as_sketch returns a sketch as it is, or the sketch of a
+        sequence, after checking that it can be compared with the index.
+        ngrams - this parameter takes in a MinHashSketch or a sequence
+        '''
+        if not isinstance(ngrams, MinHashSketch):
+            return self.sketch(ngrams)
+        if ngrams.get_size() != self._sketch_size or \
+           ngrams.get_seed() != self._seed:
+            raise ValueError("the sketch does not have the size and seed of "
+                             "the index")
+        return ngrams
+
+    def add(self, name, ngrams):
+        '''
+        The method add adds a genome to the index. It raises ValueError when
+        a genome of that name is already there.
+        name - this parameter takes in the name of the genome
+        ngrams - this parameter takes in the MinHashSketch of the genome,
+        built with the settings of the index, or its sequence
+        '''
+        if name in self._positions:
+            raise ValueError("the genome {} is already in the index"
+                             .format(name))
+        sketch = self._as_sketch(ngrams)
+        self._positions[name] = len(self._names)
+        self._names.append(name)
+        self._pending.append(np.asarray(sketch.get_hashes(), dtype=np.uint64))
+
+    def add_genome_data(self, genome_data):
+        '''
+        The method add_genome_data adds every genome of a dictionary of
+        genome data, with the sketches it already has or else the sketches
+        of its sequences.
+        genome_data - this parameter takes in the dictionary of genome data
+        where each genome is represented as a GenomeData object
+        '''
+        for name, genome in genome_data.items():
+            ngrams = genome.get_ngrams()
+            if not isinstance(ngrams, MinHashSketch):
+                ngrams = genome.get_sequence()
+                if ngrams is None:
+                    raise ValueError("the genome {} has neither a sketch nor "
+                                     "a sequence".format(name))
+            self.add(name, ngrams)
+
+    def _merge(self):
+        '''
+        The method _merge puts the hashes of the genomes added since the last
+        merge into the arrays of the index and sorts the inverted hashes
+        again.
+        '''
+        first = len(self._offsets) - 1
+        lengths = [len(hashes) for hashes in self._pending]
+        self._sketches = np.concatenate([self._sketches] + self._pending)
+        self._offsets = np.concatenate((self._offsets, self._offsets[-1] +
+                                        np.cumsum(lengths, dtype=np.int64)))
+        hashes = np.concatenate([self._hashes] + self._pending)
+        owners = np.concatenate((self._owners, np.repeat(
+            np.arange(first, first + len(lengths), dtype=np.int64), lengths)))
+        order = np.argsort(hashes, kind="stable")
+        self._hashes = hashes[order]
+        self._owners = owners[order]
+        self._pending = []
+
+    def get_sketch(self, name):
+        '''
+        The method get_sketch returns the MinHashSketch of a stored genome.
+        name - this parameter takes in the name of the genome
+        '''
+        if self._pending:
+            self._merge()
+        genome = self._positions[name]
+        return MinHashSketch(self._sketches[self._offsets[genome]:
+                                            self._offsets[genome + 1]],
+                             self._sketch_size, self._seed)
+
+    def query(self, query, k=10):
+        '''
+        The method query returns the k stored genomes most similar to a query
+        as a list of (name, similarity), the most similar first. The genomes
+        sharing a hash with the query are counted with one binary search per
+        query hash, and the CANDIDATES * k of them sharing the most hashes
+        get their Jaccard similarity estimated from the sketches. Genomes
+        sharing no hash are never returned.
+        query - this parameter takes in a MinHashSketch built with the
+        settings of the index, or a sequence
+        k - this parameter takes in the number of genomes to return
+        '''
+        sketch = self._as_sketch(query)
+        if self._pending:
+            self._merge()
+        hashes = sketch.get_hashes()
+        starts = np.searchsorted(self._hashes, hashes, side="left")
+        stops = np.searchsorted(self._hashes, hashes, side="right")
+        lengths = stops - starts
+        # the positions of every matching hash, one range per query hash
+        positions = np.arange(lengths.sum()) - \
+            np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+        candidates, shared = np.unique(self._owners[positions],
+                                       return_counts=True)
+        best = candidates[np.lexsort((candidates, -shared))[:CANDIDATES * k]]
+        results = []
+        for genome in best.tolist():
+            stored = MinHashSketch(self._sketches[self._offsets[genome]:
+                                                  self._offsets[genome + 1]],
+                                   self._sketch_size, self._seed)
+            results.append((-sketch_similarity(sketch, stored), genome))
+        results.sort()
+        return [(self._names[genome], -similarity)
+                for similarity, genome in results[:k]]
+
+    def save(self, directory):
+        '''
+        The method save writes the index to a directory, one .npy file per
+        array and a JSON file with the settings and the names. Every file is
+        written to a temporary name first, and the settings, which are
+        written last, hold the number of hashes so that load notices an index
+        that was not saved completely.
+        directory - this parameter takes in the directory
+        '''
+        if self._pending:
+            self._merge()
+        os.makedirs(directory, exist_ok=True)
+        for name in INDEX_ARRAYS:
+            path = os.path.join(directory, name + ".npy")
+            with open(path + ".tmp", "wb") as file:
+                np.save(file, getattr(self, "_" + name))
+            os.replace(path + ".tmp", path)
+        settings = {"n": self._n, "mode": self._mode,
+                    "sketch_size": self._sketch_size, "seed": self._seed,
+                    "length": len(self._hashes), "names": self._names}
+        path = os.path.join(directory, "index.json")
+        with open(path + ".tmp", "w") as file:
+            json.dump(settings, file)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, directory):
+        '''
+        The method load reads an index written by save. The arrays are
+        memory-mapped, so only the parts that queries touch are read from
+        disk. It raises ValueError when the files do not make a complete
+        index.
+        directory - this parameter takes in the directory
+        '''
+        with open(os.path.join(directory, "index.json"), "r") as file:
+            settings = json.load(file)
+        index = cls(settings["n"], settings["mode"], settings["sketch_size"],
+                    settings["seed"])
+        for name in INDEX_ARRAYS:
+            setattr(index, "_" + name, np.load(os.path.join(directory,
+                                                            name + ".npy"),
+                                               mmap_mode="r"))
+        index._names = settings["names"]
+        index._positions = dict((name, i) for i, name in
+                                enumerate(index._names))
+        if len(index._hashes) != settings["length"] or \
+           len(index._sketches) != settings["length"] or \
+           len(index._offsets) != len(index._names) + 1:
+            raise ValueError("the index in {} is not complete"
+                             .format(directory))
+        return index
+
+def main(arguments=None):
+    '''
+    The main function adds the genomes of FASTA files to an index directory,
+    creating it when it does not exist yet, and prints the most similar
+    stored genomes of every record of the query FASTA files.
+    arguments - this parameter takes in the list of arguments, or None for
+    sys.argv
+    '''
+    # phylo is only needed to read FASTA files on the command line
+    from phylo import read_fasta_file
+    parser = argparse.ArgumentParser(description="Find the stored genomes "
+                                     "most similar to new sequences.")
+    parser.add_argument("index", help="index directory")
+    parser.add_argument("--add", nargs="+", default=[],
+                        help="FASTA files to add to the index")
+    parser.add_argument("--query", nargs="+", default=[],
+                        help="FASTA files of the sequences to look up")
+    parser.add_argument("-k", type=int, default=10,
+                        help="number of genomes per query")
+    parser.add_argument("-n", "--n-gram", type=int, default=21,
+                        help="n-gram size of a new index")
+    parser.add_argument("--mode", default="sketch", choices=SKETCH_MODES)
+    parser.add_argument("--sketch-size", type=int,
+                        default=DEFAULT_SKETCH_SIZE)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    options = parser.parse_args(arguments)
+    if os.path.exists(os.path.join(options.index, "index.json")):
+        index = GenomeIndex.load(options.index)
+    else:
+        index = GenomeIndex(options.n_gram, options.mode, options.sketch_size,
+                            options.seed)
+    settings = (index.get_n(), index.get_mode(), index.get_sketch_size(),
+                index.get_seed())
+    for filename in options.add:
+        index.add_genome_data(read_fasta_file(filename, *settings,
+                                              keep_sequence=False))
+    if options.add or not os.path.exists(options.index):
+        index.save(options.index)
+    for filename in options.query:
+        genome_data = read_fasta_file(filename, *settings,
+                                      keep_sequence=False)
+        for name, genome in genome_data.items():
+            print("# " + name)
+            for match, similarity in index.query(genome.get_ngrams(),
+                                                 options.k):
+                print("{}\t{:.6f}".format(match, similarity))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+'''
+File: incremental.py
+Author: Pri Vaghela
+Description: The program updates a phylogenetic tree when new genomes are
+appended to a FASTA file. The similarity matrix and the merge history of the
+previous run are saved in a state directory, so that only the similarities
+of the new genomes have to be computed. The merges of the old history that
+are stronger than any similarity of a new genome come first in the new
+history too, so they are replayed instead of searched for, and the result
+is the same tree as a build from scratch.
+'''
+
+import json
+import os
+import numpy as np
+from cluster import linkage_merges, tree_from_merges
+from kmer_cache import sequence_digest
+from similarity import similarity_matrix, similarity_rows
+
+def load_state(directory):
+    '''
+    The function load_state returns the saved settings, similarity matrix and
+    merge history in a state directory, or None when there is no state.
+    directory - this parameter takes in the name of the state directory
+    '''
+    try:
+        with open(os.path.join(directory, "state.json"), "r") as file:
+            settings = json.load(file)
+        matrix = np.load(os.path.join(directory, "matrix.npy"))
+        merges = np.load(os.path.join(directory, "merges.npy"))
+    except (OSError, ValueError):
+        return None
+    return settings, matrix, merges
+
+def save_state(directory, settings, matrix, merges):
+    '''
+    The function save_state saves the settings, similarity matrix and merge
+    history of a run in a state directory. Every file is written under a
+    temporary name first and then moved into place.
+    directory - this parameter takes in the name of the state directory
+    settings - this parameter takes in the dictionary of settings
+    matrix - this parameter takes in the similarity matrix
+    merges - this parameter takes in the list of (a, b, similarity) merges
+    '''
+    os.makedirs(directory, exist_ok=True)
+    for name, array in (("matrix.npy", matrix),
+                        ("merges.npy", np.array(merges, dtype=np.float64))):
+        path = os.path.join(directory, name)
+        with open(path + ".tmp", "wb") as file:
+            np.save(file, array)
+        os.replace(path + ".tmp", path)
+    path = os.path.join(directory, "state.json")
+    with open(path + ".tmp", "w") as file:
+        json.dump(settings, file)
+    os.replace(path + ".tmp", path)
+
+def run_settings(genome_data, n_gram, mode, sketch_size, seed, linkage):
+    '''
+    The function run_settings returns the dictionary that describes a run,
+    the n-gram settings and the names and sequence digests of the genomes.
+    genome_data - this parameter takes in the dictionary of genome data
+    n_gram - this parameter takes in the n-gram size
+    mode - this parameter takes in the n-gram mode
+    sketch_size - this parameter takes in the number of hashes of a sketch
+    seed - this parameter takes in the seed of the sketch hash function
+    linkage - this parameter takes in the linkage of the clustering
+    '''
+    return {"n_gram": n_gram, "mode": mode, "sketch_size": sketch_size,
+            "seed": seed, "linkage": linkage, "names": list(genome_data),
+            "digests": [sequence_digest(genome.get_sequence())
+                        for genome in genome_data.values()]}
+
+def shift_merges(merges, old_count, added):
+    '''
+    The function shift_merges renumbers the clusters of an old merge history
+    after new leaves were added. The leaves keep their numbers and every
+    merged cluster moves up by the number of added leaves.
+    merges - this parameter takes in the list of (a, b, similarity) merges
+    old_count - this parameter takes in the old number of leaves
+    added - this parameter takes in the number of added leaves
+    '''
+    shifted = []
+    for a, b, similarity in merges:
+        a, b = int(a), int(b)
+        if a >= old_count:
+            a += added
+        if b >= old_count:
+            b += added
+        shifted.append((a, b, float(similarity)))
+    return shifted
+
+def update_tree(genome_data, directory, n_gram, mode, sketch_size, seed,
+                linkage="single", as_matrix=False):
+    '''
+    The function update_tree builds the clustering tree of the genomes,
+    reusing the state saved in directory by the previous run when the
+    genomes of that run are, in the same order and with the same sequences,
+    the first genomes of this one. The state is then saved for the next run.
+    Anything else falls back to a build from scratch.
+    genome_data - this parameter takes in the dictionary of genome data,
+    with the sequences kept
+    directory - this parameter takes in the name of the state directory
+    n_gram - this parameter takes in the n-gram size
+    mode - this parameter takes in the n-gram mode
+    sketch_size - this parameter takes in the number of hashes of a sketch
+    seed - this parameter takes in the seed of the sketch hash function
+    linkage - this parameter takes in "single", "complete", "average" or
+    "ward". With all of them a merged cluster is never more similar to a
+    new genome than the better of its halves, which is what makes replaying
+    the old merges safe
+    as_matrix - this parameter takes in True to get a LinkageMatrix
+    '''
+    settings = run_settings(genome_data, n_gram, mode, sketch_size, seed,
+                            linkage)
+    names = settings["names"]
+    state = load_state(directory)
+    old_count = 0
+    if state is not None:
+        old_settings, old_matrix, old_merges = state
+        old_count = len(old_settings["names"])
+        same_run = all(settings[key] == old_settings.get(key) for key in
+                       ("n_gram", "mode", "sketch_size", "seed", "linkage"))
+        if not same_run or old_count > len(names) or \
+           old_settings["names"] != names[:old_count] or \
+           old_settings["digests"] != settings["digests"][:old_count] or \
+           old_matrix.shape != (old_count, old_count):
+            old_count = 0
+    if old_count == 0:
+        matrix = similarity_matrix(genome_data)
+        merges = linkage_merges(matrix, linkage)
+    else:
+        added = len(names) - old_count
+        matrix = old_matrix
+        prefix = []
+        if added > 0:
+            # computing only the rows of the new genomes
+            rows = similarity_rows(genome_data, names[old_count:])
+            matrix = np.zeros((len(names), len(names)), dtype=np.float64)
+            matrix[:old_count, :old_count] = old_matrix
+            matrix[old_count:, :] = rows
+            matrix[:, old_count:] = rows.T
+            # old merges stronger than every link of a new genome still
+            # happen first and in the same order
+            strongest = rows.copy()
+            strongest[np.arange(added), np.arange(old_count, len(names))] = \
+                -np.inf
+            strongest = strongest.max()
+            for merge in shift_merges(old_merges, old_count, added):
+                if merge[2] <= strongest:
+                    break
+                prefix.append(merge)
+        else:
+            prefix = shift_merges(old_merges, old_count, 0)
+        merges = linkage_merges(matrix, linkage, prefix)
+    save_state(directory, settings, matrix, merges)
+    return tree_from_merges(names, merges, as_matrix)
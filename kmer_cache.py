@@ -0,0 +1,236 @@
+'''
+File: kmer_cache.py
+Author: Pri Vaghela
+Description: The program keeps the n-grams of genomes in a cache directory on
+disk, so that trees over mostly unchanged collections do not have to rebuild
+them. Entries are found by the SHA-256 digest of the sequence together with
+the n-gram settings, are stored as .npy files that are memory-mapped when
+they are loaded, and the least recently used entries are removed when the
+cache grows past its size limit.
+'''
+
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from genome import NgramBuilder, SKETCH_MODES, COUNT_MODES
+from kmer_counts import KmerCounts
+from sketch import MinHashSketch, DEFAULT_SKETCH_SIZE, DEFAULT_SEED
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+def sequence_digest(sequence):
+    '''
+    The function sequence_digest returns the hex SHA-256 digest of a
+    sequence.
+    sequence - this parameter takes in the sequence as a str
+    '''
+    return hashlib.sha256(sequence.encode("ascii", "replace")).hexdigest()
+
+class KmerCache:
+    '''
+    The class KmerCache is a size-bounded, least recently used cache of the
+    n-grams of genomes in a directory.
+    '''
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        '''
+        initializing the cache directory, creating it if needed, and the
+        largest number of bytes the cache may use
+        '''
+        self._directory = directory
+        self._max_bytes = max_bytes
+        # the bytes of the .npy files, None until the directory is scanned
+        self._total = None
+        os.makedirs(directory, exist_ok=True)
+
+    def get_directory(self):
+        '''
+        The method get_directory returns the cache directory.
+        '''
+        return self._directory
+
+    def _settings(self, digest, n, mode, sketch_size, seed):
+        '''
+        The method _settings returns the dictionary that describes an entry,
+        which is also saved next to it and checked when it is loaded.
+        digest - this parameter takes in the digest of the sequence
+        n - this parameter takes in the n-gram size
+        mode - this parameter takes in one of genome.MODES
+        sketch_size - this parameter takes in the number of hashes to keep
+        seed - this parameter takes in the seed of the sketch hash function
+        '''
+        settings = {"digest": digest, "n": n, "mode": mode}
+        if mode in SKETCH_MODES:
+            settings["sketch_size"] = sketch_size
+            settings["seed"] = seed
+        return settings
+
+    def _path(self, settings):
+        '''
+        The method _path returns the path of the .npy file of an entry.
+        settings - this parameter takes in the settings of the entry
+        '''
+        name = "{digest}-{mode}-{n}".format(**settings)
+        if settings["mode"] in SKETCH_MODES:
+            name += "-{sketch_size}-{seed}".format(**settings)
+        return os.path.join(self._directory, name + ".npy")
+
+    def load(self, digest, n, mode="set", sketch_size=DEFAULT_SKETCH_SIZE,
+             seed=DEFAULT_SEED):
+        '''
+        The method load returns the cached n-grams of the sequence with the
+        given digest, or None when they are not in the cache or the entry
+        does not match what was asked for.
+        digest - this parameter takes in the digest of the sequence
+        n - this parameter takes in the n-gram size
+        mode - this parameter takes in one of genome.MODES
+        sketch_size - this parameter takes in the number of hashes to keep
+        seed - this parameter takes in the seed of the sketch hash function
+        '''
+        settings = self._settings(digest, n, mode, sketch_size, seed)
+        path = self._path(settings)
+        try:
+            with open(path[:-4] + ".json", "r") as file:
+                saved = json.load(file)
+            array = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if saved.pop("length", None) != array.shape[-1] or saved != settings:
+            self._remove(path)
+            return None
+        # touching the entry marks it as recently used, and an entry that
+        # another process evicted in the meantime is a miss
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        if mode == "set":
+            return set(array.astype(str).tolist())
+        if mode in SKETCH_MODES:
+            return MinHashSketch(array, sketch_size, seed)
+        if mode in COUNT_MODES:
+            return KmerCounts(array[0], array[1].astype(np.int64))
+        return array
+
+    def store(self, digest, n, mode, sketch_size, seed, ngrams):
+        '''
+        The method store saves the n-grams of the sequence with the given
+        digest and then evicts old entries if the cache is too big. The size
+        of the cache is kept as a running total, so the directory is only
+        scanned the first time and when the total is over the limit. Set
+        n-grams that are not plain ASCII are not cached.
+        digest - this parameter takes in the digest of the sequence
+        n - this parameter takes in the n-gram size
+        mode - this parameter takes in one of genome.MODES
+        sketch_size - this parameter takes in the number of hashes to keep
+        seed - this parameter takes in the seed of the sketch hash function
+        ngrams - this parameter takes in the n-grams to save
+        '''
+        settings = self._settings(digest, n, mode, sketch_size, seed)
+        if mode == "set":
+            try:
+                array = np.array(sorted(ngrams), dtype="S{}".format(max(n, 1)))
+            except UnicodeEncodeError:
+                return
+        elif mode in SKETCH_MODES:
+            array = np.asarray(ngrams.get_hashes())
+        elif mode in COUNT_MODES:
+            # the codes and their counts as the two rows of one array
+            array = np.stack((ngrams.get_codes(),
+                              ngrams.get_counts().astype(np.uint64)))
+        else:
+            array = np.asarray(ngrams)
+        path = self._path(settings)
+        settings["length"] = array.shape[-1]
+        # writing to temporary files of unique names first, so that readers
+        # never see half an entry and workers storing the same entry at the
+        # same time do not write over each other's files
+        array_path = self._temporary(".npy.tmp")
+        settings_path = self._temporary(".json.tmp")
+        try:
+            with open(array_path, "wb") as file:
+                np.save(file, array)
+            with open(settings_path, "w") as file:
+                json.dump(settings, file)
+            os.replace(array_path, path)
+            os.replace(settings_path, path[:-4] + ".json")
+        except OSError:
+            # another worker stored the entry, which is as good as this one
+            for name in (array_path, settings_path):
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+            return
+        if self._total is not None:
+            self._total += os.path.getsize(path)
+        if self._total is None or self._total > self._max_bytes:
+            self.evict()
+
+    def _temporary(self, suffix):
+        '''
+        The method _temporary creates an empty file of a unique name in the
+        cache directory and returns its path.
+        suffix - this parameter takes in the end of the file name
+        '''
+        handle, path = tempfile.mkstemp(suffix=suffix, dir=self._directory)
+        os.close(handle)
+        return path
+
+    def get_ngrams(self, sequence, n, mode="set",
+                   sketch_size=DEFAULT_SKETCH_SIZE, seed=DEFAULT_SEED):
+        '''
+        The method get_ngrams returns the n-grams of a sequence, from the
+        cache when they are there and otherwise by building and storing them.
+        sequence - this parameter takes in the sequence as a str
+        n - this parameter takes in the n-gram size
+        mode - this parameter takes in one of genome.MODES
+        sketch_size - this parameter takes in the number of hashes to keep
+        seed - this parameter takes in the seed of the sketch hash function
+        '''
+        digest = sequence_digest(sequence)
+        ngrams = self.load(digest, n, mode, sketch_size, seed)
+        if ngrams is None:
+            builder = NgramBuilder(n, mode, sketch_size, seed)
+            builder.add(sequence)
+            ngrams = builder.get_ngrams()
+            self.store(digest, n, mode, sketch_size, seed, ngrams)
+        return ngrams
+
+    def _remove(self, path):
+        '''
+        The method _remove deletes the files of one entry, if they still exist.
+        path - this parameter takes in the path of the .npy file of the entry
+        '''
+        for name in (path, path[:-4] + ".json"):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+    def evict(self):
+        '''
+        The method evict removes the least recently used entries until the
+        .npy files of the cache fit in its size limit, and counts the bytes
+        that are left again, which also takes in the entries other processes
+        stored.
+        '''
+        entries = []
+        total = 0
+        for name in os.listdir(self._directory):
+            if name.endswith(".npy"):
+                path = os.path.join(self._directory, name)
+                try:
+                    status = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((status.st_mtime, path, status.st_size))
+                total += status.st_size
+        entries.sort()
+        for mtime, path, size in entries:
+            if total <= self._max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self._total = total
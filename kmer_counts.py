@@ -0,0 +1,66 @@
+'''
+File: kmer_counts.py
+Author: Pri Vaghela
+Description: The program keeps the k-mers of a genome together with how many
+times each of them occurs, as a sorted array of distinct k-mer codes and an
+array of counts of the same length. The counts let genomes be compared as
+multisets, with the weighted Jaccard similarity, instead of only by which
+k-mers they share.
+'''
+
+import numpy as np
+from kmers import count_repeats
+
+class KmerCounts:
+    '''
+    The class KmerCounts is the sorted distinct k-mer codes of one genome and
+    the number of times every one of them occurs.
+    '''
+    def __init__(self, codes, counts):
+        '''
+        initializing the sorted array of distinct codes and the array of
+        their counts
+        '''
+        self._codes = codes
+        self._counts = counts
+
+    def get_codes(self):
+        '''
+        The method get_codes returns the sorted array of distinct codes.
+        '''
+        return self._codes
+
+    def get_counts(self):
+        '''
+        The method get_counts returns the array of the counts of the codes.
+        '''
+        return self._counts
+
+    def get_total(self):
+        '''
+        The method get_total returns the number of k-mers counted, repeats
+        included.
+        '''
+        return int(self._counts.sum())
+
+    def __len__(self):
+        '''
+        The method __len__ returns the number of distinct k-mers.
+        '''
+        return len(self._codes)
+
+def merge_kmer_counts(codes, counts):
+    '''
+    The function merge_kmer_counts adds up several pairs of code and count
+    arrays and returns the sorted distinct codes and their total counts.
+    codes - this parameter takes in the list of arrays of codes
+    counts - this parameter takes in the list of arrays of their counts
+    '''
+    all_codes = np.concatenate(codes)
+    all_counts = np.concatenate(counts).astype(np.int64)
+    order = np.argsort(all_codes, kind="stable")
+    distinct, repeats = count_repeats(all_codes[order])
+    if len(distinct) == 0:
+        return distinct, repeats
+    starts = np.concatenate(([0], np.cumsum(repeats)[:-1]))
+    return distinct, np.add.reduceat(all_counts[order], starts)
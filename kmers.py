@@ -0,0 +1,251 @@
+'''
+File: kmers.py
+Author: Pri Vaghela
+Description: The program encodes the k-mers (n-grams) of a DNA sequence as
+integers with 2 bits per base, so that a genome's k-mers can be stored as a
+sorted NumPy uint64 array instead of a set of substrings. Set sizes needed by
+the Jaccard similarity are computed by merging two sorted arrays. A k-mer
+can also be stored in its canonical form, the smaller of its code and the
+code of its reverse complement, so that both strands of a genome give the
+same k-mers.
+'''
+
+import numpy as np
+
+# the largest k-mer that still fits in 64 bits at 2 bits per base
+MAX_K = 32
+
+# lookup table from a byte to its 2-bit base code, 4 for anything else
+BASE_CODES = np.full(256, 4, dtype=np.uint8)
+for code, bases in enumerate(["Aa", "Cc", "Gg", "Tt"]):
+    for base in bases:
+        BASE_CODES[ord(base)] = code
+
+def base_codes(sequence):
+    '''
+    The function base_codes returns the array of 2-bit codes of the bases of
+    the sequence, where characters other than A, C, G and T get the code 4.
+    sequence - this parameter takes in the sequence as a str or bytes
+    '''
+    if isinstance(sequence, str):
+        sequence = sequence.encode("ascii", "replace")
+    return BASE_CODES[np.frombuffer(sequence, dtype=np.uint8)]
+
+def sorted_unique(values):
+    '''
+    The function sorted_unique returns the sorted distinct values of an
+    array. Sorting and dropping repeated neighbours is much faster than
+    np.unique on large integer arrays.
+    values - this parameter takes in the array of values
+    '''
+    return drop_repeats(np.sort(values))
+
+def drop_repeats(values):
+    '''
+    The function drop_repeats returns a sorted array without its repeated
+    values.
+    values - this parameter takes in the sorted array of values
+    '''
+    if len(values) == 0:
+        return values
+    keep = np.empty(len(values), dtype=bool)
+    keep[0] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+def encode_kmers(sequence, n, canonical=False):
+    '''
+    The function encode_kmers rolls a 2-bit per base code over the sequence
+    and returns the sorted array of the distinct codes of its k-mers of
+    length n. K-mers that contain a character other than A, C, G or T are
+    skipped.
+    sequence - this parameter takes in the sequence as a str or bytes
+    n - this parameter takes in the k-mer length, between 1 and 32
+    canonical - this parameter takes in whether every k-mer is stored as the
+    smaller of its code and the code of its reverse complement, which is
+    rolled in the same pass
+    '''
+    return sorted_unique(rolling_kmers(sequence, n, canonical))
+
+def count_kmers(sequence, n, canonical=False):
+    '''
+    The function count_kmers returns the sorted array of the distinct codes
+    of the k-mers of length n of the sequence, like encode_kmers, and the
+    array of how many times each of them occurs.
+    sequence - this parameter takes in the sequence as a str or bytes
+    n - this parameter takes in the k-mer length, between 1 and 32
+    canonical - this parameter takes in whether the k-mers are canonical,
+    see encode_kmers
+    '''
+    return count_repeats(np.sort(rolling_kmers(sequence, n, canonical)))
+
+def count_repeats(values):
+    '''
+    The function count_repeats returns the distinct values of a sorted array
+    and the array of how many times each of them is repeated.
+    values - this parameter takes in the sorted array of values
+    '''
+    if len(values) == 0:
+        return values, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True],
+                                            values[1:] != values[:-1])))
+    return values[starts], np.diff(np.append(starts, len(values)))
+
+def rolling_kmers(sequence, n, canonical=False):
+    '''
+    The function rolling_kmers returns the codes of the k-mers of length n
+    of the sequence in the order they appear, repeats included. K-mers that
+    contain a character other than A, C, G or T are skipped.
+    sequence - this parameter takes in the sequence as a str or bytes
+    n - this parameter takes in the k-mer length, between 1 and 32
+    canonical - this parameter takes in whether the k-mers are canonical,
+    see encode_kmers
+    '''
+    if n < 1 or n > MAX_K:
+        raise ValueError("k-mer length must be between 1 and {}".format(MAX_K))
+    codes = base_codes(sequence)
+    windows = len(codes) - n + 1
+    if windows <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    # counting the invalid bases in each window with a running sum
+    invalid = np.concatenate(([0], np.cumsum(codes == 4)))
+    valid = invalid[n:] - invalid[:windows] == 0
+    values = codes.astype(np.uint64) & np.uint64(3)
+    kmers = np.zeros(windows, dtype=np.uint64)
+    reverse = np.zeros(windows if canonical else 0, dtype=np.uint64)
+    # shifting in one base of every window at a time
+    for offset in range(n):
+        kmers <<= np.uint64(2)
+        kmers |= values[offset:offset + windows]
+        if canonical:
+            add_complement(reverse, values[offset:offset + windows], offset)
+    if canonical:
+        np.minimum(kmers, reverse, out=kmers)
+    return kmers[valid]
+
+def add_complement(reverse, values, offset):
+    '''
+    The function add_complement adds the complements of the bases at one
+    offset of every window to the codes of the reverse complements. The
+    complement of the base at offset i ends up at position i from the end
+    of the reverse complement, which is bit 2i of its code.
+    reverse - this parameter takes in the array of reverse complement codes
+    values - this parameter takes in the array of the 2-bit base codes
+    offset - this parameter takes in the offset of the bases in the windows
+    '''
+    reverse |= (np.uint64(3) - values) << np.uint64(2 * offset)
+
+def reverse_complement(code, n):
+    '''
+    The function reverse_complement returns the code of the reverse
+    complement of a k-mer.
+    code - this parameter takes in the integer code of the k-mer
+    n - this parameter takes in the k-mer length
+    '''
+    code = int(code)
+    reverse = 0
+    for i in range(n):
+        reverse = (reverse << 2) | (3 - (code & 3))
+        code >>= 2
+    return reverse
+
+def encode_kmer_sizes(sequence, sizes, canonical=False):
+    '''
+    The function encode_kmer_sizes returns a dictionary from every k-mer
+    length in sizes to the sorted array of the distinct codes of the k-mers
+    of that length, like encode_kmers, with a single rolling pass over the
+    sequence. Only the longest k-mers are sorted. The code of a shorter k-mer
+    is the code of the longest k-mer starting at the same place shifted
+    right, and shifting keeps the array sorted, so the shorter arrays only
+    need their repeats dropped and the few k-mers merged in that have no
+    longer k-mer, near the end of the sequence or before an invalid base.
+    Canonical k-mers are not prefixes of longer ones, so with canonical
+    every size is taken from the rolling codes of the same pass instead.
+    sequence - this parameter takes in the sequence as a str or bytes
+    sizes - this parameter takes in the k-mer lengths, between 1 and 32
+    canonical - this parameter takes in whether the k-mers are canonical,
+    see encode_kmers
+    '''
+    sizes = sorted(set(sizes))
+    if not sizes or sizes[0] < 1 or sizes[-1] > MAX_K:
+        raise ValueError("k-mer length must be between 1 and {}".format(MAX_K))
+    longest = sizes[-1]
+    codes = base_codes(sequence)
+    windows = len(codes) - sizes[0] + 1
+    if windows <= 0:
+        return dict((n, np.zeros(0, dtype=np.uint64)) for n in sizes)
+    invalid = np.concatenate(([0], np.cumsum(codes == 4)))
+    # the bases after the end count as invalid
+    invalid = np.concatenate((invalid, invalid[-1] + 1 + \
+                              np.arange(longest, dtype=invalid.dtype)))
+    values = np.zeros(windows + longest, dtype=np.uint64)
+    values[:len(codes)] = codes & np.uint8(3)
+    valid_longest = invalid[longest:longest + windows] - \
+        invalid[:windows] == 0
+    kmers = np.zeros(windows, dtype=np.uint64)
+    extras = {}
+    if canonical:
+        reverse = np.zeros(windows, dtype=np.uint64)
+        result = {}
+    for offset in range(longest):
+        kmers <<= np.uint64(2)
+        kmers |= values[offset:offset + windows]
+        n = offset + 1
+        if canonical:
+            add_complement(reverse, values[offset:offset + windows], offset)
+            if n in sizes:
+                valid = invalid[n:n + windows] - invalid[:windows] == 0
+                result[n] = sorted_unique(np.minimum(kmers, reverse)[valid])
+        elif n in sizes and n < longest:
+            # the windows of length n that are not the start of a valid
+            # window of the longest length
+            valid = invalid[n:n + windows] - invalid[:windows] == 0
+            extras[n] = kmers[valid & ~valid_longest]
+    if canonical:
+        return result
+    result = {longest: sorted_unique(kmers[valid_longest])}
+    for n, extra in extras.items():
+        shifted = drop_repeats(result[longest] >> np.uint64(2 * (longest - n)))
+        if len(extra):
+            # two sorted runs, which the stable sort merges in linear time
+            shifted = drop_repeats(np.sort(np.concatenate(
+                (shifted, sorted_unique(extra))), kind="stable"))
+        result[n] = shifted
+    return result
+
+def decode_kmer(code, n):
+    '''
+    The function decode_kmer turns the integer code of a k-mer back into its
+    string of bases.
+    code - this parameter takes in the integer code
+    n - this parameter takes in the k-mer length
+    '''
+    bases = []
+    for shift in range(2 * (n - 1), -1, -2):
+        bases.append("ACGT"[(int(code) >> shift) & 3])
+    return "".join(bases)
+
+def intersection_size(kmers1, kmers2):
+    '''
+    The function intersection_size returns the number of codes that two
+    sorted arrays of distinct codes have in common, by looking up every code
+    of the smaller array in the larger one.
+    kmers1 - this parameter takes in the first sorted array
+    kmers2 - this parameter takes in the second sorted array
+    '''
+    if len(kmers1) > len(kmers2):
+        kmers1, kmers2 = kmers2, kmers1
+    if len(kmers1) == 0:
+        return 0
+    positions = np.searchsorted(kmers2, kmers1)
+    positions[positions == len(kmers2)] = 0
+    return int(np.count_nonzero(kmers2[positions] == kmers1))
+
+def union_size(kmers1, kmers2):
+    '''
+    The function union_size returns the number of distinct codes in either
+    of two sorted arrays of distinct codes.
+    kmers1 - this parameter takes in the first sorted array
+    kmers2 - this parameter takes in the second sorted array
+    '''
+    return len(kmers1) + len(kmers2) - intersection_size(kmers1, kmers2)
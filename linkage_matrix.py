@@ -0,0 +1,382 @@
+'''
+File: linkage_matrix.py
+Author: Pri Vaghela
+Description: The program keeps a phylogenetic tree as a few flat arrays, in
+the spirit of SciPy's linkage matrix, instead of one TreeNode object with a
+set of ids per node. Row k of the arrays describes the node created by the
+k-th merge: its left and right child, the similarity it was merged at (its
+height) and the number of leaves below it. Trees whose branch lengths do not
+follow from the heights, like neighbor joining trees, also keep the length of
+the branch above every node. The leaves are numbered 0 to n-1
+in the order of the names and the k-th merged node is number n+k. LinkageNode
+is a light view of one node of the arrays that has the methods of TreeNode,
+so the rest of the program can use either form.
+'''
+
+import math
+import numpy as np
+from tree import TreeNode, heads_less, chunks_less
+
+class LinkageMatrix:
+    '''
+    The class LinkageMatrix is a binary tree stored in arrays.
+    '''
+    def __init__(self, names, children, heights, counts, supports=None,
+                 lengths=None):
+        '''
+        initializing the leaf names, the (n-1, 2) array of the left and
+        right child of every merged node, the array of merge similarities,
+        the array of leaf counts, the array of bootstrap supports and the
+        array of the branch lengths above every node by node number, NaN
+        where they are not known
+        '''
+        self._names = list(names)
+        self._children = np.asarray(children, dtype=np.int64).reshape(-1, 2)
+        self._heights = np.asarray(heights, dtype=np.float64)
+        self._counts = np.asarray(counts, dtype=np.int64)
+        if supports is None:
+            supports = np.full(len(self._children), np.nan)
+        self._supports = np.asarray(supports, dtype=np.float64)
+        if lengths is None:
+            lengths = np.full(len(self._names) + len(self._children), np.nan)
+        self._lengths = np.asarray(lengths, dtype=np.float64)
+
+    @classmethod
+    def from_merges(cls, names, merges, lengths=None):
+        '''
+        The method from_merges builds the linkage matrix of a merge history,
+        the same tree that cluster.tree_from_merges builds out of TreeNodes.
+        The child with the smaller string representation becomes the left
+        child, like in cluster.merge_nodes.
+        names - this parameter takes in the list of genome names
+        merges - this parameter takes in the list of (a, b, similarity) merges
+        lengths - this parameter takes in the array of the branch lengths
+        above every node by node number, or None when they follow from the
+        heights
+        '''
+        names = list(names)
+        count = len(names)
+        children = np.zeros((len(merges), 2), dtype=np.int64)
+        heights = np.zeros(len(merges), dtype=np.float64)
+        counts = np.zeros(len(merges), dtype=np.int64)
+        tree = cls(names, children, heights, counts, lengths=lengths)
+        # the number of leading "(" and the first leaf of every node, like
+        # the ones TreeNode keeps
+        leads = np.zeros(count + len(merges), dtype=np.int64)
+        firsts = np.zeros(count + len(merges), dtype=np.int64)
+        firsts[:count] = np.arange(count)
+        sizes = np.ones(count + len(merges), dtype=np.int64)
+        for k, (a, b, similarity) in enumerate(merges):
+            a, b = int(a), int(b)
+            less = heads_less(leads[a], names[firsts[a]], leads[b],
+                              names[firsts[b]])
+            if less is None:
+                less = chunks_less(tree.chunks(a), tree.chunks(b))
+            if not less:
+                a, b = b, a
+            node = count + k
+            children[k] = (a, b)
+            heights[k] = similarity
+            sizes[node] = sizes[a] + sizes[b]
+            counts[k] = sizes[node]
+            leads[node] = leads[a] + 1
+            firsts[node] = firsts[a]
+        return tree
+
+    def get_names(self):
+        '''
+        The method get_names returns the list of leaf names.
+        '''
+        return self._names
+
+    def get_children(self):
+        '''
+        The method get_children returns the (n-1, 2) array of the left and
+        right child of every merged node.
+        '''
+        return self._children
+
+    def get_heights(self):
+        '''
+        The method get_heights returns the array of merge similarities.
+        '''
+        return self._heights
+
+    def get_counts(self):
+        '''
+        The method get_counts returns the array of the number of leaves below
+        every merged node.
+        '''
+        return self._counts
+
+    def get_supports(self):
+        '''
+        The method get_supports returns the array of bootstrap supports of
+        the merged nodes, NaN where they are not known.
+        '''
+        return self._supports
+
+    def set_supports(self, supports):
+        '''
+        The method set_supports sets the bootstrap supports of the merged
+        nodes.
+        supports - this parameter takes in the array of supports
+        '''
+        self._supports = np.asarray(supports, dtype=np.float64)
+
+    def get_lengths(self):
+        '''
+        The method get_lengths returns the array of the branch lengths above
+        every node by node number, NaN where they follow from the heights.
+        '''
+        return self._lengths
+
+    def set_lengths(self, lengths):
+        '''
+        The method set_lengths sets the branch lengths above every node.
+        lengths - this parameter takes in the array of lengths by node number
+        '''
+        self._lengths = np.asarray(lengths, dtype=np.float64)
+
+    def leaf_count(self):
+        '''
+        The method leaf_count returns the number of leaves.
+        '''
+        return len(self._names)
+
+    def root(self):
+        '''
+        The method root returns the LinkageNode of the root, or None when the
+        tree has no leaves.
+        '''
+        if len(self._names) == 0:
+            return None
+        return LinkageNode(self, len(self._names) + len(self._children) - 1)
+
+    def to_array(self):
+        '''
+        The method to_array returns the tree as an (n-1, 4) float array with
+        the columns left, right, height and count, like SciPy's linkage
+        matrix.
+        '''
+        array = np.zeros((len(self._children), 4), dtype=np.float64)
+        array[:, :2] = self._children
+        array[:, 2] = self._heights
+        array[:, 3] = self._counts
+        return array
+
+    def leaves(self, node):
+        '''
+        The method leaves yields the leaf numbers below a node, from left to
+        right.
+        node - this parameter takes in the number of the node
+        '''
+        count = len(self._names)
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node < count:
+                yield node
+            else:
+                left, right = self._children[node - count].tolist()
+                stack.append(right)
+                stack.append(left)
+
+    def chunks(self, node):
+        '''
+        The method chunks yields the pieces of the string representation of
+        a node in order, the same pieces as TreeNode.chunks.
+        node - this parameter takes in the number of the node
+        '''
+        count = len(self._names)
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+            elif node < count:
+                yield self._names[node]
+            else:
+                left, right = self._children[node - count].tolist()
+                yield "("
+                stack.append(")")
+                stack.append(right)
+                stack.append(", ")
+                stack.append(left)
+
+    def to_tree_node(self):
+        '''
+        The method to_tree_node builds the same tree out of TreeNode objects.
+        '''
+        count = len(self._names)
+        if count == 0:
+            return None
+        nodes = []
+        lengths = self._lengths.tolist()
+        for name, length in zip(self._names, lengths):
+            leaf = TreeNode(name)
+            leaf.add_id(name)
+            if not math.isnan(length):
+                leaf.set_length(length)
+            nodes.append(leaf)
+        for (left, right), height, support in zip(self._children.tolist(),
+                                                  self._heights.tolist(),
+                                                  self._supports.tolist()):
+            node = TreeNode(None)
+            node.set_left(nodes[left])
+            node.set_right(nodes[right])
+            if not math.isnan(height):
+                node.set_height(height)
+            if not math.isnan(support):
+                node.set_support(support)
+            if not math.isnan(lengths[len(nodes)]):
+                node.set_length(lengths[len(nodes)])
+            nodes.append(node)
+        return nodes[-1]
+
+    def __str__(self):
+        '''
+        The method __str__ returns the string representation of the root.
+        '''
+        return str(self.root())
+
+class LinkageNode:
+    '''
+    The class LinkageNode is a read-only view of one node of a LinkageMatrix
+    with the methods of TreeNode. Views are made when they are asked for and
+    hold nothing but the matrix and the node number.
+    '''
+    __slots__ = ("_tree", "_node")
+
+    def __init__(self, tree, node):
+        '''
+        initializing the linkage matrix and the number of the node
+        '''
+        self._tree = tree
+        self._node = node
+
+    def get_tree(self):
+        '''
+        The method get_tree returns the LinkageMatrix of the node.
+        '''
+        return self._tree
+
+    def get_node(self):
+        '''
+        The method get_node returns the number of the node.
+        '''
+        return self._node
+
+    def _child(self, side):
+        '''
+        The method _child returns the view of the left (0) or right (1) child,
+        or None for a leaf.
+        side - this parameter takes in 0 or 1
+        '''
+        count = self._tree.leaf_count()
+        if self._node < count:
+            return None
+        return LinkageNode(self._tree,
+                           int(self._tree.get_children()[self._node - count,
+                                                         side]))
+
+    def get_left(self):
+        '''
+        The method get_left returns the left node.
+        '''
+        return self._child(0)
+
+    def get_right(self):
+        '''
+        The method get_right returns the right node.
+        '''
+        return self._child(1)
+
+    def get_id(self):
+        '''
+        The method get_id returns the name of a leaf, None for other nodes.
+        '''
+        if self._node < self._tree.leaf_count():
+            return self._tree.get_names()[self._node]
+        return None
+
+    def set_id(self):
+        '''
+        The method set_id returns the set of the names of the leaves below the
+        node. It is built when asked for.
+        '''
+        names = self._tree.get_names()
+        return set(names[leaf] for leaf in self._tree.leaves(self._node))
+
+    def get_height(self):
+        '''
+        The method get_height returns the similarity the node was merged at,
+        None for a leaf.
+        '''
+        count = self._tree.leaf_count()
+        if self._node < count:
+            return None
+        return float(self._tree.get_heights()[self._node - count])
+
+    def get_support(self):
+        '''
+        The method get_support returns the bootstrap support of the node, or
+        None for a leaf or when it is not known.
+        '''
+        count = self._tree.leaf_count()
+        if self._node < count:
+            return None
+        support = float(self._tree.get_supports()[self._node - count])
+        return None if math.isnan(support) else support
+
+    def get_length(self):
+        '''
+        The method get_length returns the length of the branch from the node
+        to its parent, or None when it is not known and follows from the
+        heights.
+        '''
+        length = float(self._tree.get_lengths()[self._node])
+        return None if math.isnan(length) else length
+
+    def is_leaf(self):
+        '''
+        The method is_leaf returns a boolean value indicating whether a node is
+        a leaf.
+        '''
+        return self._node < self._tree.leaf_count()
+
+    def chunks(self):
+        '''
+        The method chunks yields the pieces of the string representation of
+        the node in order.
+        '''
+        return self._tree.chunks(self._node)
+
+    def sorts_before(self, other):
+        '''
+        The method sorts_before returns str(self) < str(other).
+        other - this parameter takes in the node to compare with
+        '''
+        return chunks_less(self.chunks(), other.chunks())
+
+    def __eq__(self, other):
+        '''
+        The method __eq__ returns whether two views are of the same node.
+        '''
+        return isinstance(other, LinkageNode) and \
+            self._tree is other._tree and self._node == other._node
+
+    def __hash__(self):
+        '''
+        The method __hash__ returns the hash of the node number.
+        '''
+        return hash(self._node)
+
+    def __str__(self):
+        '''
+        The method __str__ returns a string representation of a node, the
+        same one as TreeNode gives.
+        '''
+        if self.is_leaf():
+            return self.get_id()
+        return "".join(self.chunks())
@@ -0,0 +1,236 @@
+'''
+File: matrix_store.py
+Author: Pri Vaghela
+Description: The program keeps the similarity matrix of a large genome
+collection on disk instead of in memory, as a memory-mapped float32 file of
+the full rows one after the other, which takes half of the memory of the
+float64 matrix. Storing both triangles doubles the file of a condensed upper
+triangle, but the mst engine asks for the rows in no particular order, and
+every row is then one contiguous read instead of one page per entry below
+the diagonal. The rows are computed in blocks, and after every block the
+file is flushed and the number of finished rows is saved, so a run that was
+stopped resumes after the last finished block. Only the mst engine reads the
+matrix a row at a time, the linkage and nj engines need the whole matrix in
+memory and do not take a stored one.
+'''
+
+import hashlib
+import json
+import os
+import numpy as np
+from kmer_counts import KmerCounts
+from similarity import similarity_row_function
+from sketch import MinHashSketch
+
+# the number of rows computed between two saves of the progress
+BLOCK_ROWS = 256
+
+def names_digest(names):
+    '''
+    The function names_digest returns the hex SHA-256 digest of a list of
+    genome names, which tells if a stored matrix is of the same genomes.
+    names - this parameter takes in the list of names
+    '''
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(str(name).encode("utf-8", "replace") + b"\0")
+    return digest.hexdigest()
+
+def ngrams_digest(genome_data):
+    '''
+    The function ngrams_digest returns the hex SHA-256 digest of the n-grams
+    of the genomes, with the kind of n-grams and the size and seed of
+    sketches, which tells if a stored matrix was computed from the same
+    n-grams.
+    genome_data - this parameter takes in the dictionary of genome data where
+    each genome is represented as a GenomeData object
+    '''
+    digest = hashlib.sha256()
+    for genome in genome_data.values():
+        ngrams = genome.get_ngrams()
+        if isinstance(ngrams, set):
+            parts = [b"set"] + [ngram.encode("utf-8", "replace")
+                                for ngram in sorted(ngrams)]
+        elif isinstance(ngrams, MinHashSketch):
+            parts = [b"sketch", str(ngrams.get_size()).encode("ascii"),
+                     str(ngrams.get_seed()).encode("ascii"),
+                     np.asarray(ngrams.get_hashes(), np.uint64).tobytes()]
+        elif isinstance(ngrams, KmerCounts):
+            parts = [b"counts",
+                     np.asarray(ngrams.get_codes(), np.uint64).tobytes(),
+                     np.asarray(ngrams.get_counts(), np.int64).tobytes()]
+        else:
+            parts = [b"compact", np.asarray(ngrams, np.uint64).tobytes()]
+        for part in parts:
+            digest.update(str(len(part)).encode("ascii") + b":" + part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+class StoredMatrix:
+    '''
+    The class StoredMatrix is a similarity matrix stored row after row in a
+    memory-mapped float32 file. It has len() and a row for matrix[i], so it
+    works as the row function of the mst engine. It is never read into
+    memory as a whole, which would take the memory the store is there to
+    save.
+    '''
+    def __init__(self, directory, names, metric="jaccard", n=None,
+                 ngrams=None):
+        '''
+        initializing the directory, the genome names, the settings of the
+        similarities and the memory-mapped values. The files of a matrix of
+        the same genomes, n-grams and settings are opened again with the rows
+        that were finished, any other files are started over
+        '''
+        self._directory = directory
+        self._names = list(names)
+        count = len(self._names)
+        self._settings = {"count": count, "names": names_digest(self._names),
+                          "ngrams": ngrams, "metric": metric, "n": n,
+                          "layout": "rows"}
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "matrix.f32")
+        size = count * count
+        saved = self._load_progress()
+        self._rows_done = 0
+        file_mode = "w+"
+        if saved is not None and os.path.exists(path) and \
+           os.path.getsize(path) == 4 * max(1, size):
+            rows_done = saved.pop("rows_done", None)
+            if saved == self._settings and isinstance(rows_done, int):
+                self._rows_done = rows_done
+                file_mode = "r+"
+        self._values = np.memmap(path, np.float32, file_mode,
+                                 shape=(max(1, size),))
+        if file_mode == "w+":
+            self._save_progress()
+
+    def _progress_path(self):
+        '''
+        The method _progress_path returns the path of the progress file.
+        '''
+        return os.path.join(self._directory, "progress.json")
+
+    def _load_progress(self):
+        '''
+        The method _load_progress returns the saved settings and number of
+        finished rows, or None when there are none.
+        '''
+        try:
+            with open(self._progress_path(), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _save_progress(self):
+        '''
+        The method _save_progress saves the settings and the number of
+        finished rows, through a temporary file so that a crash never leaves
+        half a progress file.
+        '''
+        progress = dict(self._settings, rows_done=self._rows_done)
+        path = self._progress_path()
+        with open(path + ".tmp", "w") as file:
+            json.dump(progress, file)
+        os.replace(path + ".tmp", path)
+
+    def get_directory(self):
+        '''
+        The method get_directory returns the directory of the files.
+        '''
+        return self._directory
+
+    def get_names(self):
+        '''
+        The method get_names returns the list of genome names.
+        '''
+        return self._names
+
+    def get_rows_done(self):
+        '''
+        The method get_rows_done returns the number of finished rows.
+        '''
+        return self._rows_done
+
+    def is_complete(self):
+        '''
+        The method is_complete returns whether every row has been computed.
+        '''
+        return self._rows_done >= len(self._names)
+
+    def __len__(self):
+        '''
+        The method __len__ returns the number of genomes.
+        '''
+        return len(self._names)
+
+    def fill(self, genome_data, block_rows=BLOCK_ROWS, report=None):
+        '''
+        The method fill computes the rows that are not finished yet, block by
+        block, with similarity.similarity_row_function, and writes every
+        block as one contiguous piece of the file.
+        genome_data - this parameter takes in the dictionary of genome data
+        of the genomes of the matrix, in the same order
+        block_rows - this parameter takes in the number of rows between two
+        saves of the progress
+        report - this parameter takes in a file object the progress is
+        printed to, or None
+        '''
+        if list(genome_data) != self._names:
+            raise ValueError("the genomes are not the ones of the matrix")
+        if self.is_complete():
+            return
+        count = len(self._names)
+        row = similarity_row_function(genome_data, self._settings["metric"],
+                                      self._settings["n"])
+        if report is not None and self._rows_done > 0:
+            print("similarity store: resuming at row {} of {}"
+                  .format(self._rows_done, count), file=report)
+        for start in range(self._rows_done, count, block_rows):
+            stop = min(start + block_rows, count)
+            self._values[start * count:stop * count] = np.concatenate(
+                [row(i) for i in range(start, stop)])
+            self._values.flush()
+            self._rows_done = stop
+            self._save_progress()
+
+    def rows(self, start, stop):
+        '''
+        The method rows returns the rows start to stop - 1 of the matrix as
+        a float64 array, read from one contiguous piece of the file.
+        start - this parameter takes in the first row
+        stop - this parameter takes in the row after the last one
+        '''
+        if not self.is_complete():
+            raise ValueError("the matrix has {} of {} rows, fill it first"
+                             .format(self._rows_done, len(self._names)))
+        count = len(self._names)
+        return self._values[start * count:stop * count].astype(
+            np.float64).reshape(stop - start, count)
+
+    def __getitem__(self, i):
+        '''
+        The method __getitem__ returns row i of the matrix, so the matrix
+        works as the row function of the mst engine.
+        i - this parameter takes in the row number
+        '''
+        return self.rows(i, i + 1)[0]
+
+def stored_similarity_matrix(genome_data, directory, metric="jaccard", n=None,
+                             report=None):
+    '''
+    The function stored_similarity_matrix returns the StoredMatrix of the
+    genomes in a directory, after computing the rows that a previous run of
+    the same n-grams did not finish.
+    genome_data - this parameter takes in the dictionary of genome data where
+    each genome is represented as a GenomeData object
+    directory - this parameter takes in the directory of the matrix files
+    metric - this parameter takes in one of similarity.METRICS
+    n - this parameter takes in the k-mer length, needed for "mash"
+    report - this parameter takes in a file object the progress is printed
+    to, or None
+    '''
+    matrix = StoredMatrix(directory, list(genome_data), metric, n,
+                             ngrams_digest(genome_data))
+    matrix.fill(genome_data, report=report)
+    return matrix
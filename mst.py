@@ -0,0 +1,293 @@
+'''
+File: mst.py
+Author: Pri Vaghela
+Description: The program builds the single linkage tree from a maximum
+spanning tree of the complete similarity graph, found with Prim's algorithm.
+The similarities are asked for one row at a time, so the builder runs in
+O(n^2) time with O(n) extra memory and never holds the whole matrix. Merges
+between equally similar clusters are ordered the same way as in the heap
+based engine of cluster.py, so both give the same TreeNode output; while the
+k clusters tied at one similarity are merged, a k x k boolean array of their
+ties is kept, so the rows of their genomes are fetched only once.
+'''
+
+import heapq
+import numpy as np
+from cluster import tree_from_merges
+
+def maximum_spanning_tree(count, row):
+    '''
+    The function maximum_spanning_tree runs Prim's algorithm from genome 0
+    and returns the n-1 edges of a maximum spanning tree as a list of
+    (u, v, similarity).
+    count - this parameter takes in the number of genomes
+    row - this parameter takes in a function that returns the similarities
+    of genome i to all the genomes as an array
+    '''
+    best = np.full(count, -np.inf)
+    parent = np.zeros(count, dtype=np.int64)
+    in_tree = np.zeros(count, dtype=bool)
+    edges = []
+    vertex = 0
+    for step in range(count - 1):
+        in_tree[vertex] = True
+        best[vertex] = -np.inf
+        similarities = np.asarray(row(vertex), dtype=np.float64)
+        better = ~in_tree & (similarities > best)
+        best[better] = similarities[better]
+        parent[better] = vertex
+        candidates = np.where(in_tree, -np.inf, best)
+        vertex = int(np.argmax(candidates))
+        edges.append((int(parent[vertex]), vertex, float(best[vertex])))
+    return edges
+
+class UnionFind:
+    '''
+    The class UnionFind keeps track of which cluster every genome is in.
+    '''
+    def __init__(self, count):
+        '''
+        initializing every genome as its own cluster, numbered like it
+        '''
+        self._parent = list(range(count))
+        self._cluster = list(range(count))
+
+    def add(self):
+        '''
+        The method add adds a new item in a set of its own and returns it.
+        '''
+        item = len(self._parent)
+        self._parent.append(item)
+        self._cluster.append(item)
+        return item
+
+    def size(self):
+        '''
+        The method size returns the number of items.
+        '''
+        return len(self._parent)
+
+    def find(self, item):
+        '''
+        The method find returns the representative genome of the set of item.
+        item - this parameter takes in the genome
+        '''
+        root = item
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[item] != root:
+            self._parent[item], item = root, self._parent[item]
+        return root
+
+    def cluster(self, item):
+        '''
+        The method cluster returns the number of the cluster of item.
+        item - this parameter takes in the genome
+        '''
+        return self._cluster[self.find(item)]
+
+    def union(self, item1, item2, cluster):
+        '''
+        The method union joins the sets of item1 and item2 into the cluster
+        with the given number.
+        item1 - this parameter takes in a genome of the first set
+        item2 - this parameter takes in a genome of the second set
+        cluster - this parameter takes in the number of the joined cluster
+        '''
+        root1 = self.find(item1)
+        root2 = self.find(item2)
+        self._parent[root2] = root1
+        self._cluster[root1] = cluster
+
+class ClusterMembers:
+    '''
+    The class ClusterMembers keeps the cluster of every genome and the
+    genomes of every cluster in O(n) memory. Every cluster has one of its
+    genomes as its representative, and a union moves the genomes of the
+    smaller cluster to the representative of the bigger one.
+    '''
+    def __init__(self, count):
+        '''
+        initializing every genome as its own cluster, numbered like it
+        '''
+        # the representative of every genome and the cluster of every
+        # representative, both indexed by genome
+        self._representative = np.arange(count, dtype=np.int64)
+        self._cluster = np.arange(count, dtype=np.int64)
+        self._members = {}
+        self._representative_of = {}
+
+    def cluster(self, genome):
+        '''
+        The method cluster returns the number of the cluster of a genome.
+        genome - this parameter takes in the genome
+        '''
+        return int(self._cluster[self._representative[genome]])
+
+    def clusters(self, genomes):
+        '''
+        The method clusters returns the array of the clusters of an array of
+        genomes.
+        genomes - this parameter takes in the array of genomes
+        '''
+        return self._cluster[self._representative[genomes]]
+
+    def _representative_and_members(self, cluster):
+        '''
+        The method _representative_and_members returns the representative of
+        a live cluster and the list of its genomes. Single genomes get their
+        list when they are first asked for.
+        cluster - this parameter takes in the number of the cluster
+        '''
+        representative = self._representative_of.get(cluster, cluster)
+        return representative, self._members.get(representative,
+                                                 [representative])
+
+    def members(self, cluster):
+        '''
+        The method members returns the list of the genomes of a live cluster.
+        cluster - this parameter takes in the number of the cluster
+        '''
+        return self._representative_and_members(cluster)[1]
+
+    def union(self, cluster1, cluster2, cluster):
+        '''
+        The method union joins two live clusters into the cluster with the
+        given number.
+        cluster1 - this parameter takes in the number of the first cluster
+        cluster2 - this parameter takes in the number of the second cluster
+        cluster - this parameter takes in the number of the joined cluster
+        '''
+        representative1, members1 = self._representative_and_members(cluster1)
+        representative2, members2 = self._representative_and_members(cluster2)
+        self._representative_of.pop(cluster1, None)
+        self._representative_of.pop(cluster2, None)
+        self._members.pop(representative1, None)
+        self._members.pop(representative2, None)
+        if len(members1) < len(members2):
+            representative1, representative2 = representative2, representative1
+            members1, members2 = members2, members1
+        self._representative[members2] = representative1
+        self._members[representative1] = members1 + members2
+        self._cluster[representative1] = cluster
+        self._representative_of[cluster] = representative1
+
+def tied_links(clusters, group, level, row):
+    '''
+    The function tied_links returns a k x k boolean array whose entry (i, j)
+    tells whether the single linkage of the i-th and j-th cluster of a group
+    is exactly level, so that row i is the array of the clusters the i-th
+    one is tied with. Ties are symmetric, so the rows of the genomes of the
+    biggest cluster are not needed and the other rows are fetched once
+    each. A genome is therefore only fetched when its cluster is at most
+    half of the merged group, which happens O(log n) times.
+    clusters - this parameter takes in the ClusterMembers of the clusters
+    group - this parameter takes in the list of the numbers of the clusters
+    level - this parameter takes in the similarity of the level
+    row - this parameter takes in the function that returns a row
+    '''
+    count = len(group)
+    links = np.zeros((count, count), dtype=bool)
+    if count == 2:
+        # the two clusters of an edge at this level are tied with each other
+        links[0, 1] = links[1, 0] = True
+        return links
+    members = [clusters.members(cluster) for cluster in group]
+    sizes = [len(genomes) for genomes in members]
+    genomes = np.concatenate(members)
+    slots = np.repeat(np.arange(count), sizes)
+    biggest = int(np.argmax(sizes))
+    for genome, slot in zip(genomes.tolist(), slots.tolist()):
+        if slot != biggest:
+            similarities = np.asarray(row(genome))[genomes]
+            links[slot, slots[similarities == level]] = True
+    links |= links.T
+    np.fill_diagonal(links, False)
+    return links
+
+def mst_single_linkage_merges(count, row):
+    '''
+    The function mst_single_linkage_merges returns the single linkage merge
+    history, the same list of (a, b, similarity) as
+    cluster.single_linkage_merges, from a maximum spanning tree. Its edges
+    are taken from the most similar down, and the clusters tied at one level
+    are merged smallest pair first, like the heap engine does: the smallest
+    cluster that is tied with any other is merged with the smallest one it
+    is tied with. A cluster without a tie never gets one at that level, and
+    the merged cluster is bigger than all the others, so one heap of
+    clusters gives that order. The ties of a group are found once with
+    tied_links and are merged along with the clusters.
+    count - this parameter takes in the number of genomes
+    row - this parameter takes in a function that returns the similarities
+    of genome i to all the genomes as an array
+    '''
+    edges = maximum_spanning_tree(count, row)
+    edges.sort(key=lambda edge: -edge[2])
+    clusters = ClusterMembers(count)
+    merges = []
+    start = 0
+    while start < len(edges):
+        level = edges[start][2]
+        stop = start
+        while stop < len(edges) and edges[stop][2] == level:
+            stop += 1
+        # grouping the clusters that the edges of this level tie together,
+        # only clusters of one group can be tied with each other
+        groups = UnionFind(0)
+        group_of = {}
+        for u, v, similarity in edges[start:stop]:
+            a, b = clusters.cluster(u), clusters.cluster(v)
+            for cluster in (a, b):
+                if cluster not in group_of:
+                    group_of[cluster] = groups.add()
+            groups.union(group_of[a], group_of[b], group_of[a])
+        tied = {}
+        for cluster, index in group_of.items():
+            tied.setdefault(groups.find(index), []).append(cluster)
+        # every group has the numbers of its clusters, which of them are not
+        # merged yet and the array of the clusters each one is tied with;
+        # merging two clusters merges their arrays, so no row is fetched
+        # again while the group is merged
+        tables = []
+        heap = []
+        for group in tied.values():
+            table = (np.array(group, dtype=np.int64),
+                     np.ones(len(group), dtype=bool),
+                     tied_links(clusters, group, level, row))
+            heap += [(cluster, len(tables), slot)
+                     for slot, cluster in enumerate(group)]
+            tables.append(table)
+        heapq.heapify(heap)
+        while heap:
+            a, index, slot = heapq.heappop(heap)
+            numbers, live, links = tables[index]
+            if not live[slot] or numbers[slot] != a:
+                continue
+            partners = np.flatnonzero(links[slot] & live)
+            if len(partners) == 0:
+                continue
+            other = partners[np.argmin(numbers[partners])]
+            b = int(numbers[other])
+            new = count + len(merges)
+            merges.append((min(a, b), max(a, b), level))
+            clusters.union(a, b, new)
+            links[slot] |= links[other]
+            links[:, slot] |= links[:, other]
+            links[slot, slot] = False
+            live[other] = False
+            numbers[slot] = new
+            heapq.heappush(heap, (new, index, slot))
+        start = stop
+    return merges
+
+def mst_single_linkage_tree(names, row, as_matrix=False):
+    '''
+    The function mst_single_linkage_tree builds the single linkage tree of
+    the genomes from similarities that are streamed row by row.
+    names - this parameter takes in the list of genome names
+    row - this parameter takes in a function that returns the similarities
+    of genome i to all the genomes as an array
+    as_matrix - this parameter takes in True to get a LinkageMatrix
+    '''
+    return tree_from_merges(names, mst_single_linkage_merges(len(names), row),
+                            as_matrix)
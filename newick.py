@@ -0,0 +1,218 @@
+'''
+File: newick.py
+Author: Pri Vaghela
+Description: The program writes phylogenetic trees in the Newick format and
+reads them back, so trees can be saved and compared without building them
+again. A node merged at similarity s sits at the distance 1 - s above the
+leaves, and the branch length of a node is the distance between it and its
+parent, unless the node keeps a branch length of its own, like the nodes of
+neighbor joining trees and of trees that were read. Both directions work
+with an explicit stack instead of recursion, so trees of any depth can be
+handled, and the writer sends its output to the file in pieces instead of
+building one big string.
+'''
+
+import io
+import math
+import re
+import numpy as np
+from linkage_matrix import LinkageMatrix
+
+# the number of characters that are collected before they are written
+WRITE_SIZE = 1 << 16
+
+# the characters that make a name need quotes
+SPECIAL = re.compile(r"[\s()\[\]',:;]")
+
+TOKENS = re.compile(r"'(?:[^']|'')*'|\[[^\]]*\]|[(),:;]|[^\s()\[\]',:;]+|\S")
+
+def quote_name(name):
+    '''
+    The function quote_name returns a leaf name as it is written in Newick,
+    in single quotes when it contains spaces or punctuation.
+    name - this parameter takes in the name
+    '''
+    name = str(name)
+    if name == "" or SPECIAL.search(name):
+        return "'" + name.replace("'", "''") + "'"
+    return name
+
+def node_distance(node):
+    '''
+    The function node_distance returns the distance of a node above the
+    leaves, 1 minus the similarity it was merged at, 0.0 for a leaf and None
+    when the similarity is not known.
+    node - this parameter takes in a TreeNode or LinkageNode
+    '''
+    if node.is_leaf():
+        return 0.0
+    height = node.get_height()
+    if height is None or math.isnan(height):
+        return None
+    return 1 - height
+
+def write_newick(tree, file):
+    '''
+    The function write_newick writes a tree to a file object in the Newick
+    format, with the branch lengths the nodes keep, or else the ones that
+    follow from the merge similarities where they are known, and the
+    bootstrap supports of internal nodes as their labels.
+    tree - this parameter takes in the root TreeNode or LinkageNode, or a
+    LinkageMatrix
+    file - this parameter takes in a text file object
+    '''
+    if isinstance(tree, LinkageMatrix):
+        tree = tree.root()
+    pieces = []
+    size = 0
+    if tree is not None:
+        stack = [(tree, None)]
+        while stack:
+            node, parent_distance = stack.pop()
+            if isinstance(node, str):
+                piece = node
+            else:
+                distance = node_distance(node)
+                length = ""
+                if node.get_length() is not None:
+                    length = ":" + repr(float(node.get_length()))
+                elif parent_distance is not None and distance is not None:
+                    length = ":" + repr(float(parent_distance - distance))
+                if node.is_leaf():
+                    piece = quote_name(node.get_id()) + length
+                else:
+                    piece = "("
+                    support = node.get_support()
+                    label = "" if support is None else repr(float(support))
+                    stack.append((")" + label + length, None))
+                    stack.append((node.get_right(), distance))
+                    stack.append((",", None))
+                    stack.append((node.get_left(), distance))
+            pieces.append(piece)
+            size += len(piece)
+            if size >= WRITE_SIZE:
+                file.write("".join(pieces))
+                pieces = []
+                size = 0
+    pieces.append(";\n")
+    file.write("".join(pieces))
+
+def newick_string(tree):
+    '''
+    The function newick_string returns the Newick string of a tree, see
+    write_newick.
+    tree - this parameter takes in the root TreeNode or LinkageNode, or a
+    LinkageMatrix
+    '''
+    file = io.StringIO()
+    write_newick(tree, file)
+    return file.getvalue()
+
+def parse_newick(text, as_matrix=False):
+    '''
+    The function parse_newick reads the first tree of a Newick string. The
+    leaves are numbered in the order they appear and every internal node
+    must have exactly two children. Labels of internal nodes that are numbers
+    are read as bootstrap supports, other labels and comments are skipped.
+    Every branch length is kept with its node, so the tree is written back
+    with the same lengths, and the merge similarity of a node is found again
+    from the branch length of its left child, which gives back the
+    similarities of a tree written by write_newick. It raises ValueError
+    when the string is not a binary Newick tree.
+    text - this parameter takes in the Newick string
+    as_matrix - this parameter takes in True to get a LinkageMatrix instead
+    of a TreeNode hierarchy
+    '''
+    names = []
+    # internal node k is referred to as -(k+1) until the leaves are counted
+    children = []
+    lengths = {}
+    supports = {}
+    groups = []
+    pending = None
+    closed = False
+    finished = False
+    expect_length = False
+    for match in TOKENS.finditer(text):
+        token = match.group()
+        if token[0] == "[":
+            continue
+        if expect_length:
+            try:
+                lengths[pending] = float(token)
+            except ValueError:
+                raise ValueError("bad branch length: {}".format(token))
+            expect_length = False
+        elif token == "(":
+            if pending is not None:
+                raise ValueError("missing ',' before '('")
+            groups.append([])
+        elif token == ":":
+            if pending is None:
+                raise ValueError("branch length without a node")
+            expect_length = True
+        elif token == "," or token == ")":
+            if pending is None or not groups:
+                raise ValueError("unexpected '{}'".format(token))
+            groups[-1].append(pending)
+            pending = None
+            closed = False
+            if token == ")":
+                group = groups.pop()
+                if len(group) != 2:
+                    raise ValueError("only binary trees can be read, a node "
+                                     "has {} children".format(len(group)))
+                children.append(group)
+                pending = -len(children)
+                closed = True
+        elif token == ";":
+            finished = True
+            break
+        elif closed:
+            # the label of the node that was just closed
+            try:
+                supports[len(children) - 1] = float(token)
+            except ValueError:
+                pass
+            closed = False
+        elif pending is None:
+            if token[0] == "'":
+                token = token[1:-1].replace("''", "'")
+            pending = len(names)
+            names.append(token)
+        else:
+            raise ValueError("unexpected name: {}".format(token))
+    if groups or expect_length or (pending is None and names):
+        raise ValueError("the Newick tree is not complete")
+    if names and not finished:
+        raise ValueError("the Newick tree does not end with ';'")
+    count = len(names)
+    refs = np.array(children, dtype=np.int64).reshape(-1, 2)
+    child_array = np.where(refs >= 0, refs, count - refs - 1)
+    distances = np.zeros(count + len(children), dtype=np.float64)
+    sizes = np.ones(count + len(children), dtype=np.int64)
+    for k, (a, b) in enumerate(child_array.tolist()):
+        length = lengths.get(refs[k, 0].item(), np.nan)
+        distances[count + k] = distances[a] + length
+        sizes[count + k] = sizes[a] + sizes[b]
+    support_array = np.full(len(children), np.nan)
+    for k, support in supports.items():
+        support_array[k] = support
+    length_array = np.full(count + len(children), np.nan)
+    for ref, length in lengths.items():
+        length_array[ref if ref >= 0 else count - ref - 1] = length
+    tree = LinkageMatrix(names, child_array, 1 - distances[count:],
+                         sizes[count:], support_array, length_array)
+    if as_matrix:
+        return tree
+    return tree.to_tree_node()
+
+def read_newick(file, as_matrix=False):
+    '''
+    The function read_newick reads the first tree of a Newick file, see
+    parse_newick.
+    file - this parameter takes in a text file object
+    as_matrix - this parameter takes in True to get a LinkageMatrix instead
+    of a TreeNode hierarchy
+    '''
+    return parse_newick(file.read(), as_matrix)
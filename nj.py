@@ -0,0 +1,112 @@
+'''
+File: nj.py
+Author: Pri Vaghela
+Description: The program builds phylogenetic trees with neighbor joining on
+the Jaccard distances (1 - similarity) between genomes. The Q-matrix is
+computed with NumPy over the live part of the distance matrix, and after
+every join the last live row and column are moved into the place of the
+removed one, so that the live part stays a contiguous block. The lengths of
+the branches to the joined nodes are kept too, since a neighbor joining tree
+is not ultrametric and they do not follow from the join similarities.
+'''
+
+import numpy as np
+from cluster import tree_from_merges
+
+# Q values closer than this, relative to their size, count as a tie
+TIE_TOLERANCE = 1e-12
+
+def neighbor_joining_merges(matrix, with_lengths=False):
+    '''
+    The function neighbor_joining_merges returns the joins of neighbor
+    joining as a list of (a, b, similarity) merges, in the same form as the
+    merge history of cluster.linkage_merges. The leaves are numbered 0 to
+    n-1, the node created by the k-th join gets the number n+k, and the
+    similarity of a join is 1 minus the distance between the joined nodes.
+    The last two nodes are joined to root the tree, each at half their
+    distance.
+    matrix - this parameter takes in the square similarity matrix
+    with_lengths - this parameter takes in True to also get the array of the
+    branch lengths above every node by node number, NaN for the root, and
+    then returns (merges, lengths)
+    '''
+    distance = 1 - np.array(matrix, dtype=np.float64)
+    count = len(distance)
+    np.fill_diagonal(distance, 0.0)
+    # nodes[i] is the node that lives in row i of the distance matrix
+    nodes = np.arange(count, dtype=np.int64)
+    merges = []
+    lengths = np.full(max(1, 2 * count - 1), np.nan)
+    live = count
+    q_matrix = np.empty((count, count), dtype=np.float64)
+    # the row sums of the live block, kept up to date after every join
+    all_totals = distance.sum(axis=1)
+    while live > 2:
+        block = distance[:live, :live]
+        totals = all_totals[:live]
+        # q_block holds Q without the -totals[i] term, which is the same
+        # along a row and is added to the row minimums instead
+        q_block = q_matrix[:live, :live]
+        np.multiply(block, live - 2, out=q_block)
+        q_block -= totals[None, :]
+        np.fill_diagonal(q_block, np.inf)
+        row_lowest = q_block.min(axis=1) - totals
+        lowest = row_lowest.min()
+        # among pairs tied up to rounding, joining the one with the smallest
+        # node numbers, found with one argmin over the keys of the node
+        # pairs of the rows that hold a tie
+        tolerance = TIE_TOLERANCE * max(1.0, abs(lowest))
+        rows = np.flatnonzero(row_lowest <= lowest + tolerance)
+        tied = q_block[rows] - totals[rows, None] <= lowest + tolerance
+        row_nodes = nodes[rows, None]
+        column_nodes = nodes[None, :live]
+        keys = np.minimum(row_nodes, column_nodes) * (2 * count) + \
+            np.maximum(row_nodes, column_nodes)
+        keys[~tied] = np.iinfo(np.int64).max
+        row, column = divmod(int(keys.argmin()), live)
+        i, j = sorted((int(rows[row]), column))
+        key = (int(min(nodes[i], nodes[j])), int(max(nodes[i], nodes[j])))
+        joined = block[i, j]
+        merges.append((key[0], key[1], float(1 - joined)))
+        # the limb lengths of the joined nodes
+        lengths[nodes[i]] = joined / 2 + (totals[i] - totals[j]) / \
+            (2 * (live - 2))
+        lengths[nodes[j]] = joined - lengths[nodes[i]]
+        # the new node takes row i and its distances to the others
+        row = (block[i] + block[j] - joined) / 2
+        row[i] = 0.0
+        totals += row - block[i] - block[j]
+        totals[i] = row.sum()
+        block[i, :] = row
+        block[:, i] = row
+        nodes[i] = count + len(merges) - 1
+        # moving the last live row and column into row j
+        last = live - 1
+        if j != last:
+            block[j, :] = block[last, :]
+            block[:, j] = block[:, last]
+            block[j, j] = 0.0
+            totals[j] = totals[last]
+            nodes[j] = nodes[last]
+        live -= 1
+    if live == 2:
+        merges.append((int(min(nodes[0], nodes[1])),
+                       int(max(nodes[0], nodes[1])),
+                       float(1 - distance[0, 1])))
+        lengths[nodes[:2]] = distance[0, 1] / 2
+    if with_lengths:
+        return merges, lengths
+    return merges
+
+def neighbor_joining_tree(names, matrix, as_matrix=False):
+    '''
+    The function neighbor_joining_tree builds the neighbor joining tree of
+    the genomes as a TreeNode hierarchy, with the branch lengths of the
+    joins.
+    names - this parameter takes in the list of genome names
+    matrix - this parameter takes in the square similarity matrix where
+    matrix[i][j] is the similarity between names[i] and names[j]
+    as_matrix - this parameter takes in True to get a LinkageMatrix
+    '''
+    merges, lengths = neighbor_joining_merges(matrix, True)
+    return tree_from_merges(names, merges, as_matrix, lengths)
@@ -0,0 +1,241 @@
+'''
+File: parallel.py
+Author: Pri Vaghela
+Description: The program fans the expensive parts of phylo out to a pool of
+worker processes. The n-grams of the genomes are built in the workers and
+come back in a compact form that is cheap to pickle, in the same order as
+the genomes in the FASTA file. The pairwise similarity matrix is split into
+blocks that the workers fill in, with the k-mer codes and the matrix itself
+in shared memory.
+'''
+
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from genome import NgramBuilder
+from similarity import jaccard_block, code_arrays, check_metric, \
+    metric_from_counts, sketch_metric
+from sketch import MinHashSketch, sketch_matrix
+
+# the number of genomes along each side of a block of the matrix
+BLOCK_SIZE = 128
+
+# the shared memory and the arrays on top of it, in each worker process
+SHARED = {}
+
+def pack_ngrams(ngrams):
+    '''
+    The function pack_ngrams packs a set of n-grams that all have the same
+    length into a single string, which pickles much faster than the set.
+    ngrams - this parameter takes in the set of n-grams
+    '''
+    return "".join(ngrams)
+
+def unpack_ngrams(packed, n):
+    '''
+    The function unpack_ngrams turns a string made by pack_ngrams back into
+    the set of n-grams.
+    packed - this parameter takes in the packed string
+    n - this parameter takes in the n-gram size
+    '''
+    return set(packed[i:i+n] for i in range(0, len(packed), n))
+
+def worker_ngrams(sequence, n, mode, sketch_size, seed, cache=None):
+    '''
+    The function worker_ngrams runs in a worker process and returns the
+    n-grams of one sequence, packed into a string in the "set" mode.
+    sequence - this parameter takes in the sequence
+    n - this parameter takes in the n-gram size
+    mode - this parameter takes in one of genome.MODES
+    sketch_size - this parameter takes in the number of hashes to keep
+    seed - this parameter takes in the seed of the sketch hash function
+    cache - this parameter takes in a KmerCache, or None
+    '''
+    if cache is not None:
+        ngrams = cache.get_ngrams(sequence, n, mode, sketch_size, seed)
+    else:
+        builder = NgramBuilder(n, mode, sketch_size, seed)
+        builder.add(sequence)
+        ngrams = builder.get_ngrams()
+    if mode == "set":
+        return pack_ngrams(ngrams)
+    return ngrams
+
+def parallel_ngrams(records, n, mode, sketch_size, seed, workers, cache=None):
+    '''
+    The function parallel_ngrams builds the n-grams of a stream of (name,
+    sequence) records in a pool of worker processes and yields (name,
+    sequence, ngrams) in the order of the records. Only a few records per
+    worker are in flight at a time, so the stream is never read ahead by
+    much.
+    records - this parameter takes in the iterable of (name, sequence)
+    n - this parameter takes in the n-gram size
+    mode - this parameter takes in one of genome.MODES
+    sketch_size - this parameter takes in the number of hashes to keep
+    seed - this parameter takes in the seed of the sketch hash function
+    workers - this parameter takes in the number of worker processes
+    cache - this parameter takes in a KmerCache the workers share, or None
+    '''
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for name, sequence in records:
+            future = pool.submit(worker_ngrams, sequence, n, mode,
+                                 sketch_size, seed, cache)
+            pending.append((name, sequence, future))
+            if len(pending) >= 2 * workers:
+                yield finish_ngrams(pending.popleft(), n, mode)
+        while pending:
+            yield finish_ngrams(pending.popleft(), n, mode)
+
+def finish_ngrams(job, n, mode):
+    '''
+    The function finish_ngrams waits for the result of one job and returns
+    its (name, sequence, ngrams) with the n-grams unpacked.
+    job - this parameter takes in the (name, sequence, future) of the job
+    n - this parameter takes in the n-gram size
+    mode - this parameter takes in the n-gram mode
+    '''
+    name, sequence, future = job
+    ngrams = future.result()
+    if mode == "set":
+        ngrams = unpack_ngrams(ngrams, n)
+    return name, sequence, ngrams
+
+def share_array(array):
+    '''
+    The function share_array copies an array into a new block of shared
+    memory and returns the SharedMemory object.
+    array - this parameter takes in the NumPy array
+    '''
+    memory = SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, array.dtype, buffer=memory.buf)[...] = array
+    return memory
+
+def attach_shared(codes_name, codes_length, offsets_name, count, matrix_name):
+    '''
+    The function attach_shared runs once in every worker process and opens
+    the shared k-mer codes, the offsets of every genome's codes and the
+    result matrix.
+    codes_name - this parameter takes in the name of the shared codes
+    codes_length - this parameter takes in the total number of codes
+    offsets_name - this parameter takes in the name of the shared offsets
+    count - this parameter takes in the number of genomes
+    matrix_name - this parameter takes in the name of the shared matrix
+    '''
+    for key, name in (("codes", codes_name), ("offsets", offsets_name),
+                      ("matrix", matrix_name)):
+        SHARED[key + "_memory"] = SharedMemory(name=name)
+    SHARED["codes"] = np.ndarray((codes_length,), np.uint64,
+                                 buffer=SHARED["codes_memory"].buf)
+    SHARED["offsets"] = np.ndarray((count + 1,), np.int64,
+                                   buffer=SHARED["offsets_memory"].buf)
+    SHARED["matrix"] = np.ndarray((count, count), np.float64,
+                                  buffer=SHARED["matrix_memory"].buf)
+
+def shared_rows(start, stop):
+    '''
+    The function shared_rows returns the list of the code arrays of the
+    genomes start to stop - 1, as views of the shared codes.
+    start - this parameter takes in the first genome
+    stop - this parameter takes in the genome after the last one
+    '''
+    codes = SHARED["codes"]
+    offsets = SHARED["offsets"]
+    return [codes[offsets[i]:offsets[i + 1]] for i in range(start, stop)]
+
+def worker_block(row_start, row_stop, column_start, column_stop):
+    '''
+    The function worker_block runs in a worker process, computes one block
+    of the upper triangle of the similarity matrix and writes it, and its
+    mirror image, into the shared matrix. It returns the number of pairs.
+    row_start - this parameter takes in the first row of the block
+    row_stop - this parameter takes in the row after the last one
+    column_start - this parameter takes in the first column of the block
+    column_stop - this parameter takes in the column after the last one
+    '''
+    rows = shared_rows(row_start, row_stop)
+    if row_start == column_start:
+        block = jaccard_block(rows)
+        pairs = len(rows) * (len(rows) - 1) // 2
+    else:
+        block = jaccard_block(rows, shared_rows(column_start, column_stop))
+        pairs = block.size
+    matrix = SHARED["matrix"]
+    matrix[row_start:row_stop, column_start:column_stop] = block
+    matrix[column_start:column_stop, row_start:row_stop] = block.T
+    return pairs
+
+def parallel_jaccard_matrix(code_arrays, workers, block_size=BLOCK_SIZE):
+    '''
+    The function parallel_jaccard_matrix computes the same matrix as
+    similarity.jaccard_matrix, with the blocks of its upper triangle spread
+    over a pool of worker processes. It returns the matrix and the
+    throughput in pairs per second.
+    code_arrays - this parameter takes in a list of arrays of unique integer
+    codes, one for each genome
+    workers - this parameter takes in the number of worker processes
+    block_size - this parameter takes in the number of genomes along each
+    side of a block
+    '''
+    start_time = time.perf_counter()
+    count = len(code_arrays)
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(codes) for codes in code_arrays])
+    codes = np.zeros(0, dtype=np.uint64)
+    if count > 0:
+        codes = np.concatenate(code_arrays).astype(np.uint64)
+    memories = [share_array(codes), share_array(offsets),
+                share_array(np.zeros((count, count), dtype=np.float64))]
+    try:
+        names = [memory.name for memory in memories]
+        with ProcessPoolExecutor(workers, initializer=attach_shared, \
+                initargs=(names[0], len(codes), names[1], count, \
+                          names[2])) as pool:
+            futures = []
+            for row in range(0, count, block_size):
+                for column in range(row, count, block_size):
+                    futures.append(pool.submit(worker_block, row, \
+                        min(row + block_size, count), column, \
+                        min(column + block_size, count)))
+            pairs = sum(future.result() for future in futures)
+        matrix = np.ndarray((count, count), np.float64,
+                            buffer=memories[2].buf).copy()
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+    seconds = time.perf_counter() - start_time
+    return matrix, pairs / seconds if seconds > 0 else 0.0
+
+def parallel_similarity_matrix(genome_data, workers, report=None,
+                               metric="jaccard", n=None):
+    '''
+    The function parallel_similarity_matrix is the parallel version of
+    similarity.similarity_matrix. Sketches are small and are still compared
+    in this process. The workers compute Jaccard similarities, and the other
+    metrics are found from them and the sizes of the code arrays. When
+    report is a file object, the throughput of the pool is printed to it.
+    genome_data - this parameter takes in the dictionary of genome data where
+    each genome is represented as a GenomeData object
+    workers - this parameter takes in the number of worker processes
+    report - this parameter takes in a file object, or None
+    metric - this parameter takes in one of similarity.METRICS
+    n - this parameter takes in the k-mer length, needed for "mash"
+    '''
+    check_metric(metric, n)
+    ngrams = [genome.get_ngrams() for genome in genome_data.values()]
+    if any(isinstance(ngram_set, MinHashSketch) for ngram_set in ngrams):
+        return sketch_metric(sketch_matrix(ngrams), metric, n)
+    ngrams = code_arrays(ngrams, metric)
+    matrix, pairs_per_second = parallel_jaccard_matrix(ngrams, workers)
+    if report is not None:
+        print("similarity matrix: {:.0f} pairs per second with {} workers"
+              .format(pairs_per_second, workers), file=report)
+    if metric in ("jaccard", "weighted-jaccard"):
+        return matrix
+    # J = I / (a + b - I) gives back the intersection sizes I
+    sizes = np.array([len(codes) for codes in ngrams], dtype=np.float64)
+    intersection = matrix * (sizes[:, None] + sizes[None, :]) / (1 + matrix)
+    return metric_from_counts(np.round(intersection), sizes, sizes, metric, n)
@@ -1,124 +1,539 @@
-'''
-File: phylo.py
-Author: Pri Vaghela
-Description: The program constructs phylogenetic trees starting from the genome
-sequences of a set of organisms. It performs phylogenetic analysis on genetic 
-data stored in a FASTA file. The tree constructed based on the similarity of 
-the genetics. 
-'''
-
-from genome import GenomeData
-from tree import TreeNode
-
-def read_fasta_file(filename, n_gram):
-    '''
-    The function read_fasta_file reads in the FASTA file and creates a 
-    dictionary of GenomeData objects with their corresponding n-grams and 
-    returns this dictionary of genome data.
-    filename - this parameter takes in the name of the FASTA file
-    n_gram - takes in the n_gram size
-    '''
-    # using with to open the file and assign it to "file"
-    with open(filename, "r") as file:
-        sequence_dict = {}
-        sequence_lst = []
-        for line in file:
-            if line == "\n":
-                sequence_lst = []
-            elif line[0] == ">":
-                name, *rest = line[1:].strip().split()
-                # *rest is used to unpack any remaining elements of the line 
-                # into a list called rest
-                sequence_dict[name] = sequence_lst
-            else:
-                sequence_lst.append(line.strip())
-        genome_data = {}
-        # creating GenomeData objects for each name-sequence pair in the 
-        # new_dict
-        for name, sequence in sequence_dict.items():
-            genome = GenomeData(name, "".join(sequence))
-            genome.create_ngrams(n_gram)
-            genome_data[name] = genome
-        return genome_data
-
-def compute_similarity(ngram1, ngram2):
-    '''
-    The function compute_similarity takes in two sets of n-grams and calculates 
-    their Jaccard similarity. The output of this function is a float value 
-    between 0 and 1, where 0 indicates no similarity between the two sets and 1
-    indicates that the two sets are identical.
-    ngram1 - this parameter takes in the first set of n_gram
-    ngram2 - this parameter takes in the second set of n_gram
-    '''
-    return len(ngram1.intersection(ngram2)) / len(ngram1.union(ngram2))
-
-def construct_phylogenetic_tree(genome_data):
-    '''
-    The function construct_phylogenetic_tree computes the pairwise similarity 
-    scores between all pairs of genomes using the compute_similarity function, 
-    and creates a phylogenetic tree based on these scores.
-    genome_data - this paramter takes in the dictionary of genome data where 
-    each genome is represented as a GenomeData object
-    '''
-    similarity_data = {}
-    # computing the similarity between each pair of GenomeData objects
-    for data1 in genome_data:
-        for data2 in genome_data:
-            if data1 != data2:
-                similarity_data[(data1, data2)] = \
-                    compute_similarity(genome_data[data1].get_ngrams(), \
-                                       genome_data[data2].get_ngrams())
-    tree_lst = []
-    # creating TreeNode objects for each name in genome_data
-    for name in genome_data:
-        tree = TreeNode(name)
-        tree.add_id(name)
-        tree_lst.append(tree)
-        # iterating until there is only one tree object in the list
-        # fun fact: the complexity for the following nested loops is O(n^5)
-    while len(tree_lst) > 1:
-        max_similarity = 0.0
-        # iterating over each pair of TreeNode objects in the tree_list
-        for node1 in tree_lst:
-            for node2 in tree_lst:
-                if node1 != node2:
-                    for id1 in node1.set_id():
-                        for id2 in node2.set_id():
-                            # if the similarity between the two pairs is 
-                            # greater than the max_similarity, updating 
-                            # max_similarity and the nodes
-                            if (id1,id2) in similarity_data:
-                                similarity = similarity_data[(id1,id2)]
-                            if similarity > max_similarity:
-                                max_similarity = similarity
-                                t1,t2 = node1, node2
-        # creating a new TreeNode object with the ids of the two nodes with 
-        # the highest similarity 
-        new_node = TreeNode(None)
-        new_node.add_id(t1.get_id())
-        new_node.add_id(t2.get_id())
-        if str(t1) < str(t2):
-            new_node.set_left(t1)
-            new_node.set_right(t2)
-        else:
-            new_node.set_left(t2)
-            new_node.set_right(t1)
-        tree_lst.remove(t1)
-        tree_lst.remove(t2)
-        tree_lst.append(new_node)
-    return tree_lst[0]
-
-def main():
-    '''
-    The main function asks the user for the FASTA file and the n-gram size.
-    It then calls the functions to achieve the necessary output and prints the 
-    root of the phylotree. 
-    '''
-    fasta_filename = input('FASTA file: ')
-    n_gram = int(input('n-gram size: '))
-    genome_data = read_fasta_file(fasta_filename, n_gram)
-    phylotree_root = construct_phylogenetic_tree(genome_data)
-    print(phylotree_root)
-
-main()
-# calling main
+'''
+File: phylo.py
+Author: Pri Vaghela
+Description: The program constructs phylogenetic trees starting from the genome
+sequences of a set of organisms. It performs phylogenetic analysis on genetic 
+data stored in a FASTA file. The tree constructed based on the similarity of 
+the genetics. 
+'''
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+from genome import GenomeData, genomes_from_pieces, genome_sweeps_from_pieces, \
+    MODES, SKETCH_MODES
+from fasta import read_fasta_pieces, read_indexed_pieces, group_records
+from incremental import update_tree
+from parallel import parallel_ngrams, parallel_similarity_matrix
+from cluster import linkage_tree
+from nj import neighbor_joining_tree
+from mst import mst_single_linkage_tree
+from similarity import similarity_matrix, similarity_matrices, \
+    similarity_row_function, METRICS
+from kmers import intersection_size
+from kmer_counts import KmerCounts
+from sketch import MinHashSketch, sketch_similarity, DEFAULT_SKETCH_SIZE, \
+    DEFAULT_SEED
+from kmer_cache import KmerCache
+from newick import newick_string
+from bootstrap import bootstrap_support
+from matrix_store import StoredMatrix, stored_similarity_matrix
+
+try:
+    import resource
+except ImportError:
+    # the peak memory is not reported where there is no resource module
+    resource = None
+
+def read_fasta_file(filename, n_gram, mode="set",
+                    sketch_size=DEFAULT_SKETCH_SIZE, seed=DEFAULT_SEED,
+                    keep_sequence=True, ids=None, workers=1,
+                    cache=None):
+    '''
+    The function read_fasta_file reads in the FASTA file and creates a 
+    dictionary of GenomeData objects with their corresponding n-grams and 
+    returns this dictionary of genome data.
+    filename - this parameter takes in the name of the FASTA file
+    n_gram - takes in the n_gram size
+    mode - takes in how the n-grams are stored, "set", "compact", "sketch", 
+    "canonical" or "canonical-sketch". The last two are "compact" and 
+    "sketch" with every k-mer and its reverse complement counted as the same 
+    one, so genomes read from opposite strands still match. The "counts" and 
+    "canonical-counts" modes also keep how many times every k-mer occurs, 
+    for the "weighted-jaccard" metric
+    sketch_size - takes in the number of hashes kept in the "sketch" mode
+    seed - takes in the seed of the hash function of the "sketch" mode
+    keep_sequence - takes in whether the GenomeData objects keep their 
+    sequences, without them only the n-grams are held in memory
+    ids - takes in the list of genome ids to load, or None for all of them. 
+    Only those records are read, through the file's .fai index
+    workers - takes in the number of worker processes that build the n-grams
+    cache - takes in a KmerCache the n-grams are looked up in and saved to, 
+    or None
+    '''
+    genome_data = {}
+    # the file is parsed as a stream and the n-grams of every genome are 
+    # built while its sequence is being read
+    if ids is None:
+        pieces = read_fasta_pieces(filename)
+    else:
+        pieces = read_indexed_pieces(filename, ids)
+    if workers > 1:
+        # the records are read here and their n-grams built in the pool
+        for name, sequence, ngrams in parallel_ngrams(group_records(pieces), \
+                n_gram, mode, sketch_size, seed, workers, cache):
+            genome = GenomeData(name, sequence if keep_sequence else None)
+            genome.set_ngrams(ngrams)
+            genome_data[name] = genome
+        return genome_data
+    for genome in genomes_from_pieces(pieces, n_gram, mode, sketch_size, seed,
+                                      keep_sequence, cache):
+        genome_data[genome.get_id()] = genome
+    return genome_data
+
+def read_fasta_sweep(filename, n_grams, mode="set",
+                     sketch_size=DEFAULT_SKETCH_SIZE, seed=DEFAULT_SEED,
+                     keep_sequence=True, ids=None):
+    '''
+    The function read_fasta_sweep reads in the FASTA file once and returns a 
+    dictionary from every n-gram size in n_grams to the dictionary of 
+    GenomeData objects with n-grams of that size, like read_fasta_file 
+    returns. The n-grams of all the sizes are built in one pass over every 
+    sequence, and the GenomeData objects of one genome share its sequence.
+    filename - this parameter takes in the name of the FASTA file
+    n_grams - takes in the n-gram sizes, for example range(3, 13)
+    mode - takes in how the n-grams are stored, one of genome.MODES
+    sketch_size - takes in the number of hashes kept in the "sketch" mode
+    seed - takes in the seed of the hash function of the "sketch" mode
+    keep_sequence - takes in whether the GenomeData objects keep their 
+    sequences
+    ids - takes in the list of genome ids to load, or None for all of them
+    '''
+    genome_data_by_size = dict((n_gram, {}) for n_gram in n_grams)
+    if ids is None:
+        pieces = read_fasta_pieces(filename)
+    else:
+        pieces = read_indexed_pieces(filename, ids)
+    for genomes in genome_sweeps_from_pieces(pieces, n_grams, mode, 
+                                             sketch_size, seed, 
+                                             keep_sequence):
+        for n_gram, genome in genomes.items():
+            genome_data_by_size[n_gram][genome.get_id()] = genome
+    return genome_data_by_size
+
+def compute_similarity(ngram1, ngram2):
+    '''
+    The function compute_similarity takes in two sets of n-grams and calculates 
+    their Jaccard similarity. The output of this function is a float value 
+    between 0 and 1, where 0 indicates no similarity between the two sets and 1
+    indicates that the two sets are identical.
+    Compact n-grams, sorted arrays of k-mer codes, are compared by merging 
+    the arrays, and k-mer counts by their distinct k-mers.
+    ngram1 - this parameter takes in the first set of n_gram
+    ngram2 - this parameter takes in the second set of n_gram
+    '''
+    if isinstance(ngram1, KmerCounts):
+        ngram1, ngram2 = ngram1.get_codes(), ngram2.get_codes()
+    if isinstance(ngram1, set):
+        return len(ngram1.intersection(ngram2)) / len(ngram1.union(ngram2))
+    intersection = intersection_size(ngram1, ngram2)
+    return intersection / (len(ngram1) + len(ngram2) - intersection)
+
+def compute_sketch_similarity(sketch1, sketch2):
+    '''
+    The function compute_sketch_similarity estimates the Jaccard similarity 
+    of two genomes from their MinHash sketches. Like compute_similarity it 
+    returns a float value between 0 and 1.
+    sketch1 - this parameter takes in the sketch of the first genome
+    sketch2 - this parameter takes in the sketch of the second genome
+    '''
+    return sketch_similarity(sketch1, sketch2)
+
+def compute_similarity_data(genome_data):
+    '''
+    The function compute_similarity_data computes the similarity between every
+    ordered pair of genomes with compute_similarity and returns a dictionary
+    keyed by (id1, id2). It is the slow reference for similarity_matrix.
+    genome_data - this paramter takes in the dictionary of genome data where 
+    each genome is represented as a GenomeData object
+    '''
+    similarity_data = {}
+    similarity = compute_similarity
+    for genome in genome_data.values():
+        if isinstance(genome.get_ngrams(), MinHashSketch):
+            similarity = compute_sketch_similarity
+    # computing the similarity between each pair of GenomeData objects
+    for data1 in genome_data:
+        for data2 in genome_data:
+            if data1 != data2:
+                similarity_data[(data1, data2)] = \
+                    similarity(genome_data[data1].get_ngrams(), \
+                               genome_data[data2].get_ngrams())
+    return similarity_data
+
+def construct_phylogenetic_tree(genome_data, workers=1, report=None,
+                                linkage="single", engine="linkage",
+                                as_matrix=False, matrix=None, 
+                                metric="jaccard", n_gram=None, 
+                                matrix_directory=None):
+    '''
+    The function construct_phylogenetic_tree computes the pairwise similarity 
+    scores between all pairs of genomes as one batched Jaccard matrix, or a 
+    matrix of another similarity metric, and creates a phylogenetic tree 
+    based on these scores.
+    genome_data - this paramter takes in the dictionary of genome data where 
+    each genome is represented as a GenomeData object
+    workers - takes in the number of worker processes that fill in blocks of 
+    the similarity matrix
+    report - takes in a file object the throughput of the workers is printed 
+    to, or None
+    linkage - takes in how the similarity of two clusters is derived from 
+    their members, "single", "complete", "average" (UPGMA) or "ward"
+    engine - takes in "linkage" for agglomerative clustering, "nj" for 
+    neighbor joining on 1 - similarity, which ignores the linkage, or "mst" 
+    for single linkage through a maximum spanning tree, which computes the 
+    similarities one row at a time and never holds the whole matrix
+    as_matrix - takes in True to get the tree as a LinkageMatrix, a few 
+    arrays instead of a TreeNode per node, whose root() has the TreeNode 
+    methods
+    matrix - takes in the similarity matrix of the genomes when it is 
+    already known, for example from similarity_matrices, or None
+    metric - takes in "jaccard", "containment", which compares genomes of 
+    very different sizes by the share of the smaller one, "weighted-jaccard", 
+    which needs the k-mer counts of the "counts" modes, or "mash" for exp(-D) 
+    of the Mash distance D
+    n_gram - takes in the n-gram size, needed for the "mash" metric
+    matrix_directory - takes in a directory where the similarity matrix is 
+    kept on disk as memory-mapped float32 rows, which the "mst" engine reads 
+    a row at a time, or None. A matrix that a stopped run did not finish is 
+    resumed, see matrix_store.StoredMatrix. The other engines need the 
+    whole matrix in memory and raise ValueError with a stored matrix
+    '''
+    names = list(genome_data)
+    if engine != "mst" and (matrix_directory is not None or 
+                            isinstance(matrix, StoredMatrix)):
+        raise ValueError("a stored similarity matrix is only read by the "
+                         "mst engine")
+    if matrix is None and matrix_directory is not None:
+        matrix = stored_similarity_matrix(genome_data, matrix_directory, 
+                                          metric, n_gram, report)
+    if engine == "mst":
+        if linkage != "single":
+            raise ValueError("the mst engine only does single linkage")
+        row = similarity_row_function(genome_data, metric, n_gram) \
+            if matrix is None else matrix.__getitem__
+        return mst_single_linkage_tree(names, row, as_matrix)
+    if matrix is None and workers > 1:
+        matrix = parallel_similarity_matrix(genome_data, workers, report, 
+                                            metric, n_gram)
+    elif matrix is None:
+        matrix = similarity_matrix(genome_data, metric, n_gram)
+    if engine == "nj":
+        return neighbor_joining_tree(names, matrix, as_matrix)
+    if engine != "linkage":
+        raise ValueError("unknown tree engine: {}".format(engine))
+    # letting the heap based engine do the merging
+    return linkage_tree(names, matrix, linkage, as_matrix)
+
+def main(mode="set", sketch_size=DEFAULT_SKETCH_SIZE, seed=DEFAULT_SEED,
+         state_directory=None, linkage="single", engine="linkage"):
+    '''
+    The main function asks the user for the FASTA file and the n-gram size.
+    It then calls the functions to achieve the necessary output and prints the 
+    root of the phylotree. 
+    mode - takes in how the n-grams are stored, one of genome.MODES
+    sketch_size - takes in the number of hashes kept in the "sketch" mode
+    seed - takes in the seed of the hash function of the "sketch" mode
+    state_directory - takes in a directory where the similarities and merges 
+    are kept between runs, so that a rerun after genomes were appended to 
+    the FASTA file only compares the new genomes, or None
+    linkage - takes in "single", "complete", "average" (UPGMA) or "ward"
+    engine - takes in "linkage", "nj" for neighbor joining or "mst" for single 
+    linkage through a maximum spanning tree, the last two are always built 
+    from scratch
+    '''
+    fasta_filename = input('FASTA file: ')
+    n_gram = int(input('n-gram size: '))
+    genome_data = read_fasta_file(fasta_filename, n_gram, mode, sketch_size,
+                                  seed)
+    if state_directory is None or engine != "linkage":
+        phylotree_root = construct_phylogenetic_tree(genome_data, 
+                                                     linkage=linkage, 
+                                                     engine=engine)
+    else:
+        phylotree_root = update_tree(genome_data, state_directory, n_gram, 
+                                     mode, sketch_size, seed, linkage)
+    print(phylotree_root)
+
+def reset_peak_memory():
+    '''
+    The function reset_peak_memory starts the peak resident memory of the 
+    process over from its current resident memory, so that peak_memory is 
+    the peak of what runs after it, and returns whether it could. Only Linux 
+    allows it, by writing 5 to /proc/self/clear_refs.
+    '''
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+    return True
+
+def peak_memory():
+    '''
+    The function peak_memory returns the peak resident memory of the process 
+    in bytes, or None when it cannot be found out. On Linux it is VmHWM of 
+    /proc/self/status, the peak since reset_peak_memory, elsewhere it is the 
+    peak over the whole life of the process.
+    '''
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    # the value is in kilobytes
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def timed_stage(stage, report, function, *args, **kwargs):
+    '''
+    The function timed_stage calls a function, prints the wall-clock time it 
+    took and the peak resident memory while it ran to report, and returns 
+    its result. Where the peak cannot be started over, see 
+    reset_peak_memory, the peak of the whole process so far is printed as 
+    "process peak memory" instead.
+    stage - takes in the name of the stage that is printed
+    report - takes in the file object the timing is printed to
+    function - takes in the function to call
+    args - takes in the positional arguments of the function
+    kwargs - takes in the keyword arguments of the function
+    '''
+    stage_peak = reset_peak_memory()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    peak = peak_memory()
+    memory = "" if peak is None else ", {} {:.1f} MB".format(
+        "peak memory" if stage_peak else "process peak memory", peak / 1e6)
+    print("{}: {:.3f} s{}".format(stage, seconds, memory), file=report)
+    return result
+
+def rebuild_ngrams(genome_data, n_gram, mode, sketch_size, seed, workers, 
+                   cache):
+    '''
+    The function rebuild_ngrams builds the n-grams of already loaded genomes 
+    for another n-gram size, from the sequences they keep, so that the FASTA 
+    file is not read again.
+    genome_data - takes in the dictionary of genome data, with the sequences 
+    kept
+    n_gram - takes in the n-gram size
+    mode - takes in how the n-grams are stored
+    sketch_size - takes in the number of hashes kept in the "sketch" mode
+    seed - takes in the seed of the hash function of the "sketch" mode
+    workers - takes in the number of worker processes that build the n-grams
+    cache - takes in a KmerCache, or None
+    '''
+    if workers > 1:
+        records = ((name, genome.get_sequence()) 
+                   for name, genome in genome_data.items())
+        for name, sequence, ngrams in parallel_ngrams(records, n_gram, mode, \
+                sketch_size, seed, workers, cache):
+            genome_data[name].set_ngrams(ngrams)
+    elif cache is not None:
+        for genome in genome_data.values():
+            genome.set_ngrams(cache.get_ngrams(genome.get_sequence(), n_gram,
+                                               mode, sketch_size, seed))
+    else:
+        for genome in genome_data.values():
+            genome.create_ngrams(n_gram, mode, sketch_size, seed)
+
+def matrix_name(filename, n_gram, mode, sketch_size, seed, metric):
+    '''
+    The function matrix_name returns the name of the subdirectory the stored 
+    similarity matrix of a FASTA file is kept in. It holds a digest of the 
+    full path of the file, so files of the same name in different 
+    directories do not share a matrix, and all the n-gram settings.
+    filename - takes in the name of the FASTA file
+    n_gram - takes in the n-gram size
+    mode - takes in how the n-grams are stored, one of genome.MODES
+    sketch_size - takes in the number of hashes kept in the sketch modes
+    seed - takes in the seed of the hash function of the sketch modes
+    metric - takes in the similarity metric
+    '''
+    path = os.path.abspath(filename).encode("utf-8", "replace")
+    name = "{}-{}-{}-{}-{}".format(os.path.basename(filename),
+                                   hashlib.sha256(path).hexdigest()[:16],
+                                   n_gram, mode, metric)
+    if mode in SKETCH_MODES:
+        name += "-{}-{}".format(sketch_size, seed)
+    return name
+
+def run_jobs(filenames, n_grams, engines, linkages, workers, mode="set", 
+             sketch_size=DEFAULT_SKETCH_SIZE, seed=DEFAULT_SEED, cache=None, 
+             newick=False, output=sys.stdout, report=sys.stderr, 
+             sweep=False, replicates=0, metric="jaccard", 
+             matrix_directory=None):
+    '''
+    The function run_jobs builds a tree for every combination of FASTA file, 
+    n-gram size, engine, linkage and worker count, and prints each tree to 
+    output. Every file is read once, and its genomes are kept for all the 
+    n-gram sizes. The time and memory of every stage are printed to report.
+    filenames - takes in the list of FASTA file names
+    n_grams - takes in the list of n-gram sizes
+    engines - takes in the list of engines, "linkage", "nj" or "mst"
+    linkages - takes in the list of linkages the "linkage" engine uses, the 
+    "nj" engine ignores them and the "mst" engine only does "single"
+    workers - takes in the list of worker counts
+    mode - takes in how the n-grams are stored, one of genome.MODES
+    sketch_size - takes in the number of hashes kept in the "sketch" mode
+    seed - takes in the seed of the hash function of the "sketch" mode
+    cache - takes in a KmerCache, or None
+    newick - takes in whether the trees are printed in the Newick format
+    output - takes in the file object the trees are printed to
+    report - takes in the file object the timings are printed to
+    sweep - takes in whether the n-grams of all the sizes are built in one 
+    pass over every sequence and the similarity matrices of all the sizes 
+    are computed together, see read_fasta_sweep and similarity_matrices. 
+    The worker counts are not used then
+    replicates - takes in the number of bootstrap replicates, 0 for trees 
+    without supports. The supports are printed with the Newick format
+    metric - takes in the similarity metric, see construct_phylogenetic_tree
+    matrix_directory - takes in a directory the similarity matrix of every 
+    file and n-gram size is kept in on disk, in a subdirectory of its own 
+    named after the full path of the file and the n-gram settings, or None. 
+    Only the "mst" engine takes a stored matrix, and the matrices of a sweep 
+    are computed together in memory and are not stored
+    '''
+    if matrix_directory is not None and \
+       any(engine != "mst" for engine in engines):
+        raise ValueError("a stored similarity matrix is only read by the "
+                         "mst engine")
+    if matrix_directory is not None and sweep:
+        raise ValueError("the similarity matrices of a sweep are not stored, "
+                         "leave out the matrix directory or the sweep")
+    most_workers = max(workers)
+    sizes = "{}-{}".format(min(n_grams), max(n_grams))
+    for filename in filenames:
+        genome_data = None
+        matrices = {}
+        if sweep:
+            genome_data_by_size = timed_stage( \
+                "{} n={} read_fasta_sweep".format(filename, sizes), report, \
+                read_fasta_sweep, filename, n_grams, mode, sketch_size, seed)
+            matrices = timed_stage( \
+                "{} n={} similarity_matrices".format(filename, sizes), \
+                report, similarity_matrices, genome_data_by_size, mode, \
+                metric)
+        for n_gram in n_grams:
+            if sweep:
+                genome_data = genome_data_by_size[n_gram]
+            elif genome_data is None:
+                genome_data = timed_stage( \
+                    "{} n={} read_fasta_file".format(filename, n_gram), \
+                    report, read_fasta_file, filename, n_gram, mode, \
+                    sketch_size, seed, workers=most_workers, cache=cache)
+            else:
+                timed_stage("{} n={} create_ngrams".format(filename, n_gram), 
+                            report, rebuild_ngrams, genome_data, n_gram, mode,
+                            sketch_size, seed, most_workers, cache)
+            if matrix_directory is not None:
+                directory = os.path.join(matrix_directory, matrix_name( \
+                    filename, n_gram, mode, sketch_size, seed, metric))
+                matrices[n_gram] = timed_stage( \
+                    "{} n={} similarity store".format(filename, n_gram), \
+                    report, stored_similarity_matrix, genome_data, \
+                    directory, metric, n_gram, report)
+            for engine in engines:
+                for linkage in linkages:
+                    if engine == "nj" and linkage != linkages[0] or \
+                       engine == "mst" and linkage != "single":
+                        continue
+                    for worker_count in workers:
+                        matrix = matrices.get(n_gram)
+                        job = "{} n={} {}".format(filename, n_gram, engine)
+                        if engine != "nj":
+                            job += " " + linkage
+                        if metric != "jaccard":
+                            job += " " + metric
+                        if engine != "mst" and matrix is None:
+                            job += " workers={}".format(worker_count)
+                        root = timed_stage(job, report, 
+                                           construct_phylogenetic_tree, 
+                                           genome_data, worker_count, report,
+                                           linkage, engine, True, matrix, 
+                                           metric, n_gram)
+                        if replicates > 0:
+                            timed_stage(job + " bootstrap", report, 
+                                        bootstrap_support, genome_data, root,
+                                        replicates, linkage, engine, 
+                                        most_workers, seed, metric, n_gram)
+                        print("# " + job, file=output)
+                        if newick:
+                            print(newick_string(root), end="", file=output)
+                        else:
+                            print(root, file=output)
+                        if engine == "mst" or matrix is not None:
+                            break
+
+def parse_arguments(arguments=None):
+    '''
+    The function parse_arguments returns the command line options of phylo.
+    arguments - takes in the list of arguments, or None for sys.argv
+    '''
+    parser = argparse.ArgumentParser(description="Build phylogenetic trees "
+                                     "from the n-grams of FASTA genomes. "
+                                     "Without FASTA files the file and the "
+                                     "n-gram size are asked for.")
+    parser.add_argument("fasta", nargs="*", help="FASTA files")
+    parser.add_argument("-n", "--n-gram", type=int, nargs="+", default=[3],
+                        help="n-gram sizes")
+    parser.add_argument("--engine", nargs="+", default=["linkage"],
+                        choices=["linkage", "nj", "mst"])
+    parser.add_argument("--linkage", nargs="+", default=["single"],
+                        choices=["single", "complete", "average", "ward"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1],
+                        help="worker process counts")
+    parser.add_argument("--mode", default="set", choices=MODES,
+                        help="the canonical modes ignore the strand")
+    parser.add_argument("--sketch-size", type=int,
+                        default=DEFAULT_SKETCH_SIZE)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--cache", help="k-mer cache directory")
+    parser.add_argument("--state", help="state directory for incremental "
+                        "updates, used when no FASTA file is given")
+    parser.add_argument("--newick", action="store_true",
+                        help="print the trees in the Newick format")
+    parser.add_argument("--sweep", action="store_true",
+                        help="build the n-grams and similarities of all the "
+                        "n-gram sizes together")
+    parser.add_argument("--metric", default="jaccard", choices=METRICS,
+                        help="the similarity of two genomes, weighted-jaccard "
+                        "needs --mode counts or canonical-counts")
+    parser.add_argument("--matrix-dir", help="directory to keep the "
+                        "similarity matrices in on disk, a stopped run "
+                        "resumes where it was, only with --engine mst and "
+                        "not with --sweep")
+    parser.add_argument("--bootstrap", type=int, default=0,
+                        metavar="REPLICATES",
+                        help="bootstrap replicates for the support values")
+    return parser.parse_args(arguments)
+
+def command_line(arguments=None):
+    '''
+    The function command_line runs phylo from the command line. With FASTA 
+    files the trees of all the jobs are built, without them main asks for 
+    the file and the n-gram size like before.
+    arguments - takes in the list of arguments, or None for sys.argv
+    '''
+    options = parse_arguments(arguments)
+    if not options.fasta:
+        main(options.mode, options.sketch_size, options.seed, options.state,
+             options.linkage[0], options.engine[0])
+        return
+    cache = None if options.cache is None else KmerCache(options.cache)
+    run_jobs(options.fasta, options.n_gram, options.engine, options.linkage,
+             options.workers, options.mode, options.sketch_size, options.seed,
+             cache, options.newick, sweep=options.sweep,
+             replicates=options.bootstrap, metric=options.metric,
+             matrix_directory=options.matrix_dir)
+
+if __name__ == "__main__":
+    # calling main through the command line options
+    command_line()
@@ -0,0 +1,433 @@
+'''
+File: similarity.py
+Author: Pri Vaghela
+Description: The program builds the matrix of pairwise Jaccard similarities
+between genomes. The n-grams of every genome are encoded as integer codes so
+that the whole symmetric matrix can be computed in batches with NumPy instead
+of one pair of Python sets at a time. Besides the Jaccard similarity the
+matrix can hold the containment, the weighted Jaccard similarity of k-mer
+counts or a similarity from the Mash distance, all found from the same
+intersection sizes.
+'''
+
+import numpy as np
+from kmer_counts import KmerCounts
+from sketch import MinHashSketch, sketch_matrix, sketch_similarity
+
+# the number of bytes one dense block of the indicator matrix may use
+BLOCK_BYTES = 1 << 26
+
+# "jaccard" is |A & B| / |A | B|, "containment" is |A & B| / min(|A|, |B|),
+# which does not punish genomes of very different sizes, "weighted-jaccard"
+# is the Jaccard similarity of the k-mer multisets and "mash" is exp(-D) of
+# the Mash distance D = -ln(2J / (1 + J)) / k, which is close to 1 - D for
+# near genomes and, unlike 1 - D, never ties distant ones at 0
+METRICS = ("jaccard", "containment", "weighted-jaccard", "mash")
+
+def encode_ngram_sets(ngram_sets):
+    '''
+    The function encode_ngram_sets gives every distinct n-gram an integer
+    code and returns, for every set, a sorted NumPy array of the codes of its
+    n-grams.
+    ngram_sets - this parameter takes in a list of sets of n-grams
+    '''
+    vocabulary = {}
+    encoded = []
+    for ngrams in ngram_sets:
+        codes = [vocabulary.setdefault(ngram, len(vocabulary))
+                 for ngram in ngrams]
+        encoded.append(np.sort(np.array(codes, dtype=np.int64)))
+    return encoded
+
+def weighted_code_arrays(kmer_counts):
+    '''
+    The function weighted_code_arrays returns, for every KmerCounts, a sorted
+    array of unique integer codes in which a k-mer that occurs c times is
+    given c codes, one for each of its copies 1 to c. The intersection of
+    two such arrays has min(c1, c2) codes of every k-mer and their union
+    max(c1, c2), so their Jaccard similarity is the weighted Jaccard
+    similarity of the counts.
+    kmer_counts - this parameter takes in a list of KmerCounts
+    '''
+    counts = [kmers.get_counts().astype(np.int64) for kmers in kmer_counts]
+    totals = np.array([counts_of.sum() for counts_of in counts],
+                      dtype=np.int64)
+    if totals.sum() == 0:
+        return [np.zeros(0, dtype=np.int64) for kmers in kmer_counts]
+    all_counts = np.concatenate(counts)
+    codes = np.repeat(np.concatenate([kmers.get_codes()
+                                      for kmers in kmer_counts]), all_counts)
+    # the number of the copy of every code, counted from 0
+    copies = np.arange(len(codes)) - np.repeat(np.cumsum(all_counts) -
+                                               all_counts, all_counts)
+    order = np.lexsort((copies, codes))
+    codes = codes[order]
+    copies = copies[order]
+    changes = np.empty(len(codes), dtype=np.int64)
+    changes[0] = 0
+    changes[1:] = (codes[1:] != codes[:-1]) | (copies[1:] != copies[:-1])
+    keys = np.empty(len(codes), dtype=np.int64)
+    keys[order] = np.cumsum(changes)
+    return np.split(keys, np.cumsum(totals)[:-1])
+
+def code_arrays(ngrams, metric="jaccard"):
+    '''
+    The function code_arrays returns the n-grams of every genome as a sorted
+    array of unique integer codes for the batched kernels. Sets are encoded,
+    KmerCounts give their distinct codes, and for the "weighted-jaccard"
+    metric their copies, see weighted_code_arrays. It raises ValueError when
+    the metric needs counts that the n-grams do not have.
+    ngrams - this parameter takes in the list of the n-grams of the genomes,
+    none of them sketches
+    metric - this parameter takes in one of METRICS
+    '''
+    if metric == "weighted-jaccard":
+        if not all(isinstance(kmers, KmerCounts) for kmers in ngrams):
+            raise ValueError("the weighted-jaccard metric needs k-mer "
+                             "counts, see the counts modes")
+        return weighted_code_arrays(ngrams)
+    ngrams = [kmers.get_codes() if isinstance(kmers, KmerCounts) else kmers
+              for kmers in ngrams]
+    if any(isinstance(ngram_set, set) for ngram_set in ngrams):
+        ngrams = encode_ngram_sets(ngrams)
+    return ngrams
+
+def check_metric(metric, n=None):
+    '''
+    The function check_metric raises ValueError for a metric that is not one
+    of METRICS, or for the "mash" metric without the k-mer length.
+    metric - this parameter takes in the name of the metric
+    n - this parameter takes in the k-mer length, or None
+    '''
+    if metric not in METRICS:
+        raise ValueError("unknown similarity metric: {}".format(metric))
+    if metric == "mash" and n is None:
+        raise ValueError("the mash metric needs the k-mer length")
+
+def mash_distance(jaccard, n):
+    '''
+    The function mash_distance returns the Mash distance -ln(2J / (1 + J)) / k
+    of an array of Jaccard similarities, an estimate of the mutation rate
+    between the genomes, and infinity where J is 0.
+    jaccard - this parameter takes in the array of Jaccard similarities
+    n - this parameter takes in the k-mer length
+    '''
+    jaccard = np.asarray(jaccard, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        return -np.log(2 * jaccard / (1 + jaccard)) / n
+
+def mash_similarity(jaccard, n):
+    '''
+    The function mash_similarity returns exp(-D) of the Mash distances D of
+    an array of Jaccard similarities, which is (2J / (1 + J)) ** (1 / k). It
+    goes down with the distance everywhere, so genomes further apart than a
+    distance of 1 keep their order, and it is 0 only where J is 0.
+    jaccard - this parameter takes in the array of Jaccard similarities
+    n - this parameter takes in the k-mer length
+    '''
+    jaccard = np.asarray(jaccard, dtype=np.float64)
+    return (2 * jaccard / (1 + jaccard)) ** (1.0 / n)
+
+def metric_from_counts(intersection, row_sizes, column_sizes,
+                       metric="jaccard", n=None):
+    '''
+    The function metric_from_counts returns the similarities of a metric from
+    the intersection sizes and the sizes of the code arrays, 0 where there is
+    nothing to compare. For "mash" it is mash_similarity of the Jaccard
+    similarities.
+    intersection - this parameter takes in the matrix of intersection sizes
+    row_sizes - this parameter takes in the array of sizes of the row arrays
+    column_sizes - this parameter takes in the array of sizes of the column
+    arrays
+    metric - this parameter takes in one of METRICS
+    n - this parameter takes in the k-mer length, needed for "mash"
+    '''
+    if metric == "containment":
+        smaller = np.minimum(row_sizes[:, None], column_sizes[None, :])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(smaller > 0, intersection / smaller, 0.0)
+    jaccard = jaccard_from_counts(intersection, row_sizes, column_sizes)
+    if metric == "mash":
+        return mash_similarity(jaccard, n)
+    return jaccard
+
+def sketch_metric(jaccard, metric="jaccard", n=None):
+    '''
+    The function sketch_metric returns the similarities of a metric from the
+    Jaccard similarities estimated from sketches. Sketches hold neither the
+    sizes nor the counts of the k-mers, so only "jaccard" and "mash" can be
+    found and the other metrics raise ValueError.
+    jaccard - this parameter takes in the matrix of estimated similarities
+    metric - this parameter takes in one of METRICS
+    n - this parameter takes in the k-mer length, needed for "mash"
+    '''
+    if metric == "mash":
+        return mash_similarity(jaccard, n)
+    if metric != "jaccard":
+        raise ValueError("the {} metric needs the k-mers, not sketches"
+                         .format(metric))
+    return jaccard
+
+def intersection_counts(rows, columns=None):
+    '''
+    The function intersection_counts returns the matrix of the intersection
+    sizes of every array in rows with every array in columns. Every array
+    becomes a row of a 0/1 indicator matrix and the counts are the product of
+    the indicator matrices, accumulated over blocks of codes so that memory
+    stays bounded.
+    rows - this parameter takes in a list of arrays of unique integer codes
+    columns - this parameter takes in a second list of arrays, or None to
+    compare rows with itself
+    '''
+    arrays = rows if columns is None else rows + columns
+    count = len(arrays)
+    sizes = np.array([len(codes) for codes in arrays], dtype=np.int64)
+    width = len(rows) if columns is None else len(columns)
+    if sizes.sum() == 0:
+        return np.zeros((len(rows), width), dtype=np.float64)
+    all_codes = np.concatenate(arrays)
+    owners = np.repeat(np.arange(count), sizes)
+    order = np.argsort(all_codes, kind="stable")
+    return sorted_intersection_counts(all_codes[order], owners[order],
+                                      len(rows), width, columns is None)
+
+def sorted_intersection_counts(all_codes, owners, row_count, width, square,
+                               weights=None):
+    '''
+    The function sorted_intersection_counts does the work of
+    intersection_counts once the codes of all the arrays are sorted
+    together. A code may be listed for the same array more than once. With
+    weights every shared code counts with its weight instead of 1.
+    all_codes - this parameter takes in the sorted array of all the codes
+    owners - this parameter takes in the number of the array of every code
+    row_count - this parameter takes in the number of row arrays
+    width - this parameter takes in the number of column arrays
+    square - this parameter takes in whether the rows are compared with
+    themselves, otherwise the columns are the arrays after the rows
+    weights - this parameter takes in the array of the weights of the
+    distinct codes in sorted order, or None
+    '''
+    count = row_count if square else row_count + width
+    intersection = np.zeros((row_count, width), dtype=np.float64)
+    if len(all_codes) == 0:
+        return intersection
+    # renumbering the sorted codes as 0..m-1 so that the columns are dense
+    changes = np.empty(len(all_codes), dtype=np.int64)
+    changes[0] = 0
+    np.not_equal(all_codes[1:], all_codes[:-1], out=changes[1:])
+    all_codes = np.cumsum(changes)
+    block = max(1, BLOCK_BYTES // (8 * count))
+    for low in range(0, int(all_codes[-1]) + 1, block):
+        start, stop = np.searchsorted(all_codes, [low, low + block])
+        indicator = np.zeros((count, block), dtype=np.float64)
+        indicator[owners[start:stop], all_codes[start:stop] - low] = 1.0
+        weighted = indicator
+        if weights is not None:
+            block_weights = weights[low:low + block]
+            indicator = indicator[:, :len(block_weights)]
+            weighted = indicator * block_weights
+        if square:
+            intersection += weighted @ indicator.T
+        else:
+            intersection += weighted[:row_count] @ indicator[row_count:].T
+    return intersection
+
+def jaccard_block(rows, columns=None):
+    '''
+    The function jaccard_block returns the matrix of Jaccard similarities of
+    every array in rows with every array in columns. Two empty arrays have a
+    similarity of 0.
+    rows - this parameter takes in a list of arrays of unique integer codes
+    columns - this parameter takes in a second list of arrays, or None to
+    compare rows with itself
+    '''
+    intersection = intersection_counts(rows, columns)
+    if columns is None:
+        columns = rows
+    row_sizes = np.array([len(codes) for codes in rows], dtype=np.int64)
+    column_sizes = np.array([len(codes) for codes in columns], dtype=np.int64)
+    return jaccard_from_counts(intersection, row_sizes, column_sizes)
+
+def jaccard_from_counts(intersection, row_sizes, column_sizes):
+    '''
+    The function jaccard_from_counts returns the Jaccard similarities from
+    the intersection sizes and the set sizes, 0 where both sets are empty.
+    intersection - this parameter takes in the matrix of intersection sizes
+    row_sizes - this parameter takes in the array of sizes of the row sets
+    column_sizes - this parameter takes in the array of sizes of the column
+    sets
+    '''
+    union = row_sizes[:, None] + column_sizes[None, :] - intersection
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, intersection / union, 0.0)
+
+def jaccard_matrix(code_arrays):
+    '''
+    The function jaccard_matrix computes the symmetric matrix of Jaccard
+    similarities between arrays of unique integer codes, all in one block.
+    code_arrays - this parameter takes in a list of arrays of unique integer
+    codes, one for each genome
+    '''
+    return jaccard_block(code_arrays)
+
+def similarity_matrix(genome_data, metric="jaccard", n=None):
+    '''
+    The function similarity_matrix returns the Jaccard similarity matrix of
+    the n-grams of the genomes, with rows and columns in the order of the
+    dictionary, or the matrix of another of METRICS. Compact n-grams are
+    already integer codes and are used as they are, and for sketches the
+    similarities are estimated.
+    genome_data - this parameter takes in the dictionary of genome data where
+    each genome is represented as a GenomeData object
+    metric - this parameter takes in one of METRICS
+    n - this parameter takes in the k-mer length, needed for "mash"
+    '''
+    check_metric(metric, n)
+    ngrams = [genome.get_ngrams() for genome in genome_data.values()]
+    if any(isinstance(ngram_set, MinHashSketch) for ngram_set in ngrams):
+        return sketch_metric(sketch_matrix(ngrams), metric, n)
+    ngrams = code_arrays(ngrams, metric)
+    if metric in ("jaccard", "weighted-jaccard"):
+        return jaccard_matrix(ngrams)
+    sizes = np.array([len(codes) for codes in ngrams], dtype=np.int64)
+    return metric_from_counts(intersection_counts(ngrams), sizes, sizes,
+                              metric, n)
+
+def similarity_matrices(genome_data_by_size, mode="compact",
+                        metric="jaccard"):
+    '''
+    The function similarity_matrices returns a dictionary from every n-gram
+    size to the similarity matrix of the genomes with n-grams of that size,
+    the same matrices as similarity_matrix. For compact n-grams the codes of
+    the longest size are sorted together only once: the code of a shorter
+    k-mer is the code of a longer one shifted right, so shifting the sorted
+    codes gives the sorted codes of the shorter size, and only the few
+    shorter k-mers that are not the start of a longer one are merged in.
+    genome_data_by_size - this parameter takes in a dictionary from the
+    n-gram size to a dictionary of genome data, all with the same genomes in
+    the same order, as returned by phylo.read_fasta_sweep
+    mode - this parameter takes in the mode the n-grams were built in.
+    Canonical k-mers are not the start of longer ones, so in the
+    "canonical" mode every matrix is computed on its own
+    metric - this parameter takes in one of METRICS, the matrices of the
+    metrics other than "jaccard" are computed on their own
+    '''
+    sizes = sorted(genome_data_by_size)
+    ngrams = dict((n, [genome.get_ngrams() for genome in
+                       genome_data_by_size[n].values()]) for n in sizes)
+    compact = all(isinstance(codes, np.ndarray) and codes.dtype == np.uint64
+                  for n in sizes for codes in ngrams[n])
+    if not sizes or not compact or mode != "compact" or metric != "jaccard":
+        return dict((n, similarity_matrix(genome_data_by_size[n], metric, n))
+                    for n in sizes)
+    longest = sizes[-1]
+    count = len(ngrams[longest])
+    all_codes = np.concatenate(ngrams[longest] + [np.zeros(0, np.uint64)])
+    owners = np.repeat(np.arange(count),
+                       [len(codes) for codes in ngrams[longest]])
+    order = np.argsort(all_codes)
+    all_codes = all_codes[order]
+    owners = owners[order]
+    matrices = {}
+    for n in sizes:
+        shift = np.uint64(2 * (longest - n))
+        codes = all_codes >> shift
+        code_owners = owners
+        # the k-mers of size n that no longer k-mer of the genome starts with
+        extras = []
+        extra_owners = []
+        for i, (short, long) in enumerate(zip(ngrams[n], ngrams[longest])):
+            prefixes = long >> shift
+            if len(prefixes) == 0:
+                extra = short
+            else:
+                positions = np.searchsorted(prefixes, short)
+                positions[positions == len(prefixes)] = 0
+                extra = short[prefixes[positions] != short]
+            extras.append(extra)
+            extra_owners.append(np.full(len(extra), i, dtype=np.int64))
+        extras = np.concatenate(extras + [np.zeros(0, np.uint64)])
+        if len(extras):
+            extra_owners = np.concatenate(extra_owners)
+            extra_order = np.argsort(extras)
+            extras = extras[extra_order]
+            places = np.searchsorted(codes, extras)
+            codes = np.insert(codes, places, extras)
+            code_owners = np.insert(owners, places, extra_owners[extra_order])
+        intersection = sorted_intersection_counts(codes, code_owners, count,
+                                                  count, True)
+        set_sizes = np.array([len(codes) for codes in ngrams[n]],
+                             dtype=np.int64)
+        matrices[n] = jaccard_from_counts(intersection, set_sizes, set_sizes)
+    return matrices
+
+def similarity_rows(genome_data, names, metric="jaccard", n=None):
+    '''
+    The function similarity_rows returns the rows of the similarity matrix
+    of the named genomes only, against all the genomes in the dictionary, so
+    that a few new genomes can be compared without redoing every pair.
+    genome_data - this parameter takes in the dictionary of genome data where
+    each genome is represented as a GenomeData object
+    names - this parameter takes in the list of names of the rows
+    metric - this parameter takes in one of METRICS
+    n - this parameter takes in the k-mer length, needed for "mash"
+    '''
+    check_metric(metric, n)
+    ngrams = [genome.get_ngrams() for genome in genome_data.values()]
+    rows = [genome_data[name].get_ngrams() for name in names]
+    if any(isinstance(ngram_set, MinHashSketch) for ngram_set in ngrams):
+        matrix = np.zeros((len(rows), len(ngrams)), dtype=np.float64)
+        for i, row in enumerate(rows):
+            for j, ngram_set in enumerate(ngrams):
+                matrix[i, j] = sketch_similarity(row, ngram_set)
+        return sketch_metric(matrix, metric, n)
+    encoded = code_arrays(ngrams, metric)
+    positions = dict((name, i) for i, name in enumerate(genome_data))
+    rows = [encoded[positions[name]] for name in names]
+    row_sizes = np.array([len(codes) for codes in rows], dtype=np.int64)
+    sizes = np.array([len(codes) for codes in encoded], dtype=np.int64)
+    return metric_from_counts(intersection_counts(rows, encoded), row_sizes,
+                              sizes, metric, n)
+
+def similarity_row_function(genome_data, metric="jaccard", n=None):
+    '''
+    The function similarity_row_function returns a function row(i) that
+    computes the similarities of the i-th genome to all the genomes on
+    demand, with the same values as similarity_matrix but without ever
+    holding more than one row. The codes of all genomes are sorted together
+    once, and the genomes sharing each code of genome i are found with a
+    binary search.
+    genome_data - this parameter takes in the dictionary of genome data where
+    each genome is represented as a GenomeData object
+    metric - this parameter takes in one of METRICS
+    n - this parameter takes in the k-mer length, needed for "mash"
+    '''
+    check_metric(metric, n)
+    ngrams = [genome.get_ngrams() for genome in genome_data.values()]
+    if any(isinstance(ngram_set, MinHashSketch) for ngram_set in ngrams):
+        def sketch_row(i):
+            return sketch_metric(np.array([sketch_similarity(ngrams[i],
+                                                             ngram_set)
+                                           for ngram_set in ngrams]),
+                                 metric, n)
+        return sketch_row
+    ngrams = code_arrays(ngrams, metric)
+    count = len(ngrams)
+    sizes = np.array([len(codes) for codes in ngrams], dtype=np.int64)
+    all_codes = np.concatenate(ngrams) if count else np.zeros(0, np.uint64)
+    owners = np.repeat(np.arange(count), sizes)
+    order = np.argsort(all_codes, kind="stable")
+    all_codes = all_codes[order]
+    owners = owners[order]
+    def row(i):
+        starts = np.searchsorted(all_codes, ngrams[i], side="left")
+        stops = np.searchsorted(all_codes, ngrams[i], side="right")
+        lengths = stops - starts
+        # the positions of every matching code, one range per code of i
+        positions = np.arange(lengths.sum()) - \
+            np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+        intersection = np.bincount(owners[positions], minlength=count)
+        intersection = intersection.astype(np.float64)
+        return metric_from_counts(intersection[None, :], sizes[i:i + 1],
+                                  sizes, metric, n)[0]
+    return row
@@ -0,0 +1,173 @@
+'''
+File: sketch.py
+Author: Pri Vaghela
+Description: The program creates bottom-k MinHash sketches of the k-mers of a
+genome and estimates the Jaccard similarity of two genomes from their
+sketches. A sketch keeps only the smallest hash values of the k-mers, so its
+size does not grow with the length of the genome.
+'''
+
+import numpy as np
+from kmers import encode_kmers, sorted_unique
+
+DEFAULT_SKETCH_SIZE = 1000
+DEFAULT_SEED = 42
+
+# pads the rows of a sketch matrix, real hashes are 63-bit and never equal it
+EMPTY = np.uint64(2**64 - 1)
+
+def hash_kmers(kmers, seed):
+    '''
+    The function hash_kmers scrambles an array of k-mer codes with the
+    splitmix64 finalizer and returns 63-bit hash values.
+    kmers - this parameter takes in the array of k-mer codes
+    seed - this parameter takes in the integer seed of the hash function
+    '''
+    values = kmers.astype(np.uint64)
+    values += np.uint64((seed * 0x9E3779B97F4A7C15) % 2**64)
+    values ^= values >> np.uint64(30)
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values >> np.uint64(1)
+
+class MinHashSketch:
+    '''
+    The class MinHashSketch is a bottom-k MinHash sketch, the sorted smallest
+    hash values of the k-mers of one genome.
+    '''
+    def __init__(self, hashes, size, seed):
+        '''
+        initializing the sorted array of hashes, the sketch size and the seed
+        '''
+        self._hashes = hashes
+        self._size = size
+        self._seed = seed
+
+    def get_hashes(self):
+        '''
+        The method get_hashes returns the sorted array of hashes.
+        '''
+        return self._hashes
+
+    def get_size(self):
+        '''
+        The method get_size returns the sketch size the sketch was built with.
+        '''
+        return self._size
+
+    def get_seed(self):
+        '''
+        The method get_seed returns the seed of the hash function.
+        '''
+        return self._seed
+
+    def __len__(self):
+        '''
+        The method __len__ returns the number of hashes kept in the sketch.
+        '''
+        return len(self._hashes)
+
+def sketch_kmers(kmers, size=DEFAULT_SKETCH_SIZE, seed=DEFAULT_SEED):
+    '''
+    The function sketch_kmers builds the MinHashSketch of an array of k-mer
+    codes.
+    kmers - this parameter takes in the array of k-mer codes
+    size - this parameter takes in the number of hashes to keep
+    seed - this parameter takes in the seed of the hash function
+    '''
+    hashes = hash_kmers(kmers, seed)
+    if len(hashes) > size:
+        # only the smallest hashes are kept, so there is no need to sort all
+        hashes = np.partition(hashes, size - 1)[:size]
+    return MinHashSketch(sorted_unique(hashes), size, seed)
+
+def merge_sketch_hashes(hashes, new_hashes, size):
+    '''
+    The function merge_sketch_hashes returns the sorted smallest distinct
+    hashes of a sketch's hashes together with some new hashes.
+    hashes - this parameter takes in the sorted distinct hashes kept so far
+    new_hashes - this parameter takes in the array of new hashes
+    size - this parameter takes in the number of hashes to keep
+    '''
+    if len(hashes) >= size:
+        # hashes above the largest kept one can never make it into the sketch
+        new_hashes = new_hashes[new_hashes < hashes[size - 1]]
+    return sorted_unique(np.concatenate((hashes, new_hashes)))[:size]
+
+def sketch_sequence(sequence, n, size=DEFAULT_SKETCH_SIZE, seed=DEFAULT_SEED):
+    '''
+    The function sketch_sequence builds the MinHashSketch of the k-mers of
+    length n of a sequence.
+    sequence - this parameter takes in the sequence
+    n - this parameter takes in the k-mer length
+    size - this parameter takes in the number of hashes to keep
+    seed - this parameter takes in the seed of the hash function
+    '''
+    return sketch_kmers(encode_kmers(sequence, n), size, seed)
+
+def check_compatible(sketch1, sketch2):
+    '''
+    The function check_compatible raises a ValueError if two sketches were
+    built with a different size or seed and can not be compared.
+    sketch1 - this parameter takes in the first sketch
+    sketch2 - this parameter takes in the second sketch
+    '''
+    if sketch1.get_size() != sketch2.get_size() or \
+       sketch1.get_seed() != sketch2.get_seed():
+        raise ValueError("sketches with different sizes or seeds")
+
+def sketch_similarity(sketch1, sketch2):
+    '''
+    The function sketch_similarity estimates the Jaccard similarity of two
+    genomes as the fraction of the smallest hashes of the union of their
+    sketches that is found in both sketches.
+    sketch1 - this parameter takes in the first sketch
+    sketch2 - this parameter takes in the second sketch
+    '''
+    check_compatible(sketch1, sketch2)
+    hashes1 = sketch1.get_hashes()
+    hashes2 = sketch2.get_hashes()
+    union = np.union1d(hashes1, hashes2)[:sketch1.get_size()]
+    if len(union) == 0:
+        return 0.0
+    shared = np.intersect1d(hashes1, hashes2, assume_unique=True)
+    return np.count_nonzero(shared <= union[-1]) / len(union)
+
+def sketch_matrix(sketches):
+    '''
+    The function sketch_matrix estimates the Jaccard similarity of every pair
+    of sketches. For each sketch, the hashes of all the sketches are looked
+    up in it at once, which gives every hash its rank in the union of the
+    two sketches without merging them.
+    sketches - this parameter takes in the list of sketches
+    '''
+    count = len(sketches)
+    matrix = np.zeros((count, count), dtype=np.float64)
+    if count == 0:
+        return matrix
+    for sketch in sketches:
+        check_compatible(sketches[0], sketch)
+    size = sketches[0].get_size()
+    lengths = np.array([len(sketch) for sketch in sketches])
+    padded = np.full((count, size), EMPTY, dtype=np.uint64)
+    for i, sketch in enumerate(sketches):
+        padded[i, :len(sketch)] = sketch.get_hashes()
+    real = padded != EMPTY
+    positions = np.arange(1, size + 1)
+    for i, sketch in enumerate(sketches):
+        hashes = sketch.get_hashes()
+        if len(hashes) == 0:
+            continue
+        # below is the number of hashes of this sketch that are <= each hash
+        below = np.searchsorted(hashes, padded, side="right")
+        shared = real & (below > 0) & \
+            (hashes[np.maximum(below - 1, 0)] == padded)
+        # the rank of a hash in the union counts the shared hashes only once
+        rank = positions + below - np.cumsum(shared, axis=1)
+        in_both = np.count_nonzero(shared & (rank <= size), axis=1)
+        union = np.minimum(size, len(hashes) + lengths - shared.sum(axis=1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matrix[i] = np.where(union > 0, in_both / union, 0.0)
+    return matrix
@@ -0,0 +1,63 @@
+'''
+File: test_benchmark.py
+Author: Pri Vaghela
+Description: The program tests that benchmark.py runs every stage once and
+reports the peak memory of the stage, and that phylo prints the same peak
+for its stages.
+'''
+
+import io
+import numpy as np
+import phylo
+from benchmark import find_regressions, measure
+
+def test_measure_runs_stage_once():
+    '''
+    The function test_measure_runs_stage_once checks that measure calls the
+    function once and returns its result with the stage, its time and its
+    peak memory.
+    '''
+    calls = []
+    def stage(value):
+        calls.append(value)
+        return value + 1
+    result, measured = measure("stage", stage, 41)
+    assert result == 42 and calls == [41]
+    assert measured["stage"] == "stage" and measured["seconds"] >= 0
+    assert measured["peak_scope"] in ("stage", "process")
+
+def test_stage_peak():
+    '''
+    The function test_stage_peak checks that the peak of a stage that fills
+    a large array takes it in, and that where the peak can be started over
+    the peak of a later small stage does not.
+    '''
+    size = 100 * 1024 * 1024
+    big = measure("big", lambda: np.ones(size, dtype=np.uint8).sum())[1]
+    small = measure("small", lambda: sum(range(1000)))[1]
+    if big["peak_bytes"] is None:
+        return
+    assert big["peak_bytes"] >= size
+    if big["peak_scope"] == "stage" and small["peak_scope"] == "stage":
+        assert small["peak_bytes"] < big["peak_bytes"] - size // 2
+    report = io.StringIO()
+    assert phylo.timed_stage("small", report, sum, range(1000)) == 499500
+    label = "peak memory" if small["peak_scope"] == "stage" else \
+        "process peak memory"
+    assert report.getvalue().startswith("small: ")
+    assert ", {} ".format(label) in report.getvalue()
+
+def test_find_regressions():
+    '''
+    The function test_find_regressions checks that slower stages are found,
+    and that memory is only compared between peaks of single stages.
+    '''
+    old = [{"stage": "a", "seconds": 1.0, "peak_bytes": 100,
+            "peak_scope": "stage"},
+           {"stage": "b", "seconds": 1.0, "peak_bytes": 100}]
+    new = [{"stage": "a", "seconds": 2.0, "peak_bytes": 200,
+            "peak_scope": "stage"},
+           {"stage": "b", "seconds": 1.0, "peak_bytes": 200,
+            "peak_scope": "stage"}]
+    assert find_regressions(old, new) == ["a: 2.000 s, was 1.000 s",
+                                          "a: 200 bytes, was 100 bytes"]
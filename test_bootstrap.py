@@ -0,0 +1,65 @@
+'''
+File: test_bootstrap.py
+Author: Pri Vaghela
+Description: The program tests that the replicates of bootstrap.py resample
+the k-mers of the similarity matrices of similarity.py, and that the
+supports do not depend on the number of workers.
+'''
+
+import numpy as np
+import pytest
+import phylo
+from bootstrap import (attach_columns, bootstrap_support, count_splits,
+                       kmer_columns, merge_splits, replicate_matrix)
+from similarity import similarity_matrix
+
+# the modes and the metrics the bootstrap can resample
+MODE_METRICS = [("set", "jaccard"), ("compact", "jaccard"),
+                ("compact", "containment"), ("compact", "mash"),
+                ("canonical", "jaccard"), ("counts", "weighted-jaccard"),
+                ("canonical-counts", "weighted-jaccard")]
+
+@pytest.mark.parametrize("mode, metric", MODE_METRICS)
+def test_unit_weights_replicate(fasta_file, mode, metric):
+    '''
+    The function test_unit_weights_replicate checks that the replicate in
+    which every k-mer is drawn once is the similarity matrix of the genomes.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(), 4, mode)
+    columns, owners, kmers = kmer_columns(genome_data, metric)
+    attach_columns(columns, owners, kmers, len(genome_data), "single",
+                   "linkage", metric, 4)
+    matrix = replicate_matrix(np.ones(len(kmers)))
+    expected = similarity_matrix(genome_data, metric, 4)
+    off_diagonal = ~np.eye(len(genome_data), dtype=bool)
+    assert np.allclose(matrix[off_diagonal], expected[off_diagonal],
+                       rtol=0, atol=1e-12)
+
+def test_merge_splits():
+    '''
+    The function test_merge_splits checks the splits of a small merge
+    history, with the side without genome 0 kept.
+    '''
+    # ((0, 1), (2, (3, 4)))
+    merges = [(3, 4, 0.9), (0, 1, 0.8), (2, 5, 0.7), (6, 7, 0.1)]
+    assert merge_splits(merges, 5) == {0b11000, 0b11100}
+
+@pytest.mark.parametrize("engine, linkage", [("linkage", "average"),
+                                             ("nj", "single")])
+def test_supports_with_workers(fasta_file, engine, linkage):
+    '''
+    The function test_supports_with_workers checks that the pool of workers
+    counts the same splits as this process, and that the supports are
+    fractions of the replicates.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(12, 1000, 0.1), 4,
+                                        "compact")
+    counts = count_splits(genome_data, 10, linkage, engine)
+    assert count_splits(genome_data, 10, linkage, engine, workers=2) == counts
+    assert all(0 < count <= 10 for count in counts.values())
+    tree = phylo.construct_phylogenetic_tree(genome_data, linkage=linkage,
+                                             engine=engine, as_matrix=True)
+    supports = bootstrap_support(genome_data, tree, 10, linkage, engine) \
+        .get_supports()
+    assert ((supports >= 0) & (supports <= 1)).all()
+    assert np.array_equal(supports * 10, np.round(supports * 10))
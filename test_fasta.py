@@ -0,0 +1,167 @@
+'''
+File: test_fasta.py
+Author: Pri Vaghela
+Description: The program tests that fasta.py reads the same records from a
+FASTA file however the file is cut into chunks, and when only some of its
+records are read through its .fai index, and that compressed files are
+read as the same records.
+'''
+
+import bz2
+import gzip
+import lzma
+import os
+import pytest
+import phylo
+from fasta import (build_fasta_index, compression_of, group_records,
+                   load_fasta_index, read_fasta_pieces, read_fasta_records,
+                   read_indexed_pieces)
+from similarity import similarity_matrix
+
+# a FASTA file with short and long lines, blank lines, a record with no
+# sequence and sequence before the first header, which is ignored
+TEXT = ("NNNN\n"
+        ">first genome one\n"
+        "ACGTACGT\n"
+        "ACG\n"
+        "\n"
+        ">empty\n"
+        ">second\n"
+        "TTTTGGGGCCCCAAAA\n"
+        "TT\n"
+        ">last\n"
+        "GATTACA")
+
+# the records of TEXT
+RECORDS = [("first", "ACGTACGTACG"), ("empty", ""),
+           ("second", "TTTTGGGGCCCCAAAATT"), ("last", "GATTACA")]
+
+def write_text(tmp_path, text, newline):
+    '''
+    The function write_text writes text to a FASTA file with the given line
+    ending and returns the name of the file.
+    tmp_path - this parameter takes in the temporary directory of the test
+    text - this parameter takes in the text of the file
+    newline - this parameter takes in the line ending of the file
+    '''
+    filename = str(tmp_path / "genomes.fa")
+    with open(filename, "wb") as file:
+        file.write(text.replace("\n", newline).encode("ascii"))
+    return filename
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 16, 1 << 22])
+def test_chunked_records(tmp_path, newline, chunk_size):
+    '''
+    The function test_chunked_records checks that the records are the same
+    for every chunk size, so headers, line breaks and the "\\n>" between two
+    records can fall on a chunk boundary, with either line ending.
+    '''
+    filename = write_text(tmp_path, TEXT, newline)
+    assert list(read_fasta_records(filename, chunk_size)) == RECORDS
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 22])
+def test_empty_records(tmp_path, chunk_size):
+    '''
+    The function test_empty_records checks that records with no sequence
+    are kept, also as the last record of a file with no final line break.
+    '''
+    filename = write_text(tmp_path, ">a\n>b\r\n\n>c", "\n")
+    assert list(read_fasta_records(filename, chunk_size)) == \
+        [("a", ""), ("b", ""), ("c", "")]
+    filename = write_text(tmp_path, "", "\n")
+    assert list(read_fasta_records(filename, chunk_size)) == []
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_fasta_index(tmp_path, newline):
+    '''
+    The function test_fasta_index checks the .fai lines of a file against
+    the ones samtools faidx writes, and that the records read through the
+    index are the records of the file.
+    '''
+    filename = write_text(tmp_path, TEXT[5:], newline)
+    width = len(newline)
+    assert [str(entry) for entry in build_fasta_index(filename)] == [
+        "first\t11\t{}\t8\t{}".format(17 + width, 8 + width),
+        "empty\t0\t{}\t0\t0".format(34 + 5 * width),
+        "second\t18\t{}\t16\t{}".format(41 + 6 * width, 16 + width),
+        "last\t7\t{}\t7\t7".format(64 + 9 * width)]
+    for chunk_size in (1, 3, 1 << 22):
+        assert list(group_records(read_indexed_pieces(
+            filename, chunk_size=chunk_size))) == RECORDS
+    assert list(group_records(read_indexed_pieces(
+        filename, ["last", "first"]))) == [RECORDS[0], RECORDS[3]]
+    with pytest.raises(ValueError):
+        list(read_indexed_pieces(filename, ["first", "missing"]))
+
+def test_fasta_index_uneven_lines(tmp_path):
+    '''
+    The function test_fasta_index_uneven_lines checks that a record with a
+    long line after a short one cannot be indexed.
+    '''
+    filename = write_text(tmp_path, ">a\nACG\nACGTACGT\n", "\n")
+    with pytest.raises(ValueError):
+        build_fasta_index(filename)
+
+def test_fasta_index_reuse(tmp_path):
+    '''
+    The function test_fasta_index_reuse checks that the saved .fai file is
+    used while it is newer than the FASTA file, and rebuilt once the FASTA
+    file changes.
+    '''
+    filename = write_text(tmp_path, TEXT, "\n")
+    entries = [str(entry) for entry in load_fasta_index(filename)]
+    index_filename = filename + ".fai"
+    with open(index_filename) as file:
+        assert file.read().splitlines() == entries
+    # an index newer than the file is read back, not rebuilt
+    with open(index_filename, "a") as file:
+        file.write("extra\t4\t0\t4\t5\n")
+    stamp = os.path.getmtime(filename)
+    os.utime(index_filename, (stamp + 10, stamp + 10))
+    assert [str(entry) for entry in load_fasta_index(filename)] == \
+        entries + ["extra\t4\t0\t4\t5"]
+    # a file changed after its index gets a new index
+    write_text(tmp_path, ">new\nACGT\n", "\n")
+    os.utime(filename, (stamp + 20, stamp + 20))
+    assert [str(entry) for entry in load_fasta_index(filename)] == \
+        ["new\t4\t5\t4\t5"]
+    assert list(group_records(read_indexed_pieces(filename))) == \
+        [("new", "ACGT")]
+
+@pytest.mark.parametrize("name, compress", [("gzip", gzip.compress),
+                                            ("bzip2", bz2.compress),
+                                            ("xz", lzma.compress)])
+@pytest.mark.parametrize("threaded", [True, False])
+def test_compressed_records(tmp_path, name, compress, threaded):
+    '''
+    The function test_compressed_records checks that a compressed file is
+    found by its magic bytes, not its extension, and read as the records of
+    the uncompressed file, also when only some of them are asked for.
+    '''
+    filename = str(tmp_path / "genomes.fa")
+    with open(filename, "wb") as file:
+        file.write(compress(TEXT.replace("\n", "\r\n").encode("ascii")))
+    assert compression_of(filename) == name
+    for chunk_size in (1, 7, 1 << 22):
+        assert list(group_records(read_fasta_pieces(
+            filename, chunk_size, threaded))) == RECORDS
+    assert list(group_records(read_indexed_pieces(
+        filename, ["second", "empty"]))) == RECORDS[1:3]
+    with pytest.raises(ValueError):
+        list(read_indexed_pieces(filename, ["missing"]))
+    assert not os.path.exists(filename + ".fai")
+
+def test_compressed_genomes(fasta_file):
+    '''
+    The function test_compressed_genomes checks that the genomes of a
+    gzip file give the same similarity matrix as the plain file.
+    '''
+    filename = fasta_file()
+    with open(filename, "rb") as file, gzip.open(filename + ".gz", "wb") \
+            as packed:
+        packed.write(file.read())
+    plain = phylo.read_fasta_file(filename, 4, "compact")
+    packed = phylo.read_fasta_file(filename + ".gz", 4, "compact")
+    assert list(packed) == list(plain)
+    assert (similarity_matrix(packed) == similarity_matrix(plain)).all()
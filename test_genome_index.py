@@ -0,0 +1,108 @@
+'''
+File: test_genome_index.py
+Author: Pri Vaghela
+Description: The program tests that the inverted index of genome_index.py
+finds the genomes a comparison with every stored sketch finds, and that it
+is read back from disk as the same index.
+'''
+
+import os
+import numpy as np
+import pytest
+from benchmark import synthetic_genomes
+from genome_index import GenomeIndex
+from sketch import sketch_similarity
+
+@pytest.fixture
+def genomes():
+    '''
+    The fixture genomes returns a dictionary of 50 related synthetic genome
+    sequences, the first 40 of which are stored and the rest queried.
+    '''
+    return synthetic_genomes(50, 3000, 0.05, seed=1)
+
+def brute_force(index, sketches, query, k):
+    '''
+    The function brute_force returns the k stored genomes most similar to a
+    query as a list of (name, similarity), found by comparing the query with
+    every stored sketch, in the order of GenomeIndex.query.
+    index - this parameter takes in the GenomeIndex
+    sketches - this parameter takes in the list of the stored sketches
+    query - this parameter takes in the sketch of the query
+    k - this parameter takes in the number of genomes to return
+    '''
+    results = sorted((-sketch_similarity(query, sketch), genome)
+                     for genome, sketch in enumerate(sketches))
+    return [(index.get_names()[genome], -similarity)
+            for similarity, genome in results if similarity < 0][:k]
+
+def make_index(genomes, count=40):
+    '''
+    The function make_index returns a GenomeIndex of the first count genomes.
+    genomes - this parameter takes in the dictionary of genome sequences
+    count - this parameter takes in the number of genomes to store
+    '''
+    index = GenomeIndex(11, sketch_size=200)
+    for name in list(genomes)[:count]:
+        index.add(name, genomes[name])
+    return index
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_query_matches_brute_force(genomes, k):
+    '''
+    The function test_query_matches_brute_force checks that the top-k of
+    the index are the top-k of comparing the query with every genome.
+    '''
+    index = make_index(genomes)
+    sketches = [index.get_sketch(name) for name in index.get_names()]
+    for name in list(genomes)[40:]:
+        query = index.sketch(genomes[name])
+        assert index.query(query, k) == brute_force(index, sketches, query, k)
+    # a stored genome is its own best match
+    name = index.get_names()[7]
+    assert index.query(genomes[name], 1) == [(name, 1.0)]
+
+def test_save_and_load(genomes, tmp_path):
+    '''
+    The function test_save_and_load checks that a loaded index has the
+    settings, names and sketches of the saved one, answers the same, and
+    can still take new genomes.
+    '''
+    index = make_index(genomes, 30)
+    directory = str(tmp_path / "index")
+    index.save(directory)
+    loaded = GenomeIndex.load(directory)
+    assert (loaded.get_n(), loaded.get_mode(), loaded.get_sketch_size(),
+            loaded.get_seed()) == (index.get_n(), index.get_mode(),
+                                   index.get_sketch_size(), index.get_seed())
+    assert loaded.get_names() == index.get_names()
+    for name in index.get_names():
+        assert np.array_equal(loaded.get_sketch(name).get_hashes(),
+                              index.get_sketch(name).get_hashes())
+    for name in list(genomes)[40:]:
+        assert loaded.query(genomes[name], 5) == index.query(genomes[name], 5)
+    for name in list(genomes)[30:40]:
+        index.add(name, genomes[name])
+        loaded.add(name, genomes[name])
+    for name in list(genomes)[40:]:
+        assert loaded.query(genomes[name], 5) == index.query(genomes[name], 5)
+
+def test_index_errors(genomes, tmp_path):
+    '''
+    The function test_index_errors checks that a genome added twice, a
+    sketch of other settings and an index that was not saved completely
+    raise ValueError.
+    '''
+    index = make_index(genomes, 5)
+    name = index.get_names()[0]
+    with pytest.raises(ValueError):
+        index.add(name, genomes[name])
+    with pytest.raises(ValueError):
+        index.query(GenomeIndex(11, sketch_size=100).sketch(genomes[name]))
+    directory = str(tmp_path / "index")
+    index.save(directory)
+    make_index(genomes, 10).save(str(tmp_path / "other"))
+    os.replace(str(tmp_path / "other" / "hashes.npy"),
+               os.path.join(directory, "hashes.npy"))
+    with pytest.raises(ValueError):
+        GenomeIndex.load(directory)
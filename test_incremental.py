@@ -0,0 +1,46 @@
+'''
+File: test_incremental.py
+Author: Pri Vaghela
+Description: The program tests that the trees incremental.py updates after
+genomes were appended to a FASTA file are the trees built from scratch.
+'''
+
+import pytest
+import phylo
+from benchmark import synthetic_genomes, write_fasta
+from incremental import update_tree
+from sketch import DEFAULT_SKETCH_SIZE, DEFAULT_SEED
+
+@pytest.mark.parametrize("linkage", ["single", "complete", "average", "ward"])
+def test_incremental_matches_scratch(tmp_path, linkage):
+    '''
+    The function test_incremental_matches_scratch checks that a tree updated
+    after genomes were appended is the tree built from scratch.
+    '''
+    genomes = list(synthetic_genomes(24, 400, 0.05).items())
+    filename = str(tmp_path / "genomes.fa")
+    state = str(tmp_path / "state")
+    for count in (10, 17, 24):
+        write_fasta(dict(genomes[:count]), filename)
+        genome_data = phylo.read_fasta_file(filename, 4, "compact")
+        tree = update_tree(genome_data, state, 4, "compact",
+                           DEFAULT_SKETCH_SIZE, DEFAULT_SEED, linkage)
+        assert str(tree) == str(phylo.construct_phylogenetic_tree(
+            genome_data, linkage=linkage))
+
+def test_incremental_rebuilds_changed_genomes(tmp_path):
+    '''
+    The function test_incremental_rebuilds_changed_genomes checks that a
+    state whose genomes changed is not replayed.
+    '''
+    genomes = list(synthetic_genomes(12, 400, 0.05).items())
+    filename = str(tmp_path / "genomes.fa")
+    state = str(tmp_path / "state")
+    write_fasta(dict(genomes), filename)
+    update_tree(phylo.read_fasta_file(filename, 4, "compact"), state, 4,
+                "compact", DEFAULT_SKETCH_SIZE, DEFAULT_SEED)
+    write_fasta(dict(genomes[6:] + genomes[:6]), filename)
+    genome_data = phylo.read_fasta_file(filename, 4, "compact")
+    tree = update_tree(genome_data, state, 4, "compact", DEFAULT_SKETCH_SIZE,
+                       DEFAULT_SEED)
+    assert str(tree) == str(phylo.construct_phylogenetic_tree(genome_data))
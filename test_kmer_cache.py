@@ -0,0 +1,88 @@
+'''
+File: test_kmer_cache.py
+Author: Pri Vaghela
+Description: The program tests that kmer_cache.py gives back the n-grams it
+stored and evicts its least recently used entries.
+'''
+
+import os
+import numpy as np
+import pytest
+from genome import COUNT_MODES, MODES, SKETCH_MODES, NgramBuilder
+from kmer_cache import KmerCache, sequence_digest
+
+# three sequences of the same length, so their entries have the same size
+SEQUENCES = ["ACGTTGCA" * 8, "GGGCCCAT" * 8, "TTAGGCAC" * 8]
+
+def entry_paths(cache):
+    '''
+    The function entry_paths returns the sorted names of the .npy files of
+    the cache.
+    cache - this parameter takes in the KmerCache
+    '''
+    return sorted(name for name in os.listdir(cache.get_directory())
+                  if name.endswith(".npy"))
+
+@pytest.mark.parametrize("mode", MODES)
+def test_cache_round_trip(tmp_path, mode):
+    '''
+    The function test_cache_round_trip checks that the n-grams loaded from
+    the cache, also by a new cache on the same directory, are the n-grams
+    that were stored.
+    '''
+    builder = NgramBuilder(4, mode)
+    builder.add(SEQUENCES[0])
+    expected = builder.get_ngrams()
+    cache = KmerCache(str(tmp_path))
+    cache.get_ngrams(SEQUENCES[0], 4, mode)
+    for reader in (cache, KmerCache(str(tmp_path))):
+        ngrams = reader.load(sequence_digest(SEQUENCES[0]), 4, mode)
+        if mode == "set":
+            assert ngrams == expected
+        elif mode in SKETCH_MODES:
+            assert np.array_equal(ngrams.get_hashes(), expected.get_hashes())
+        elif mode in COUNT_MODES:
+            assert np.array_equal(ngrams.get_codes(), expected.get_codes())
+            assert np.array_equal(ngrams.get_counts(), expected.get_counts())
+        else:
+            assert np.array_equal(ngrams, expected)
+    assert cache.load(sequence_digest(SEQUENCES[0]), 5, mode) is None
+
+def test_cache_eviction(tmp_path):
+    '''
+    The function test_cache_eviction checks that a cache with room for two
+    entries keeps the two that were used last when a third one is stored.
+    '''
+    cache = KmerCache(str(tmp_path))
+    cache.get_ngrams(SEQUENCES[0], 4, "compact")
+    size = os.path.getsize(os.path.join(str(tmp_path), entry_paths(cache)[0]))
+    cache = KmerCache(str(tmp_path), 2 * size)
+    cache.get_ngrams(SEQUENCES[1], 4, "compact")
+    first, second = (os.path.join(str(tmp_path), "{}-compact-4.npy".format(
+        sequence_digest(sequence))) for sequence in SEQUENCES[:2])
+    # the first entry is made older than the second, then used again
+    stamp = os.path.getmtime(second)
+    os.utime(first, (stamp - 20, stamp - 20))
+    os.utime(second, (stamp - 10, stamp - 10))
+    assert cache.load(sequence_digest(SEQUENCES[0]), 4, "compact") is not None
+    cache.get_ngrams(SEQUENCES[2], 4, "compact")
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+    assert not os.path.exists(second[:-4] + ".json")
+    assert len(entry_paths(cache)) == 2
+    assert cache.load(sequence_digest(SEQUENCES[1]), 4, "compact") is None
+
+def test_cache_entry_evicted_while_loading(tmp_path, monkeypatch):
+    '''
+    The function test_cache_entry_evicted_while_loading checks that an
+    entry removed by another process between reading and touching it is a
+    miss, and is built again.
+    '''
+    cache = KmerCache(str(tmp_path))
+    expected = cache.get_ngrams(SEQUENCES[0], 4, "compact")
+    def utime(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(os, "utime", utime)
+    assert cache.load(sequence_digest(SEQUENCES[0]), 4, "compact") is None
+    assert np.array_equal(cache.get_ngrams(SEQUENCES[0], 4, "compact"),
+                          expected)
@@ -0,0 +1,81 @@
+'''
+File: test_kmers.py
+Author: Pri Vaghela
+Description: The program tests the canonical k-mer codes of kmers.py against
+a k-mer by k-mer reference, and that a genome and its reverse complement
+are the same genome in the canonical modes.
+'''
+
+import numpy as np
+import pytest
+import phylo
+from benchmark import synthetic_genomes, write_fasta
+from genome import CANONICAL_MODES, COUNT_MODES
+from kmers import (decode_kmer, encode_kmer_sizes, encode_kmers,
+                   reverse_complement)
+from similarity import similarity_matrix
+
+# a sequence with lowercase bases and bases other than A, C, G and T
+SEQUENCE = "ACGTTGCANNACCGGTTaacgtRGATTACAGATTACACCCGGGTTTAAANACGTAC"
+
+# the complement of every base
+COMPLEMENT = str.maketrans("ACGTacgt", "TGCAtgca")
+
+def reverse_complement_sequence(sequence):
+    '''
+    The function reverse_complement_sequence returns the reverse complement
+    of a sequence.
+    sequence - this parameter takes in the sequence as a str
+    '''
+    return sequence.translate(COMPLEMENT)[::-1]
+
+def reference_kmers(sequence, n):
+    '''
+    The function reference_kmers returns the sorted distinct canonical
+    k-mers of a sequence, found one k-mer at a time as the smaller of the
+    k-mer and its reverse complement as strings.
+    sequence - this parameter takes in the sequence as a str
+    n - this parameter takes in the k-mer length
+    '''
+    sequence = sequence.upper()
+    kmers = set()
+    for start in range(len(sequence) - n + 1):
+        kmer = sequence[start:start + n]
+        if set(kmer) <= set("ACGT"):
+            kmers.add(min(kmer, reverse_complement_sequence(kmer)))
+    return sorted(kmers)
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 5, 8, 13, 32])
+def test_canonical_kmers(n):
+    '''
+    The function test_canonical_kmers checks the canonical codes of one
+    k-mer length and of a sweep of lengths against the reference, and that
+    the code of a reverse complement is found again by turning it back.
+    '''
+    expected = reference_kmers(SEQUENCE, n)
+    codes = encode_kmers(SEQUENCE, n, canonical=True)
+    assert [decode_kmer(code, n) for code in codes] == expected
+    sizes = encode_kmer_sizes(SEQUENCE, [1, n, 6], canonical=True)
+    assert np.array_equal(sizes[n], codes)
+    for code in codes:
+        assert reverse_complement(reverse_complement(code, n), n) == code
+        assert decode_kmer(reverse_complement(code, n), n) == \
+            reverse_complement_sequence(decode_kmer(code, n))
+
+@pytest.mark.parametrize("mode", CANONICAL_MODES)
+def test_reverse_complement_genome(tmp_path, mode):
+    '''
+    The function test_reverse_complement_genome checks that a genome read
+    from the opposite strand scores 1.0 against the genome in the canonical
+    modes, while the plain k-mers of the two strands differ.
+    '''
+    sequence, = synthetic_genomes(1, 2000, 0.0).values()
+    filename = str(tmp_path / "strands.fa")
+    write_fasta({"forward": sequence,
+                 "reverse": reverse_complement_sequence(sequence)}, filename)
+    metric = "weighted-jaccard" if mode in COUNT_MODES else "jaccard"
+    genome_data = phylo.read_fasta_file(filename, 11, mode)
+    assert similarity_matrix(genome_data, metric)[0, 1] == 1.0
+    plain = mode.replace("canonical-", "").replace("canonical", "compact")
+    genome_data = phylo.read_fasta_file(filename, 11, plain)
+    assert similarity_matrix(genome_data, metric)[0, 1] < 0.1
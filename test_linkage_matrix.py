@@ -0,0 +1,33 @@
+'''
+File: test_linkage_matrix.py
+Author: Pri Vaghela
+Description: The program tests that the trees of linkage_matrix.py print
+like the TreeNode trees of the same merges.
+'''
+
+import pytest
+import phylo
+
+# the engines and linkages the trees are built with
+ENGINES = [("linkage", "single"), ("linkage", "complete"),
+           ("linkage", "average"), ("linkage", "ward"), ("nj", "single"),
+           ("mst", "single")]
+
+@pytest.mark.parametrize("engine, linkage", ENGINES)
+def test_linkage_matrix_matches_tree_node(fasta_file, engine, linkage):
+    '''
+    The function test_linkage_matrix_matches_tree_node checks that the
+    LinkageMatrix of a tree prints like its TreeNode hierarchy, also after
+    it is turned into TreeNodes, and that its rows hold the leaf counts.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(25), 3)
+    tree = phylo.construct_phylogenetic_tree(genome_data, linkage=linkage,
+                                             engine=engine)
+    matrix = phylo.construct_phylogenetic_tree(genome_data, linkage=linkage,
+                                               engine=engine, as_matrix=True)
+    assert str(matrix) == str(tree)
+    assert str(matrix.to_tree_node()) == str(tree)
+    array = matrix.to_array()
+    assert array.shape == (24, 4)
+    assert array[-1, 3] == 25
+    assert matrix.root().set_id() == set(genome_data)
@@ -0,0 +1,110 @@
+'''
+File: test_matrix_store.py
+Author: Pri Vaghela
+Description: The program tests that the similarity matrix matrix_store.py
+keeps on disk holds the rows of the in-memory matrix, and that a fill that
+was stopped resumes where it was.
+'''
+
+import io
+import numpy as np
+import pytest
+import matrix_store
+import phylo
+from matrix_store import StoredMatrix, ngrams_digest, stored_similarity_matrix
+from similarity import similarity_matrix
+
+def stopping_rows(monkeypatch, rows):
+    '''
+    The function stopping_rows makes the row functions of the store raise
+    KeyboardInterrupt after the given number of rows, like a run that was
+    stopped.
+    monkeypatch - this parameter takes in the monkeypatch fixture
+    rows - this parameter takes in the number of rows computed before
+    '''
+    make_row = matrix_store.similarity_row_function
+    def similarity_row_function(*args):
+        row = make_row(*args)
+        computed = []
+        def stopping_row(i):
+            if len(computed) == rows:
+                raise KeyboardInterrupt
+            computed.append(i)
+            return row(i)
+        return stopping_row
+    monkeypatch.setattr(matrix_store, "similarity_row_function",
+                        similarity_row_function)
+
+@pytest.mark.parametrize("metric", ["jaccard", "mash"])
+def test_stored_rows(fasta_file, tmp_path, metric):
+    '''
+    The function test_stored_rows checks that every row and block of rows
+    of the stored matrix is the row of the in-memory matrix, as float32.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(23), 4, "compact")
+    matrix = stored_similarity_matrix(genome_data, str(tmp_path), metric, 4)
+    expected = similarity_matrix(genome_data, metric, 4).astype(np.float32)
+    assert len(matrix) == 23 and matrix.is_complete()
+    assert np.array_equal(matrix.rows(0, 23), expected)
+    assert np.array_equal(matrix.rows(5, 9), expected[5:9])
+    for i in range(23):
+        assert np.array_equal(matrix[i], expected[i])
+
+def test_resume(fasta_file, tmp_path, monkeypatch):
+    '''
+    The function test_resume checks that a fill stopped in its third block
+    keeps the two finished blocks, that a new matrix on the directory only
+    computes the rest, and that other settings or genomes start over.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(23), 4, "compact")
+    names = list(genome_data)
+    directory = str(tmp_path)
+    digest = ngrams_digest(genome_data)
+    with monkeypatch.context() as patch:
+        stopping_rows(patch, 12)
+        matrix = StoredMatrix(directory, names, ngrams=digest)
+        with pytest.raises(KeyboardInterrupt):
+            matrix.fill(genome_data, block_rows=5)
+    assert matrix.get_rows_done() == 10
+    with pytest.raises(ValueError):
+        matrix.rows(0, 1)
+    matrix = StoredMatrix(directory, names, ngrams=digest)
+    assert matrix.get_rows_done() == 10
+    with monkeypatch.context() as patch:
+        # the 13 rows that are left are all that is computed
+        stopping_rows(patch, 13)
+        report = io.StringIO()
+        matrix.fill(genome_data, block_rows=5, report=report)
+    assert "resuming at row 10 of 23" in report.getvalue()
+    assert matrix.is_complete()
+    assert np.array_equal(matrix.rows(0, 23),
+                          similarity_matrix(genome_data).astype(np.float32))
+    matrix = StoredMatrix(directory, names, ngrams=digest)
+    assert matrix.get_rows_done() == 23
+    with pytest.raises(ValueError):
+        matrix.fill(dict(reversed(list(genome_data.items()))))
+    # another metric, other n-grams or other genomes start over
+    assert StoredMatrix(directory, names, "mash", 4, digest) \
+        .get_rows_done() == 0
+    assert StoredMatrix(directory, names, ngrams=digest[::-1]) \
+        .get_rows_done() == 0
+    assert StoredMatrix(directory, names[:-1], ngrams=digest) \
+        .get_rows_done() == 0
+
+def test_stored_mst_tree(fasta_file, tmp_path):
+    '''
+    The function test_stored_mst_tree checks that the mst engine builds the
+    same tree from the stored matrix, and that a stored matrix is refused by
+    the other engines and by a sweep.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(), 4, "compact")
+    tree = phylo.construct_phylogenetic_tree(genome_data, engine="mst")
+    assert str(phylo.construct_phylogenetic_tree(
+        genome_data, engine="mst", matrix_directory=str(tmp_path))) == \
+        str(tree)
+    with pytest.raises(ValueError):
+        phylo.construct_phylogenetic_tree(genome_data,
+                                          matrix_directory=str(tmp_path))
+    with pytest.raises(ValueError):
+        phylo.run_jobs([fasta_file()], [3, 4], ["mst"], ["single"], [1],
+                       sweep=True, matrix_directory=str(tmp_path))
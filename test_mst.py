@@ -0,0 +1,66 @@
+'''
+File: test_mst.py
+Author: Pri Vaghela
+Description: The program tests that the mst engine of mst.py gives the merge
+history and the trees of the heap based single linkage engine of cluster.py.
+'''
+
+import numpy as np
+import pytest
+import phylo
+from cluster import linkage_merges
+from mst import mst_single_linkage_merges
+
+def tied_matrix(count, levels, seed):
+    '''
+    The function tied_matrix returns a random symmetric similarity matrix
+    whose entries take only a few values, so that many pairs are tied.
+    count - this parameter takes in the number of genomes
+    levels - this parameter takes in the number of values above 0
+    seed - this parameter takes in the seed of the random generator
+    '''
+    generator = np.random.default_rng(seed)
+    matrix = np.triu(generator.integers(0, levels + 1, (count, count)) /
+                     levels, 1)
+    matrix = matrix + matrix.T
+    np.fill_diagonal(matrix, 1.0)
+    return matrix
+
+@pytest.mark.parametrize("seed", range(20))
+def test_mst_matches_heap_engine(seed):
+    '''
+    The function test_mst_matches_heap_engine checks that the mst engine
+    gives the merge history of the heap engine on matrices with many ties.
+    '''
+    count = 2 + 3 * seed
+    matrix = tied_matrix(count, 1 + seed % 4, seed)
+    merges = mst_single_linkage_merges(count, lambda i: matrix[i])
+    expected = linkage_merges(matrix, "single")
+    assert merges == [(int(a), int(b), float(s)) for a, b, s in expected]
+
+def test_mst_reads_few_rows_with_ties():
+    '''
+    The function test_mst_reads_few_rows_with_ties checks that the rows of
+    tied genomes are not fetched again for every merge.
+    '''
+    count = 300
+    matrix = np.full((count, count), 0.5)
+    np.fill_diagonal(matrix, 1.0)
+    fetched = []
+    def row(i):
+        fetched.append(i)
+        return matrix[i]
+    merges = mst_single_linkage_merges(count, row)
+    assert merges == [(int(a), int(b), float(s)) for a, b, s in
+                      linkage_merges(matrix, "single")]
+    assert len(fetched) < 3 * count
+
+def test_mst_tree_matches_heap_tree(fasta_file):
+    '''
+    The function test_mst_tree_matches_heap_tree checks that the single
+    linkage trees of the two engines print the same.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(30), 3)
+    assert str(phylo.construct_phylogenetic_tree(genome_data,
+                                                 engine="mst")) == \
+        str(phylo.construct_phylogenetic_tree(genome_data))
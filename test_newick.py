@@ -0,0 +1,76 @@
+'''
+File: test_newick.py
+Author: Pri Vaghela
+Description: The program tests that the trees newick.py writes are read back
+as the same trees, with the same branch lengths and supports.
+'''
+
+import numpy as np
+import pytest
+import phylo
+from bootstrap import bootstrap_support
+from newick import newick_string, parse_newick
+
+# the engines and linkages the trees are built with
+ENGINES = [("linkage", "single"), ("linkage", "complete"),
+           ("linkage", "average"), ("linkage", "ward"), ("nj", "single"),
+           ("mst", "single")]
+
+@pytest.mark.parametrize("engine, linkage", ENGINES)
+def test_newick_round_trip(fasta_file, engine, linkage):
+    '''
+    The function test_newick_round_trip checks that both forms of a tree
+    are written as the same Newick string, and that the string is read back
+    as a tree that is written the same and prints the same.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(25), 3)
+    tree = phylo.construct_phylogenetic_tree(genome_data, linkage=linkage,
+                                             engine=engine)
+    text = newick_string(tree)
+    assert newick_string(phylo.construct_phylogenetic_tree(
+        genome_data, linkage=linkage, engine=engine, as_matrix=True)) == text
+    for as_matrix in (False, True):
+        parsed = parse_newick(text, as_matrix)
+        assert newick_string(parsed) == text
+        assert str(parsed) == str(tree)
+
+def test_newick_keeps_supports(fasta_file):
+    '''
+    The function test_newick_keeps_supports checks that bootstrap supports
+    are written as labels and read back.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(12, 2000, 0.1), 6)
+    tree = phylo.construct_phylogenetic_tree(genome_data, linkage="average",
+                                             as_matrix=True)
+    bootstrap_support(genome_data, tree, 5, "average")
+    text = newick_string(tree)
+    parsed = parse_newick(text, True)
+    assert newick_string(parsed) == text
+    assert sorted(parsed.get_supports()) == sorted(tree.get_supports())
+
+def test_newick_keeps_neighbor_joining_lengths():
+    '''
+    The function test_newick_keeps_neighbor_joining_lengths checks that a
+    neighbor joining tree of additive distances is written with its limb
+    lengths, which do not follow from the heights.
+    '''
+    distances = np.array([[0.0, 0.3, 0.5, 0.3],
+                          [0.3, 0.0, 0.6, 0.4],
+                          [0.5, 0.6, 0.0, 0.4],
+                          [0.3, 0.4, 0.4, 0.0]])
+    genome_data = dict((name, phylo.GenomeData(name, ""))
+                       for name in "abcd")
+    tree = phylo.construct_phylogenetic_tree(genome_data, engine="nj",
+                                             matrix=1 - distances)
+    lengths = parse_newick(newick_string(tree), True).get_lengths()
+    assert np.allclose(lengths[:6], [0.1, 0.2, 0.3, 0.1, 0.05, 0.05])
+
+def test_newick_quotes_names():
+    '''
+    The function test_newick_quotes_names checks that names with spaces and
+    punctuation are quoted and read back.
+    '''
+    text = "(('a b':0.1,'it''s':0.1):0.2,c:0.3);\n"
+    tree = parse_newick(text)
+    assert newick_string(tree) == text
+    assert tree.set_id() == {"a b", "it's", "c"}
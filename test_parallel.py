@@ -0,0 +1,58 @@
+'''
+File: test_parallel.py
+Author: Pri Vaghela
+Description: The program tests that the process pools of parallel.py give
+the same results as the serial code.
+'''
+
+import numpy as np
+import pytest
+import phylo
+from genome import MODES
+from parallel import parallel_similarity_matrix
+from similarity import METRICS, similarity_matrix
+
+@pytest.mark.parametrize("mode", MODES)
+def test_parallel_ngrams(fasta_file, mode):
+    '''
+    The function test_parallel_ngrams checks that the genomes read with a
+    pool of workers have the same names, sequences and n-grams, in the same
+    order, as the genomes read in this process.
+    '''
+    filename = fasta_file(12)
+    serial = phylo.read_fasta_file(filename, 4, mode)
+    parallel = phylo.read_fasta_file(filename, 4, mode, workers=2)
+    assert list(parallel) == list(serial)
+    for name, genome in serial.items():
+        assert parallel[name].get_sequence() == genome.get_sequence()
+    if mode == "set":
+        for name, genome in serial.items():
+            assert parallel[name].get_ngrams() == genome.get_ngrams()
+    metric = "weighted-jaccard" if mode.endswith("counts") else "jaccard"
+    assert (similarity_matrix(parallel, metric) ==
+            similarity_matrix(serial, metric)).all()
+
+# the modes and metrics that go together, sketches give no containment and
+# only k-mer counts give the weighted-jaccard metric
+MODE_METRICS = [(mode, metric) for mode in ("set", "compact", "counts")
+                for metric in METRICS
+                if metric != "weighted-jaccard" or mode == "counts"] + \
+               [("sketch", "jaccard"), ("sketch", "mash")]
+
+@pytest.mark.parametrize("mode, metric", MODE_METRICS)
+def test_parallel_matrix(fasta_file, mode, metric):
+    '''
+    The function test_parallel_matrix checks that the matrix filled in
+    blocks by a pool of workers is the serial similarity matrix, for every
+    metric, and that it gives the same tree.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(21), 4, mode)
+    serial = similarity_matrix(genome_data, metric, 4)
+    for workers in (2, 3):
+        matrix = parallel_similarity_matrix(genome_data, workers,
+                                            metric=metric, n=4)
+        assert np.allclose(matrix, serial, rtol=0, atol=1e-12)
+    tree = phylo.construct_phylogenetic_tree(genome_data, metric=metric,
+                                             n_gram=4)
+    assert str(phylo.construct_phylogenetic_tree(
+        genome_data, workers=2, metric=metric, n_gram=4)) == str(tree)
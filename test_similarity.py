@@ -0,0 +1,95 @@
+'''
+File: test_similarity.py
+Author: Pri Vaghela
+Description: The program tests that the batched similarity matrices of
+similarity.py hold the similarities of the pairwise reference of phylo.py,
+and that every metric matches its definition on the k-mers.
+'''
+
+from collections import Counter
+import numpy as np
+import pytest
+import phylo
+from similarity import (METRICS, similarity_matrix, similarity_row_function,
+                        similarity_rows)
+
+@pytest.mark.parametrize("mode", ["set", "compact", "sketch"])
+def test_similarity_matrix_matches_reference(fasta_file, mode):
+    '''
+    The function test_similarity_matrix_matches_reference checks that
+    similarity_matrix has the similarities of the pairwise reference
+    compute_similarity_data.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(), 4, mode)
+    reference = phylo.compute_similarity_data(genome_data)
+    matrix = similarity_matrix(genome_data)
+    names = list(genome_data)
+    for i, name1 in enumerate(names):
+        for j, name2 in enumerate(names):
+            if i != j:
+                assert matrix[i, j] == pytest.approx(reference[(name1, name2)])
+
+def reference_metrics(sequences, n):
+    '''
+    The function reference_metrics returns the dictionary from every metric
+    to its matrix, found from Counters of the k-mers of the sequences.
+    sequences - this parameter takes in the list of sequences
+    n - this parameter takes in the k-mer length
+    '''
+    counts = [Counter(sequence[i:i + n]
+                      for i in range(len(sequence) - n + 1))
+              for sequence in sequences]
+    size = len(sequences)
+    matrices = dict((metric, np.zeros((size, size))) for metric in METRICS)
+    for i, a in enumerate(counts):
+        for j, b in enumerate(counts):
+            shared = len(a.keys() & b.keys())
+            jaccard = shared / len(a.keys() | b.keys())
+            matrices["jaccard"][i, j] = jaccard
+            matrices["containment"][i, j] = shared / min(len(a), len(b))
+            matrices["weighted-jaccard"][i, j] = \
+                sum((a & b).values()) / sum((a | b).values())
+            matrices["mash"][i, j] = (2 * jaccard / (1 + jaccard)) ** (1 / n)
+    return matrices
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_metric_matches_definition(fasta_file, metric):
+    '''
+    The function test_metric_matches_definition checks the matrix of every
+    metric, its rows and its row function against the k-mer by k-mer
+    reference, from k-mer counts and, for the metrics that do not need the
+    counts, from k-mer sets.
+    '''
+    filename = fasta_file(12, 300, 0.1)
+    genome_data = phylo.read_fasta_file(filename, 5, "counts")
+    names = list(genome_data)
+    expected = reference_metrics([genome.get_sequence() for genome in
+                                  genome_data.values()], 5)[metric]
+    assert np.allclose(similarity_matrix(genome_data, metric, 5), expected)
+    assert np.allclose(similarity_rows(genome_data, names[3:6], metric, 5),
+                       expected[3:6])
+    row = similarity_row_function(genome_data, metric, 5)
+    assert np.allclose([row(i) for i in range(len(names))], expected)
+    for mode in ("set", "compact"):
+        genome_data = phylo.read_fasta_file(filename, 5, mode)
+        if metric == "weighted-jaccard":
+            with pytest.raises(ValueError):
+                similarity_matrix(genome_data, metric, 5)
+        else:
+            assert np.allclose(similarity_matrix(genome_data, metric, 5),
+                               expected)
+
+def test_metric_errors(fasta_file):
+    '''
+    The function test_metric_errors checks that unknown metrics, the mash
+    metric without the k-mer length and metrics that sketches cannot give
+    raise ValueError.
+    '''
+    genome_data = phylo.read_fasta_file(fasta_file(), 5, "sketch")
+    for metric, n in (("cosine", 5), ("mash", None), ("containment", 5),
+                      ("weighted-jaccard", 5)):
+        with pytest.raises(ValueError):
+            similarity_matrix(genome_data, metric, n)
+    assert np.allclose(similarity_matrix(genome_data, "mash", 5),
+                       (2 * similarity_matrix(genome_data) /
+                        (1 + similarity_matrix(genome_data))) ** (1 / 5))
@@ -0,0 +1,42 @@
+'''
+File: test_sweep.py
+Author: Pri Vaghela
+Description: The program tests that the n-gram sweep of phylo.py and
+similarity.py gives the n-grams and similarity matrices of one run per
+n-gram size.
+'''
+
+import numpy as np
+import pytest
+import phylo
+from kmer_counts import KmerCounts
+from similarity import similarity_matrix, similarity_matrices
+
+@pytest.mark.parametrize("mode", ["set", "compact", "canonical", "counts"])
+def test_sweep_matches_separate_runs(fasta_file, mode):
+    '''
+    The function test_sweep_matches_separate_runs checks that the n-grams
+    and similarity matrices of a sweep are the ones of one run per n-gram
+    size.
+    '''
+    filename = fasta_file()
+    sizes = [3, 4, 5, 7]
+    genome_data_by_size = phylo.read_fasta_sweep(filename, sizes, mode)
+    matrices = similarity_matrices(genome_data_by_size, mode)
+    for n_gram in sizes:
+        genome_data = phylo.read_fasta_file(filename, n_gram, mode)
+        swept = genome_data_by_size[n_gram]
+        assert list(swept) == list(genome_data)
+        for name, genome in genome_data.items():
+            ngrams = genome.get_ngrams()
+            swept_ngrams = swept[name].get_ngrams()
+            if isinstance(ngrams, set):
+                assert swept_ngrams == ngrams
+            elif isinstance(ngrams, KmerCounts):
+                assert np.array_equal(swept_ngrams.get_codes(),
+                                      ngrams.get_codes())
+                assert np.array_equal(swept_ngrams.get_counts(),
+                                      ngrams.get_counts())
+            else:
+                assert np.array_equal(swept_ngrams, ngrams)
+        assert np.allclose(matrices[n_gram], similarity_matrix(genome_data))
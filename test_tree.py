@@ -0,0 +1,93 @@
+'''
+File: test_tree.py
+Author: Pri Vaghela
+Description: The program tests that the memoized strings and first leaves of
+the TreeNode class follow changes anywhere below a node, and that the ids of
+a node are found from the nodes below it.
+'''
+
+import tracemalloc
+from cluster import make_leaves, merge_nodes
+from tree import TreeNode
+
+def node(left, right):
+    '''
+    The function node returns a new internal TreeNode with the given
+    children.
+    left - this parameter takes in the left node
+    right - this parameter takes in the right node
+    '''
+    parent = TreeNode(None)
+    parent.set_left(left)
+    parent.set_right(right)
+    return parent
+
+def test_change_below_memoized_ancestor():
+    '''
+    The function test_change_below_memoized_ancestor checks that replacing
+    a child of a grandchild changes the string, the first leaf and the
+    order of the root once the root's string was memoized.
+    '''
+    a, b, c, d, e = (TreeNode(name) for name in "abcde")
+    inner = node(b, c)
+    middle = node(inner, d)
+    root = node(middle, a)
+    other = node(node(node(TreeNode("d"), TreeNode("x")), TreeNode("x")),
+                 TreeNode("x"))
+    assert str(root) == "(((b, c), d), a)"
+    assert root.sorts_before(other)
+    inner.set_left(e)
+    assert b.get_parent() is None and e.get_parent() is inner
+    assert str(middle) == "((e, c), d)"
+    assert str(root) == "(((e, c), d), a)"
+    assert not root.sorts_before(other)
+    inner.set_left(node(TreeNode("z"), b))
+    assert str(root) == "((((z, b), c), d), a)"
+    assert root.sorts_before(other)
+
+def test_deep_chain():
+    '''
+    The function test_deep_chain checks that a change at the bottom of a
+    tree far deeper than the recursion limit reaches its root.
+    '''
+    leaves = make_leaves(["g{:05d}".format(i) for i in range(5000)])
+    root = leaves[0]
+    for leaf in leaves[1:]:
+        root = merge_nodes(root, leaf)
+    text = str(root)
+    assert text.startswith("(" * 4999 + "g00000, g00001)")
+    bottom = leaves[0].get_parent()
+    bottom.set_left(TreeNode("a"))
+    assert str(root) == text.replace("g00000", "a", 1)
+    assert root.sorts_before(TreeNode("(" * 4999 + "a, g00002"))
+
+def test_set_id():
+    '''
+    The function test_set_id checks that the ids of a node are its own ids
+    and the ids of every node below it, also after a child is replaced.
+    '''
+    a, b, c, d = make_leaves("abcd")
+    inner = merge_nodes(a, b)
+    root = merge_nodes(inner, c)
+    root.add_id("root")
+    assert inner.set_id() == {"a", "b"}
+    assert root.set_id() == {"a", "b", "c", "root"}
+    inner.set_right(d)
+    assert root.set_id() == {"a", "d", "c", "root"}
+
+def test_merge_memory():
+    '''
+    The function test_merge_memory checks that merging a chain of 4000
+    leaves, where copying the ids into every node would hold 8 million of
+    them, takes memory in proportion to the number of nodes.
+    '''
+    names = ["g{:05d}".format(i) for i in range(4000)]
+    tracemalloc.start()
+    leaves = make_leaves(names)
+    root = leaves[0]
+    for leaf in leaves[1:]:
+        root = merge_nodes(root, leaf)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < 20 * 1024 * 1024
+    assert root.set_id() == set(names)
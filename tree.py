@@ -1,83 +1,282 @@
-'''
-File: tree.py
-Author: Pri Vaghela 
-Description: The program is to create the TreeNode class that gets imported in 
-phylo.py.
-'''
-
-class TreeNode:
-    '''
-    The class TreeNode is a representation of a node in a binary tree. 
-    '''
-    def __init__(self, name):
-        '''
-        initalizing the name (id), the left node, the right node and a set of 
-        ids. 
-        '''
-        self._id = name
-        self._left = None
-        self._right = None
-        self._set_id = set()
-
-    def get_left(self):
-        '''
-        The method get_left returns the left node.
-        '''
-        return self._left
-
-    def get_right(self):
-        '''
-        The method get_right returns the right node.
-        '''
-        return self._right
-
-    def set_left(self, left):
-        '''
-        The method set_left sets the left node.
-        left - this parameter takes in the left node value
-        '''
-        self._left = left
-
-    def set_right(self, right):
-        '''
-        The method set_right sets the right node.
-        right - this parameter takes in the right node value
-        '''
-        self._right = right
-
-    def get_id(self):
-        '''
-        The method get_id returns the ID associated with a node.
-        '''
-        return self._id
-
-    def set_id(self):
-        '''
-        The method set_id returns the set of IDs associated with a node.
-        '''
-        return self._set_id
-
-    def is_leaf(self):
-        '''
-        The method is_leaf returns a boolean value indicating whether a node is 
-        a leaf.
-        '''
-        return self._left is None and self._right is None
-
-    def add_id(self, id):
-        '''
-        The method add_id adds an ID to the set of IDs associated with a node.
-        id - this paramter takes in an id to be added
-        '''
-        self._set_id.add(id)
-
-    def __str__(self):
-        '''
-        The method __str__ returns a string representation of a node.
-        '''
-        if self.is_leaf():
-            return self.get_id()
-        else:
-            return \
-                "({}, {})".format(str(self.get_left()), str(self.get_right()))
-        
+'''
+File: tree.py
+Author: Pri Vaghela 
+Description: The program is to create the TreeNode class that gets imported in 
+phylo.py.
+'''
+
+class TreeNode:
+    '''
+    The class TreeNode is a representation of a node in a binary tree. 
+    '''
+    __slots__ = ("_id", "_left", "_right", "_parent", "_set_id", "_height",
+                 "_support", "_length", "_lead", "_first", "_string")
+
+    def __init__(self, name):
+        '''
+        initalizing the name (id), the left node, the right node and a set of 
+        ids. 
+        '''
+        self._id = name
+        self._left = None
+        self._right = None
+        # the node this one was last set as a child of, whose memoized
+        # string and first leaf have to be forgotten when this node changes
+        self._parent = None
+        self._set_id = set()
+        self._height = None
+        self._support = None
+        self._length = None
+        # the number of "(" that str(self) starts with, the leaf that comes
+        # right after them and the memoized string
+        self._lead = 0
+        self._first = self
+        self._string = None
+
+    def get_left(self):
+        '''
+        The method get_left returns the left node.
+        '''
+        return self._left
+
+    def get_right(self):
+        '''
+        The method get_right returns the right node.
+        '''
+        return self._right
+
+    def set_left(self, left):
+        '''
+        The method set_left sets the left node.
+        left - this parameter takes in the left node value
+        '''
+        self._adopt(self._left, left)
+        self._left = left
+        self._update_lead()
+
+    def set_right(self, right):
+        '''
+        The method set_right sets the right node.
+        right - this parameter takes in the right node value
+        '''
+        self._adopt(self._right, right)
+        self._right = right
+        self._update_lead()
+
+    def get_id(self):
+        '''
+        The method get_id returns the ID associated with a node.
+        '''
+        return self._id
+
+    def set_id(self):
+        '''
+        The method set_id returns the set of IDs associated with a node and
+        the nodes below it. It is built when asked for, with an explicit
+        stack, so merging nodes never copies the ids of their children.
+        '''
+        ids = set()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            ids.update(node._set_id)
+            for child in (node._left, node._right):
+                if isinstance(child, TreeNode):
+                    stack.append(child)
+        return ids
+
+    def get_height(self):
+        '''
+        The method get_height returns the similarity the node was merged at,
+        or None when it is not known.
+        '''
+        return self._height
+
+    def set_height(self, height):
+        '''
+        The method set_height sets the similarity the node was merged at.
+        height - this parameter takes in the similarity
+        '''
+        self._height = height
+
+    def get_support(self):
+        '''
+        The method get_support returns the bootstrap support of the node, the
+        fraction of the resampled trees that have its clade, or None when it
+        is not known.
+        '''
+        return self._support
+
+    def set_support(self, support):
+        '''
+        The method set_support sets the bootstrap support of the node.
+        support - this parameter takes in the support as a fraction
+        '''
+        self._support = support
+
+    def get_length(self):
+        '''
+        The method get_length returns the length of the branch from the node
+        to its parent, or None when it is not known and follows from the
+        heights.
+        '''
+        return self._length
+
+    def set_length(self, length):
+        '''
+        The method set_length sets the length of the branch from the node to
+        its parent.
+        length - this parameter takes in the branch length
+        '''
+        self._length = length
+
+    def is_leaf(self):
+        '''
+        The method is_leaf returns a boolean value indicating whether a node is 
+        a leaf.
+        '''
+        return self._left is None and self._right is None
+
+    def add_id(self, id):
+        '''
+        The method add_id adds an ID to the IDs of the node itself.
+        id - this paramter takes in an id to be added
+        '''
+        self._set_id.add(id)
+
+    def get_parent(self):
+        '''
+        The method get_parent returns the node this one is a child of, or None
+        for a root.
+        '''
+        return self._parent
+
+    def _adopt(self, old, new):
+        '''
+        The method _adopt makes the node the parent of a new child in place of
+        an old one.
+        old - this parameter takes in the child that is replaced, or None
+        new - this parameter takes in the new child
+        '''
+        if isinstance(old, TreeNode) and old._parent is self:
+            old._parent = None
+        if isinstance(new, TreeNode):
+            new._parent = self
+
+    def _update_lead(self):
+        '''
+        The method _update_lead recomputes the number of leading "(" and the
+        first leaf after a child has changed, and forgets the memoized string,
+        of the node and of every node above it, whose strings hold its string.
+        The parents are followed in a loop, so it works on trees of any depth.
+        '''
+        node = self
+        while node is not None:
+            node._string = None
+            if node.is_leaf():
+                node._lead = 0
+                node._first = node
+            elif isinstance(node._left, TreeNode):
+                node._lead = node._left._lead + 1
+                node._first = node._left._first
+            else:
+                node._lead = 1
+                node._first = None
+            node = node._parent
+
+    def chunks(self):
+        '''
+        The method chunks yields the pieces of the string representation of
+        the node in order. It uses an explicit stack instead of recursion, so
+        it works on trees of any depth.
+        '''
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+            elif not isinstance(node, TreeNode):
+                yield str(node)
+            elif node._string is not None:
+                yield node._string
+            elif node.is_leaf():
+                yield node.get_id()
+            else:
+                yield "("
+                stack.append(")")
+                stack.append(node.get_right())
+                stack.append(", ")
+                stack.append(node.get_left())
+
+    def sorts_before(self, other):
+        '''
+        The method sorts_before returns str(self) < str(other) without
+        building the two strings. Both start with a run of "(" followed by
+        their first leaf, which is known for every node, so the comparison
+        is almost always decided right there; otherwise the strings are
+        compared piece by piece only as far as they agree.
+        other - this parameter takes in the node to compare with
+        '''
+        first = self._first
+        other_first = other._first
+        if first is not None and other_first is not None:
+            less = heads_less(self._lead, first.get_id(), other._lead,
+                              other_first.get_id())
+            if less is not None:
+                return less
+        return chunks_less(self.chunks(), other.chunks())
+
+    def __str__(self):
+        '''
+        The method __str__ returns a string representation of a node. It is
+        built without recursion and remembered until a node below it gets a
+        new child.
+        '''
+        if self._string is None:
+            if self.is_leaf():
+                return self.get_id()
+            self._string = "".join(self.chunks())
+        return self._string
+
+def heads_less(lead1, name1, lead2, name2):
+    '''
+    The function heads_less compares two tree strings by their heads, the
+    run of "(" they start with and the name of the leaf that follows. It
+    returns str1 < str2 when the heads decide it, and None otherwise.
+    lead1 - this parameter takes in the number of "(" of the first string
+    name1 - this parameter takes in the first leaf name of the first string
+    lead2 - this parameter takes in the number of "(" of the second string
+    name2 - this parameter takes in the first leaf name of the second string
+    '''
+    if lead1 != lead2 and name1 and name2:
+        # one string has a "(" where the other has its first name
+        if lead1 < lead2 and name1[0] != "(":
+            return name1[0] < "("
+        if lead2 < lead1 and name2[0] != "(":
+            return "(" < name2[0]
+    elif lead1 == lead2 and name1 != name2 and \
+         not name1.startswith(name2) and not name2.startswith(name1):
+        return name1 < name2
+    return None
+
+def chunks_less(chunks1, chunks2):
+    '''
+    The function chunks_less returns whether the concatenation of the first
+    stream of strings is less than the concatenation of the second, reading
+    the streams only as far as they agree.
+    chunks1 - this parameter takes in the first iterator of strings
+    chunks2 - this parameter takes in the second iterator of strings
+    '''
+    text1 = text2 = ""
+    while True:
+        if text1 == "":
+            text1 = next(chunks1, None)
+        if text2 == "":
+            text2 = next(chunks2, None)
+        if text1 is None or text2 is None:
+            return text1 is None and text2 is not None
+        size = min(len(text1), len(text2))
+        if text1[:size] != text2[:size]:
+            return text1[:size] < text2[:size]
+        text1 = text1[size:]
+        text2 = text2[size:]